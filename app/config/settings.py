@@ -6,11 +6,122 @@ from logger import logger
 class Settings(BaseSettings):
     MONGODB_URL: str = os.getenv("MONGODB_URL")
     MONGODB_NAME: str = "financial_chatbot_main"
+    MONGODB_ENSURE_INDEXES: bool = True
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY")
     GOOGLE_GEMINI_MODEL: str = "gemini-2.0-flash-lite"
     GOOGLE_EMBEDDING_MODEL: str = "models/embedding-001"
+    # "google" for Gemini, "fake" for the deterministic offline models in core.fake_models
+    LLM_PROVIDER: str = "google"
+    FAKE_LLM_LATENCY_MS: int = 0
+    FAKE_LLM_JITTER_MS: int = 0
+    # Fraction of fake LLM calls that take FAKE_LLM_TAIL_LATENCY_MS instead
+    FAKE_LLM_TAIL_FRACTION: float = 0.0
+    FAKE_LLM_TAIL_LATENCY_MS: int = 0
+    FAKE_EMBEDDING_LATENCY_MS: int = 0
     SQL_CONNECTION_URL: str = os.getenv("SQL_CONNECTION_URL")
     SQL_DB_NAME: str = "financial_chatbot"
+    SQL_POOL_SIZE: int = 10
+    SQL_MAX_OVERFLOW: int = 20
+    SQL_POOL_TIMEOUT: int = 30
+    SQL_POOL_RECYCLE: int = 1800
+    SQL_POOL_PRE_PING: bool = True
+
+    METRICS_ENABLED: bool = True
+    PROMPT_TOKEN_BUDGET_ANALYZE: int = 6000
+    PROMPT_TOKEN_BUDGET_RESPONSE: int = 6000
+    # Route small talk, document-only and empty sessions without the SQL generation call
+    QUERY_ROUTER_ENABLED: bool = True
+    # Link re-uploaded content to the existing table, profile, vectors and GridFS file
+    UPLOAD_DEDUP_ENABLED: bool = True
+    # Read size when piping an upload into GridFS
+    UPLOAD_STREAM_CHUNK_BYTES: int = 1024 * 1024
+    # PDF/DOCX chunking: text of one page and section up to DOC_CHUNK_SIZE
+    # characters; tables stay whole up to DOC_TABLE_MAX_CHARS, then split by rows
+    DOC_CHUNK_SIZE: int = 500
+    DOC_CHUNK_OVERLAP: int = 100
+    DOC_TABLE_MAX_CHARS: int = 3000
+    DOC_EMBED_BATCH_SIZE: int = 32
+    # Processes used to parse multi-sheet workbooks (0 = up to 4 by CPU count)
+    EXCEL_SHEET_WORKERS: int = 0
+    # "vectorized" (categoricals / string dtype, integer downcast) or "legacy" per-column loop
+    DATA_CLEANING_ENGINE: str = "vectorized"
+    # Text columns with at most this share of distinct values become categoricals
+    CLEAN_CATEGORY_MAX_RATIO: float = 0.5
+    CLEAN_DOWNCAST_FLOATS: bool = False
+    # Phrase scalar and small SQL results locally instead of calling the LLM
+    FAST_PATH_RESPONSES: bool = False
+    FAST_PATH_MAX_ROWS: int = 5
+    FAST_PATH_MAX_COLUMNS: int = 4
+    RESPONSE_CURRENCY_SYMBOL: str = "$"
+    WARMUP_ON_STARTUP: bool = True
+
+    CHAT_BUCKET_SIZE: int = 100
+    CHAT_HISTORY_PAGE_SIZE: int = 50
+    CHAT_HISTORY_MAX_PAGE_SIZE: int = 200
+    CHAT_SINGLE_FLIGHT: bool = True
+    CHAT_WRITE_BEHIND: bool = True
+    CHAT_FLUSH_INTERVAL_MS: int = 200
+    CHAT_FLUSH_MAX_MESSAGES: int = 500
+    # Per-request deadline and hedging policy for LLM calls
+    CHAT_REQUEST_DEADLINE_SECONDS: float = 30.0
+    LLM_HEDGING_ENABLED: bool = True
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_INITIAL_DELAY_MS: int = 5000
+    LLM_HEDGE_MIN_DELAY_MS: int = 200
+    LLM_MAX_HEDGES: int = 1
+    # Batch chat endpoint: queries per request and graph runs in parallel
+    CHAT_BATCH_MAX_QUERIES: int = 20
+    CHAT_BATCH_CONCURRENCY: int = 4
+    # Conversation context: recent turns verbatim plus a rolling summary of older ones
+    CONVERSATION_CONTEXT_ENABLED: bool = True
+    CONVERSATION_WINDOW_MESSAGES: int = 6
+    CONVERSATION_SUMMARY_BATCH_MESSAGES: int = 6
+    CONVERSATION_SUMMARY_TOKENS: int = 300
+    # Most message tokens sent to one summarization call
+    CONVERSATION_SUMMARY_INPUT_TOKENS: int = 4000
+    CONVERSATION_HISTORY_TOKENS: int = 800
+    # Session lifecycle: purge sessions idle for longer than the TTL (0 keeps them forever)
+    SESSION_TTL_HOURS: float = 0.0
+    SESSION_SWEEP_INTERVAL_SECONDS: int = 3600
+    SESSION_SWEEP_BATCH: int = 100
+    # In-process cache of session table info and FAISS indexes, filled ahead of the first chat
+    SESSION_CACHE_MAX_SESSIONS: int = 32
+    SESSION_PREFETCH_ENABLED: bool = True
+    SESSION_PREFETCH_PER_USER: int = 1
+    SESSION_PRELOAD_COUNT: int = 20
+    # Two-level cache of generated SQL, result sets and answers: in-process LRU
+    # in front of a store shared by the workers on a host ("sqlite" or "memory" for LRU only)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_BACKEND: str = "sqlite"
+    RESULT_CACHE_PATH: str = "cache/results.sqlite3"
+    RESULT_CACHE_LOCAL_ENTRIES: int = 1024
+    RESULT_CACHE_TTL_SECONDS: int = 3600
+    RESULT_CACHE_MAX_ROWS: int = 1000
+    # Opt-in stack-sampling profiler: keeps a PROFILING_SAMPLE_RATE fraction of
+    # requests plus every request slower than PROFILING_SLOW_REQUEST_MS
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.01
+    PROFILING_SLOW_REQUEST_MS: int = 5000
+    PROFILING_INTERVAL_MS: int = 5
+    PROFILING_RING_SIZE: int = 50
+    PROFILING_MAX_STACKS: int = 2000
+    # Admission control: global slots shared by the chat lane (served first)
+    # and the upload lane, per-user limits and bounded wait queues (429 when full)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_CONCURRENT: int = 32
+    ADMISSION_CHAT_CONCURRENCY: int = 28
+    ADMISSION_CHAT_PER_USER: int = 8
+    ADMISSION_CHAT_QUEUE: int = 200
+    ADMISSION_CHAT_USER_QUEUE: int = 32
+    ADMISSION_CHAT_MAX_WAIT_SECONDS: float = 15.0
+    ADMISSION_INGEST_CONCURRENCY: int = 4
+    ADMISSION_INGEST_PER_USER: int = 2
+    ADMISSION_INGEST_QUEUE: int = 50
+    ADMISSION_INGEST_USER_QUEUE: int = 10
+    ADMISSION_INGEST_MAX_WAIT_SECONDS: float = 120.0
+    # Global slots kept free for uploads however busy chat is
+    ADMISSION_INGEST_RESERVED: int = 1
 
     SUPPORTED_EXTENSIONS: List[str] = ['csv', 'xlsx', 'xls', 'pdf', 'docx']
     EXCEL_FILE_EXTENSIONS: List[str] = ['csv', 'xlsx', 'xls']
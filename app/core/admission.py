@@ -0,0 +1,327 @@
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Tuple
+from config.settings import settings
+from logger import logger
+from metrics import registry
+
+ADMISSION_REQUESTS = registry.counter(
+    "chatbot_admission_requests_total",
+    "Admission decisions by lane: admitted at once, admitted after queueing, or rejected and why",
+    ["lane", "outcome"]
+)
+ADMISSION_WAIT = registry.histogram(
+    "chatbot_admission_wait_seconds",
+    "Time requests spent queued before admission",
+    ["lane"]
+)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted; routes answer 429 with `retry_after`
+    """
+    def __init__(
+            self,
+            lane: str,
+            reason: str,
+            retry_after: int
+    ):
+        super().__init__(f"Too many {lane} requests ({reason}), retry in {retry_after}s")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Lane:
+    """
+    Concurrency slots, per-user slots and a bounded FIFO wait queue for one kind of work
+    """
+    def __init__(
+            self,
+            name: str,
+            limit: int,
+            per_user: int,
+            max_queue: int,
+            max_user_queue: int,
+            max_wait_seconds: float,
+            reserved: int = 0
+    ):
+        self.name = name
+        self.limit = limit
+        self.per_user = per_user
+        self.max_queue = max_queue
+        self.max_user_queue = max_user_queue
+        self.max_wait_seconds = max_wait_seconds
+        # Global slots other lanes may not take while this lane uses fewer
+        self.reserved = reserved
+        self.in_flight = 0
+        self.user_in_flight: Dict[str, int] = {}
+        self.user_queued: Dict[str, int] = {}
+        self.waiters: Deque[Tuple[str, int, asyncio.Future]] = deque()
+        # Moving average of how long a slot is held, for Retry-After hints
+        self.avg_hold_seconds = 1.0
+
+    def queue_depth(self) -> int:
+        return len(self.waiters)
+
+    def retry_after(self) -> int:
+        slots = max(self.limit, 1)
+        return max(1, math.ceil(self.avg_hold_seconds * (len(self.waiters) + 1) / slots))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self.waiters),
+            "limit": self.limit,
+            "per_user": self.per_user,
+            "reserved": self.reserved,
+            "max_queue": self.max_queue,
+            "active_users": len(self.user_in_flight),
+            "avg_hold_seconds": round(self.avg_hold_seconds, 3)
+        }
+
+
+class AdmissionController:
+    """
+    Admission control in front of chat and upload processing.
+
+    A global slot count is shared by priority lanes (interactive chat before
+    bulk ingestion); each lane also caps its own concurrency and what a
+    single user may run at once. Requests that cannot start wait in the
+    lane's bounded FIFO queue for up to the lane's max wait. A full queue or
+    an expired wait raises `AdmissionRejected` with a Retry-After hint
+    instead of letting work pile up on the event loop, the SQL pool and the
+    LLM quota.
+
+    A lane may reserve global slots, so a busy higher priority lane cannot
+    take all of them and starve it.
+
+    Freed slots go to the highest priority lane first, and within a lane to
+    the oldest waiter whose user is under its per-user limit, so one busy
+    tenant does not hold up the others queued behind it.
+
+    A request that runs several pipelines at once (a chat batch) holds as
+    many slots as it runs, capped at what its lane and user may hold.
+    """
+    def __init__(
+            self,
+            limit: int,
+            lanes: List[Lane]
+    ):
+        self.limit = limit
+        # Dict order is lane priority
+        self.lanes = {lane.name: lane for lane in lanes}
+        self.in_flight = 0
+
+    @asynccontextmanager
+    async def admit(
+            self,
+            lane_name: str,
+            user_id: str,
+            slots: int = 1
+    ):
+        """
+        Hold `slots` slots of `lane_name` for `user_id` while the block runs
+        """
+        if not settings.ADMISSION_ENABLED:
+            yield
+            return
+        lane = self.lanes[lane_name]
+        slots = max(1, min(slots, lane.per_user, lane.limit, self.limit - self._reserved_for_others(lane)))
+        await self._acquire(lane, user_id, slots)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            lane.avg_hold_seconds = 0.9 * lane.avg_hold_seconds + 0.1 * (time.monotonic() - start)
+            self._release(lane, user_id, slots)
+
+    async def _acquire(
+            self,
+            lane: Lane,
+            user_id: str,
+            slots: int
+    ):
+        if not lane.waiters and self._can_start(lane, user_id, slots):
+            self._start(lane, user_id, slots)
+            ADMISSION_REQUESTS.inc(lane=lane.name, outcome="admitted")
+            return
+
+        if len(lane.waiters) >= lane.max_queue:
+            self._reject(lane, user_id, "queue_full")
+        if lane.user_queued.get(user_id, 0) >= lane.max_user_queue:
+            self._reject(lane, user_id, "user_queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (user_id, slots, waiter)
+        lane.waiters.append(entry)
+        lane.user_queued[user_id] = lane.user_queued.get(user_id, 0) + 1
+        # Waiters held back only by their own per-user limit must not block this one
+        self._dispatch()
+        if waiter.done():
+            ADMISSION_REQUESTS.inc(lane=lane.name, outcome="admitted")
+            return
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), lane.max_wait_seconds)
+        except asyncio.CancelledError:
+            if waiter.done():
+                # Granted just as the client went away; hand the slots on
+                self._release(lane, user_id, slots)
+            else:
+                self._abandon(lane, entry)
+            raise
+        except asyncio.TimeoutError:
+            if not waiter.done():
+                self._abandon(lane, entry)
+                self._reject(lane, user_id, "timeout")
+        ADMISSION_WAIT.observe(time.monotonic() - start, lane=lane.name)
+        ADMISSION_REQUESTS.inc(lane=lane.name, outcome="queued")
+
+    def _abandon(
+            self,
+            lane: Lane,
+            entry: Tuple[str, int, asyncio.Future]
+    ):
+        entry[2].cancel()
+        lane.waiters.remove(entry)
+        self._dequeued(lane, entry[0])
+
+    def _reject(
+            self,
+            lane: Lane,
+            user_id: str,
+            reason: str
+    ):
+        ADMISSION_REQUESTS.inc(lane=lane.name, outcome=f"rejected_{reason}")
+        logger.warning(f"Rejected {lane.name} request of user {user_id}: {reason}")
+        raise AdmissionRejected(lane.name, reason, lane.retry_after())
+
+    def _can_start(
+            self,
+            lane: Lane,
+            user_id: str,
+            slots: int
+    ) -> bool:
+        return (
+            self.in_flight + slots + self._reserved_for_others(lane) <= self.limit
+            and lane.in_flight + slots <= lane.limit
+            and lane.user_in_flight.get(user_id, 0) + slots <= lane.per_user
+        )
+
+    def _reserved_for_others(
+            self,
+            lane: Lane
+    ) -> int:
+        """
+        Global slots held back for other lanes that are below their reservation
+        """
+        return sum(
+            max(other.reserved - other.in_flight, 0)
+            for other in self.lanes.values()
+            if other is not lane
+        )
+
+    def _start(
+            self,
+            lane: Lane,
+            user_id: str,
+            slots: int
+    ):
+        self.in_flight += slots
+        lane.in_flight += slots
+        lane.user_in_flight[user_id] = lane.user_in_flight.get(user_id, 0) + slots
+
+    def _dequeued(
+            self,
+            lane: Lane,
+            user_id: str
+    ):
+        lane.user_queued[user_id] -= 1
+        if not lane.user_queued[user_id]:
+            del lane.user_queued[user_id]
+
+    def _release(
+            self,
+            lane: Lane,
+            user_id: str,
+            slots: int
+    ):
+        self.in_flight -= slots
+        lane.in_flight -= slots
+        lane.user_in_flight[user_id] -= slots
+        if not lane.user_in_flight[user_id]:
+            del lane.user_in_flight[user_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        """
+        Hand free slots to waiters, highest priority lane first. A waiter
+        that needs more slots than are free blocks the ones behind it, so
+        single requests cannot starve a batch. Once a lane is short of
+        global slots, lower priority lanes only get their reserved ones.
+        """
+        short = False
+        for lane in self.lanes.values():
+            for entry in list(lane.waiters):
+                user_id, slots, waiter = entry
+                if (
+                    self.in_flight + slots + self._reserved_for_others(lane) > self.limit
+                    or (short and lane.in_flight + slots > lane.reserved)
+                ):
+                    short = True
+                    break
+                if lane.in_flight + slots > lane.limit:
+                    break
+                if self._can_start(lane, user_id, slots):
+                    lane.waiters.remove(entry)
+                    self._dequeued(lane, user_id)
+                    self._start(lane, user_id, slots)
+                    waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.ADMISSION_ENABLED,
+            "in_flight": self.in_flight,
+            "limit": self.limit,
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()}
+        }
+
+admission = AdmissionController(
+    settings.ADMISSION_MAX_CONCURRENT,
+    [
+        Lane(
+            "chat",
+            settings.ADMISSION_CHAT_CONCURRENCY,
+            settings.ADMISSION_CHAT_PER_USER,
+            settings.ADMISSION_CHAT_QUEUE,
+            settings.ADMISSION_CHAT_USER_QUEUE,
+            settings.ADMISSION_CHAT_MAX_WAIT_SECONDS
+        ),
+        Lane(
+            "ingest",
+            settings.ADMISSION_INGEST_CONCURRENCY,
+            settings.ADMISSION_INGEST_PER_USER,
+            settings.ADMISSION_INGEST_QUEUE,
+            settings.ADMISSION_INGEST_USER_QUEUE,
+            settings.ADMISSION_INGEST_MAX_WAIT_SECONDS,
+            settings.ADMISSION_INGEST_RESERVED
+        )
+    ]
+)
+
+for _lane in admission.lanes.values():
+    registry.gauge(
+        f"chatbot_admission_{_lane.name}_queue_depth",
+        f"Requests waiting for a {_lane.name} admission slot",
+        _lane.queue_depth
+    )
+    registry.gauge(
+        f"chatbot_admission_{_lane.name}_in_flight",
+        f"Admitted {_lane.name} requests currently running",
+        lambda lane=_lane: lane.in_flight
+    )
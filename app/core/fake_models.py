@@ -0,0 +1,136 @@
+import re
+import json
+import time
+import math
+import random
+import asyncio
+import hashlib
+from typing import Any, List, Optional
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+def _stable_hash(text: str) -> int:
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest(), 16)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for ChatGoogleGenerativeAI.
+
+    SQL generation prompts get a valid SQLResponse JSON that counts the rows of
+    the first table in the schema, unless the question mentions a report or
+    document, which routes it to RAG. Every other prompt gets a short answer
+    derived from the user query. Latency is latency_ms plus a jitter that is
+    derived from the prompt, so runs are reproducible. A tail_fraction of
+    calls (drawn from a seeded sequence, so a retried prompt can be fast)
+    take tail_latency_ms instead, to model slow upstream responses.
+    """
+    latency_ms: int = 0
+    jitter_ms: int = 0
+    tail_fraction: float = 0.0
+    tail_latency_ms: int = 0
+    _tail_random: random.Random = PrivateAttr(default_factory=lambda: random.Random(0))
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-financial-chat"
+
+    def _prompt_text(self, messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _delay_seconds(self, prompt: str) -> float:
+        jitter = random.Random(_stable_hash(prompt)).uniform(0, self.jitter_ms) if self.jitter_ms else 0
+        if self.tail_fraction and self._tail_random.random() < self.tail_fraction:
+            return self.tail_latency_ms / 1000
+        return (self.latency_ms + jitter) / 1000
+
+    def _respond(self, prompt: str) -> AIMessage:
+        query_match = re.search(r"User Query:\s*(.*)", prompt)
+        user_query = query_match.group(1).strip() if query_match else ""
+
+        if "SQL query generator" in prompt:
+            table_match = re.search(r"""['"]sql_tablename['"]:\s*['"]([^'"]+)['"]""", prompt)
+            asks_documents = re.search(r"\b(report|document|pdf|docx)s?\b", user_query, re.IGNORECASE)
+            if table_match and not asks_documents:
+                table_name = table_match.group(1)
+                content = json.dumps({
+                    "response": True,
+                    "message": f"SELECT COUNT(*) AS row_count FROM `{table_name}`",
+                    "table_name": table_name
+                })
+            else:
+                content = json.dumps({
+                    "response": False,
+                    "message": "Question needs document content." if asks_documents else "No tables available for this session.",
+                    "table_name": None
+                })
+        else:
+            content = f"Based on the available data, here is the answer to: {user_query}"
+
+        input_tokens = max(len(prompt) // 4, 1)
+        output_tokens = max(len(content) // 4, 1)
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens
+            }
+        )
+
+    def _generate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Any = None,
+            **kwargs: Any
+    ) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        time.sleep(self._delay_seconds(prompt))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(prompt))])
+
+    async def _agenerate(
+            self,
+            messages: List[BaseMessage],
+            stop: Optional[List[str]] = None,
+            run_manager: Any = None,
+            **kwargs: Any
+    ) -> ChatResult:
+        prompt = self._prompt_text(messages)
+        await asyncio.sleep(self._delay_seconds(prompt))
+        return ChatResult(generations=[ChatGeneration(message=self._respond(prompt))])
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic stand-in for GoogleGenerativeAIEmbeddings.
+    Tokens are hashed into a fixed-size bag-of-words vector, so texts sharing
+    words are close to each other and similarity search stays meaningful.
+    """
+    def __init__(
+            self,
+            dimensions: int = 64,
+            latency_ms: int = 0
+    ):
+        self.dimensions = dimensions
+        self.latency_ms = latency_ms
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for token in re.findall(r"\w+", text.lower()):
+            vector[_stable_hash(token) % self.dimensions] += 1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._embed(text)
@@ -1,25 +1,32 @@
+import os
+import asyncio
 import pandas as pd
-from typing import Literal
+from typing import Literal, Optional, Dict, Any
 from langgraph.graph import StateGraph, END
 from langchain.output_parsers import PydanticOutputParser
 from langchain.prompts import PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from database.database import db_manager, sql_engine
+from database.database import db_manager
 from config.settings import settings
-from logger import logger
+from logger import logger, log_exception, StateSummary
 from schema.models import ChatBotState, SQLResponse
 from core.rag_process import RAGProcess
+from core.model_factory import get_chat_model
+from core.llm_caller import call_llm, new_deadline, LLMDeadlineExceeded
+from core.prompt_budget import PromptBudget, compact_conversation
+from core.response_formatter import format_fast_response, response_stats
+from core.query_router import route_query, vector_store_path, is_follow_up
+from core.single_flight import query_flights
+from core.session_cache import session_cache, load_upload_version
+from core.result_cache import result_cache, cache_key
+from metrics import instrument_node, track_call, record_llm_usage, SQL_ROWS_RETURNED, QUERY_ROUTES
+from profiling import tag_route
 
 class FinancialChatBot:
     def __init__(self):
         self.output_parser = PydanticOutputParser(
             pydantic_object=SQLResponse
         )
-        self.llm = ChatGoogleGenerativeAI(
-            model = settings.GOOGLE_GEMINI_MODEL,
-            google_api_key = settings.GOOGLE_API_KEY,
-            temperature = 0.1
-        )
+        self.llm = get_chat_model(temperature=0.1)
         self.graph = self._build_graph()
 
     def _build_graph(
@@ -31,15 +38,25 @@ class FinancialChatBot:
         workflow = StateGraph(ChatBotState)
 
         # Add nodes
-        workflow.add_node("fetch_table_info", self._fetch_table_info)
-        workflow.add_node("analyze_query", self._analyze_query)
-        workflow.add_node("execute_sql", self._execute_sql)
-        workflow.add_node("rag_process", self._rag_process)
-        workflow.add_node("generate_response", self._generate_response)
+        workflow.add_node("fetch_table_info", instrument_node("fetch_table_info", self._fetch_table_info))
+        workflow.add_node("route_query", instrument_node("route_query", self._route_query))
+        workflow.add_node("analyze_query", instrument_node("analyze_query", self._analyze_query))
+        workflow.add_node("execute_sql", instrument_node("execute_sql", self._execute_sql))
+        workflow.add_node("rag_process", instrument_node("rag_process", self._rag_process))
+        workflow.add_node("generate_response", instrument_node("generate_response", self._generate_response))
 
         # Define edges
         workflow.set_entry_point("fetch_table_info")
-        workflow.add_edge("fetch_table_info", "analyze_query")
+        workflow.add_edge("fetch_table_info", "route_query")
+        workflow.add_conditional_edges(
+            "route_query",
+            self._next_after_route,
+            {
+                "sql": "analyze_query",
+                "rag": "rag_process",
+                "respond": END
+            }
+        )
         workflow.add_conditional_edges(
             "analyze_query",
             self._should_execute_sql,
@@ -67,6 +84,34 @@ class FinancialChatBot:
 
         return flow
     
+    async def load_session_context(
+            self,
+            user_id: str,
+            session_id: str
+    ) -> Dict[str, Any]:
+        """
+        Load the session's table info and document vector store once, so a
+        batch of queries against the same session can share them.
+
+        Returns:
+            {"table_info": [...], "vector_store": FAISS or None}
+        """
+        try:
+            table_info, vector_store = await asyncio.gather(
+                session_cache.table_info(user_id, session_id),
+                session_cache.vector_store(user_id, session_id)
+            )
+            logger.info(
+                f"Loaded session context: {len(table_info)} tables, "
+                f"vector store {'loaded' if vector_store is not None else 'absent'}"
+            )
+            return {
+                "table_info": table_info,
+                "vector_store": vector_store
+            }
+        except Exception as e:
+            return log_exception(e, logger)
+
     async def _fetch_table_info(
             self,
             state: ChatBotState
@@ -75,30 +120,64 @@ class FinancialChatBot:
         Fetch all table information from MongoDB based on user_id and session_id
         """
         try:
+            if state["table_info"] is not None:
+                logger.info("Using preloaded table info")
+                return state
             logger.info(f"Fetching table info for user: {state['user_id']}, session: {state['session_id']}")
 
-            table_info =  await db_manager.database.documents_data.find_one(
-                {
-                    "user_id": state['user_id'],
-                    "session_id": state['session_id']
-                },
-                {
-                    "_id": 0,
-                    "documents": 1
-                }
+            state["table_info"] = await session_cache.table_info(
+                state["user_id"],
+                state["session_id"],
+                state.get("upload_version")
             )
-            if table_info and "documents" in table_info:
-                state["table_info"] = table_info["documents"]
-                logger.info(f"Found {len(table_info['documents'])} tables for user")
+            if state["table_info"]:
+                logger.info(f"Found {len(state['table_info'])} tables for user")
             else:
-                state["table_info"] = []
                 logger.warning(f"No table information found for user")
-            logger.info(f"State After Fetching Table Info {str(state)}")
+            logger.debug("State after fetching table info: %s", StateSummary(state))
             return state
         except Exception as e:
             logger.error(f"Error occured while fetching table info: {e}")
             return state
 
+    async def _route_query(
+            self,
+            state: ChatBotState
+    ) -> ChatBotState:
+        """
+        Decide locally between SQL generation, RAG and a direct reply, so
+        sessions without tables and small talk skip the SQL generation call
+        """
+        if not settings.QUERY_ROUTER_ENABLED:
+            state["route"] = "sql"
+            return state
+        try:
+            has_documents = state.get("vector_store") is not None or os.path.exists(
+                vector_store_path(state["user_id"], state["session_id"])
+            )
+            route, reason, reply = route_query(
+                state["user_query"],
+                state["table_info"],
+                has_documents
+            )
+            state["route"] = route
+            if reply is not None:
+                state["final_response"] = reply
+                tag_route("respond")
+            QUERY_ROUTES.inc(route=route, reason=reason)
+            logger.info(f"Query routed to {route} ({reason})")
+            return state
+        except Exception as e:
+            logger.error(f"Error in route_query: {str(e)}")
+            state["route"] = "sql"
+            return state
+
+    def _next_after_route(
+            self,
+            state: ChatBotState
+    ) -> Literal["sql", "rag", "respond"]:
+        return state.get("route") or "sql"
+
     async def _analyze_query(
             self,
             state: ChatBotState
@@ -106,13 +185,25 @@ class FinancialChatBot:
         """
         Analyze user query with LLM to generate SQL Query. 
         """
+        # Profiles are tagged with every path that ran, e.g. "sql" then "rag" on fallback
+        tag_route("sql")
         try:
+            sql_key = self._cache_key(state, "sql")
+            if sql_key:
+                cached = await result_cache.get("sql", sql_key)
+                if cached is not None:
+                    logger.info("Generated SQL served from cache")
+                    state["sql_response"] = SQLResponse(**cached)
+                    return state
+
             system_prompt = """
 You are an expert financial data analyst and SQL query generator. Your goal is to create a correct, optimized SQL query based on the user question and the given table schema details.
 
 ### Context:
 - User Query: {user_query}
 - Available Tables & Schema: {table_information}
+- Conversation so far (resolve follow-up questions like "and for last quarter?" against it):
+{conversation_history}
 
 ### Rules:
 1. Only use tables and columns mentioned in `table_information`. Do NOT assume columns that do not exist.
@@ -133,17 +224,30 @@ You are an expert financial data analyst and SQL query generator. Your goal is t
 - For percentage calculations, use correct MySQL syntax.
 - Always enclose column names and table names in backticks (`) if needed.
 """
+            format_instructions = self.output_parser.get_format_instructions()
             prompt = PromptTemplate(
                 template=system_prompt,
-                input_variables=["user_query", "table_information"],
-                partial_variables={"format_instructions": self.output_parser.get_format_instructions()}
+                input_variables=["user_query", "table_information", "conversation_history"],
+                partial_variables={"format_instructions": format_instructions}
+            )
+            prompt_inputs = PromptBudget(
+                "analyze_query",
+                settings.PROMPT_TOKEN_BUDGET_ANALYZE
+            ).assemble(
+                system_prompt + format_instructions,
+                fixed={
+                    "user_query": state["user_query"],
+                    "conversation_history": self._conversation_history(state)
+                },
+                sections={"table_information": state["table_info"]}
             )
 
-            chain = prompt | self.llm | self.output_parser
-            response = await chain.ainvoke({
-                "user_query": state["user_query"],
-                "table_information": state["table_info"]
-            })
+            chain = prompt | self.llm
+            state["llm_calls"] = state.get("llm_calls", 0) + 1
+            with track_call("llm", "analyze_query"):
+                message = await call_llm("analyze_query", chain, prompt_inputs, state.get("deadline"))
+            record_llm_usage("analyze_query", message)
+            response = self.output_parser.parse(message.content)
             if not isinstance(response, SQLResponse):
                 logger.error("Invalid response format from LLM")
                 state["sql_response"] = SQLResponse(
@@ -151,7 +255,9 @@ You are an expert financial data analyst and SQL query generator. Your goal is t
                     message="Invalid SQL generation."
                 )
             state["sql_response"] = response
-            logger.info(f"State After Analyze Query {str(state)}")
+            if sql_key and isinstance(response, SQLResponse) and response.response:
+                await result_cache.set(sql_key, response.model_dump())
+            logger.debug("State after analyze query: %s", StateSummary(state))
             return state
         except Exception as e:
             logger.error(f"Error in analyze_query: {str(e)}")
@@ -192,10 +298,20 @@ You are an expert financial data analyst and SQL query generator. Your goal is t
             query = state["sql_response"].message
             if "DROP" in query.upper() or "DELETE" in query.upper():
                 raise ValueError("Potential dangerous SQL detected.")
-            df = pd.read_sql(query, sql_engine)
+            result_key = self._cache_key(state, "result", query=query)
+            cached = await result_cache.get("result", result_key) if result_key else None
+            if cached is not None:
+                logger.info("SQL result served from cache")
+                state["sql_result"] = cached
+                return state
+            with track_call("mysql", "execute_sql"):
+                df = pd.read_sql(query, db_manager.get_sql_engine())
             state["sql_result"] = df.to_dict('records')
+            if result_key and len(state["sql_result"]) <= settings.RESULT_CACHE_MAX_ROWS:
+                await result_cache.set(result_key, state["sql_result"])
+            SQL_ROWS_RETURNED.observe(len(state["sql_result"]))
             logger.info(f"SQL query executed successfully. Retrieved {len(state['sql_result'])} rows")
-            logger.info(f"State after executing sql query {str(state)}")
+            logger.debug("State after executing sql query: %s", StateSummary(state))
             return state
         except Exception as e:
             logger.error(f"Error executing SQL query: {str(e)}")
@@ -218,6 +334,14 @@ You are an expert financial data analyst and SQL query generator. Your goal is t
             if state["sql_response"] and state["sql_response"].response and state["sql_result"]:
                 # Successful query execution
                 logger.info("Successful query execution. ")
+                if settings.FAST_PATH_RESPONSES:
+                    fast_response = format_fast_response(state["user_query"], state["sql_result"])
+                    if fast_response is not None:
+                        logger.info("Response formatted locally, skipping the LLM call")
+                        response_stats.record("fast")
+                        state["final_response"] = fast_response
+                        state["answer_cacheable"] = True
+                        return state
                 system_prompt = """
 You are a financial data analyst. Analyze the SQL query result and provide insights that are relevant to the asked query.
 
@@ -233,6 +357,9 @@ You are a financial data analyst. Analyze the SQL query result and provide insig
 9. Try to provide full answer based on user query and SQL Query result
 10. If for example 'SUM(`transaction_count`)": null' provide as SQL Query Result it means, No data found related to User Query, So, respond accordingly.
 
+Conversation so far:
+{conversation_history}
+
 User Query: {user_query}
 SQL Query Result:
 {sql_result}
@@ -253,6 +380,9 @@ Rules:
 9. Reference specific document sections when providing information (e.g., "According to the document...").
 10. Do not hallucinate or add information not present in the RAG Result.
 
+Conversation so far:
+{conversation_history}
+
 User Query: {user_query}
 RAG Result: {rag_result}
 """
@@ -270,37 +400,101 @@ You are a helpful financial assistant. Explain clearly why the query cannot be a
 5. If table info is missing, inform the user they must upload documents.
 6. If no matching data, say the query returned no results.
 
+Conversation so far:
+{conversation_history}
+
 User Query: {user_query}
 SQL Query Response: {sql_response}
 SQL Query Result: {sql_result}
 """
   
-            prompt = PromptTemplate(
-                template=system_prompt,
-                input_variables=["user_query", "sql_response", "sql_result"]
+            prompt = PromptTemplate.from_template(system_prompt)
+            # Only the sections used by the selected template share the budget
+            sections = {
+                name: state[name]
+                for name in ("sql_response", "sql_result", "rag_result")
+                if name in prompt.input_variables
+            }
+            prompt_inputs = PromptBudget(
+                "generate_response",
+                settings.PROMPT_TOKEN_BUDGET_RESPONSE
+            ).assemble(
+                system_prompt,
+                fixed={
+                    "user_query": state["user_query"],
+                    "conversation_history": self._conversation_history(state)
+                },
+                sections=sections
             )
 
             chain = prompt | self.llm
-            response = await chain.ainvoke({
-                "user_query": state["user_query"],
-                "sql_response": state["sql_response"],
-                "sql_result": state["sql_result"],
-                "rag_result": state["rag_result"]
-            })
+            state["llm_calls"] = state.get("llm_calls", 0) + 1
+            response_stats.record("llm")
+            with track_call("llm", "generate_response"):
+                response = await call_llm("generate_response", chain, prompt_inputs, state.get("deadline"))
+            record_llm_usage("generate_response", response)
             state["final_response"] = response.content
-            logger.info(f"Final response returned to user: {state['final_response']}")
-            logger.info(f"Final State: {str(state)}")
+            # Only answers grounded in a SQL result or retrieved chunks are worth reusing
+            state["answer_cacheable"] = bool(
+                (state["sql_response"] and state["sql_response"].response and state["sql_result"])
+                or (state["rag_result"] or {}).get("success")
+            )
+            logger.info(f"Final response returned to user ({len(state['final_response'])} chars)")
+            logger.debug("Final response: %s", state["final_response"])
+            logger.debug("Final state: %s", StateSummary(state))
+            return state
+        except LLMDeadlineExceeded as e:
+            logger.error(f"Error generating response: {str(e)}")
+            state["final_response"] = "Sorry, generating the answer took too long. Please try again."
             return state
         except Exception as e:
             logger.error(f"Error generating response: {str(e)}")
             state["final_response"] = "I apologize, but I encountered an error while processing your request. Please try again."
             return state
 
+    def _conversation_history(
+            self,
+            state: ChatBotState
+    ) -> str:
+        """
+        Rolling summary and recent turns, capped at CONVERSATION_HISTORY_TOKENS
+        """
+        return compact_conversation(
+            {
+                "summary": state.get("conversation_summary"),
+                "messages": state.get("messages")
+            },
+            settings.CONVERSATION_HISTORY_TOKENS
+        )
+
+    def _cache_key(
+            self,
+            state: ChatBotState,
+            kind: str,
+            query: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Result cache key for the normalized question (or a SQL text) at the
+        session's current upload state; None when caching is off. The
+        conversation is not part of the key, so a question that may refer to
+        earlier turns is not cached at all.
+        """
+        if not settings.RESULT_CACHE_ENABLED or state.get("upload_version") is None:
+            return None
+        if query is None:
+            has_history = bool(state.get("messages") or state.get("conversation_summary"))
+            if has_history and is_follow_up(state["user_query"]):
+                return None
+            query = " ".join(state["user_query"].lower().split())
+        return cache_key(kind, state["user_id"], state["session_id"], state["upload_version"], query)
+
     async def process_query(
             self,
             user_id: str,
             session_id: str,
-            user_query: str
+            user_query: str,
+            context: Optional[Dict[str, Any]] = None,
+            history: Optional[Dict[str, Any]] = None
     ) -> str:
         """
         Main method to process user queries
@@ -309,6 +503,8 @@ SQL Query Result: {sql_result}
             user_id: User Identifier
             session_id: Session Identifier
             user_query: User's Query related to Financial data
+            context: Preloaded session context from `load_session_context`
+            history: Rolling summary and recent messages from `ConversationService.load`
         Returns:
             Final response string
         """
@@ -316,21 +512,58 @@ SQL Query Result: {sql_result}
             user_id=user_id,
             session_id=session_id,
             user_query=user_query,
-            table_info=None,
+            table_info=context["table_info"] if context else None,
             sql_response=None,
             sql_result=None,
             rag_result={},
             final_response="",
-            messages=[]
+            messages=history["messages"] if history else [],
+            conversation_summary=history["summary"] if history else "",
+            llm_calls=0,
+            route="",
+            deadline=new_deadline(),
+            vector_store=context["vector_store"] if context else None,
+            upload_version=None,
+            answer_cacheable=False
         )
         try:
-            final_state = await self.graph.ainvoke(initial_state)
-            return {
+            answer_key = None
+            if settings.RESULT_CACHE_ENABLED:
+                initial_state["upload_version"] = await load_upload_version(user_id, session_id)
+                answer_key = self._cache_key(initial_state, "answer")
+                cached = await result_cache.get("answer", answer_key)
+                if cached is not None:
+                    logger.info("Answer served from cache")
+                    tag_route("cache")
+                    cached = dict(cached)
+                    if cached.get("sql_response"):
+                        cached["sql_response"] = SQLResponse(**cached["sql_response"])
+                    return cached
+
+            if settings.CHAT_SINGLE_FLIGHT:
+                # Identical in-flight questions for the same session share one graph run
+                final_state, shared = await query_flights.do(
+                    (user_id, session_id, user_query.strip()),
+                    lambda: self.graph.ainvoke(initial_state)
+                )
+                if shared:
+                    logger.info("Query coalesced with an identical in-flight request")
+                    tag_route("shared")
+                    query_flights.record_saved_llm_calls(final_state.get("llm_calls", 0))
+            else:
+                final_state = await self.graph.ainvoke(initial_state)
+            result = {
                 "sql_response": final_state["sql_response"],
                 "sql_result": final_state["sql_result"],
                 "rag_result": final_state["rag_result"],
                 "response": final_state["final_response"]
             }
+            if answer_key and final_state.get("answer_cacheable"):
+                await result_cache.set(answer_key, {
+                    **result,
+                    "sql_response": result["sql_response"].model_dump() if result["sql_response"] else None
+                })
+            return result
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
             return {
@@ -341,6 +574,7 @@ SQL Query Result: {sql_result}
             self,
             state: ChatBotState
     ):
+        tag_route("rag")
         try:
             logger.info("Starting RAG process")
             state = await RAGProcess()._rag_process(
@@ -0,0 +1,135 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from config.settings import settings
+from logger import logger
+from metrics import registry
+
+LLM_HEDGES = registry.counter(
+    "chatbot_llm_hedges_total",
+    "Hedged duplicate LLM requests by outcome (fired, won)",
+    ["operation", "outcome"]
+)
+LLM_DEADLINE_EXCEEDED = registry.counter(
+    "chatbot_llm_deadline_exceeded_total",
+    "LLM calls abandoned because the request deadline passed",
+    ["operation"]
+)
+
+
+class LLMDeadlineExceeded(Exception):
+    pass
+
+
+class LatencyTracker:
+    """
+    Recent LLM latencies per operation, used to pick the hedge delay
+    """
+    def __init__(
+            self,
+            window: int = 200
+    ):
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+            self,
+            operation: str,
+            seconds: float
+    ):
+        with self._lock:
+            self._samples.setdefault(operation, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(
+            self,
+            operation: str,
+            pct: float
+    ) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(operation, ()))
+        if len(samples) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(int(len(samples) * pct / 100), len(samples) - 1)]
+
+llm_latencies = LatencyTracker()
+
+
+def new_deadline() -> float:
+    """
+    Absolute deadline (time.monotonic) for one chat request
+    """
+    return time.monotonic() + settings.CHAT_REQUEST_DEADLINE_SECONDS
+
+def hedge_delay(operation: str) -> float:
+    observed = llm_latencies.percentile(operation, settings.LLM_HEDGE_PERCENTILE)
+    if observed is None:
+        return settings.LLM_HEDGE_INITIAL_DELAY_MS / 1000
+    return max(observed, settings.LLM_HEDGE_MIN_DELAY_MS / 1000)
+
+async def call_llm(
+        operation: str,
+        chain: Any,
+        inputs: Dict[str, Any],
+        deadline: Optional[float] = None
+) -> Any:
+    """
+    Invoke a LangChain runnable within the request deadline.
+
+    When the call is still running after the hedge delay (the recent
+    LLM_HEDGE_PERCENTILE latency for this operation), a duplicate request is
+    fired and the first successful result wins; the other is cancelled. A
+    failed attempt is retried immediately while attempts and time remain.
+
+    Raises:
+        LLMDeadlineExceeded: no attempt finished before the deadline
+    """
+    deadline = deadline or new_deadline()
+    max_attempts = 1 + (settings.LLM_MAX_HEDGES if settings.LLM_HEDGING_ENABLED else 0)
+    delay = hedge_delay(operation)
+    start = time.monotonic()
+    pending = set()
+    started = {}
+    attempts = 0
+    last_error: Optional[BaseException] = None
+
+    def launch():
+        nonlocal attempts
+        attempts += 1
+        task = asyncio.create_task(chain.ainvoke(inputs))
+        started[task] = time.monotonic()
+        pending.add(task)
+        if attempts > 1:
+            LLM_HEDGES.inc(operation=operation, outcome="fired")
+
+    try:
+        launch()
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            can_hedge = attempts < max_attempts
+            timeout = min(remaining, max(delay - (time.monotonic() - start), 0)) if can_hedge else remaining
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                pending.discard(task)
+                if task.exception() is None:
+                    llm_latencies.observe(operation, time.monotonic() - started[task])
+                    if started[task] != min(started.values()):
+                        LLM_HEDGES.inc(operation=operation, outcome="won")
+                    return task.result()
+                last_error = task.exception()
+                logger.warning(f"LLM call for {operation} failed: {last_error}")
+            if can_hedge and (not pending or time.monotonic() - start >= delay):
+                # Hedge a slow call, or retry straight away after a failure
+                launch()
+                start = time.monotonic()
+        if last_error is not None and time.monotonic() < deadline:
+            raise last_error
+        LLM_DEADLINE_EXCEEDED.inc(operation=operation)
+        raise LLMDeadlineExceeded(f"LLM call for {operation} did not finish before the request deadline")
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,38 @@
+from config.settings import settings
+
+def get_chat_model(
+        temperature: float = 0.1
+):
+    """
+    Chat model used by the graph. LLM_PROVIDER=fake swaps in the deterministic
+    offline model from core.fake_models.
+    """
+    if settings.LLM_PROVIDER == "fake":
+        from core.fake_models import FakeChatModel
+        return FakeChatModel(
+            latency_ms=settings.FAKE_LLM_LATENCY_MS,
+            jitter_ms=settings.FAKE_LLM_JITTER_MS,
+            tail_fraction=settings.FAKE_LLM_TAIL_FRACTION,
+            tail_latency_ms=settings.FAKE_LLM_TAIL_LATENCY_MS
+        )
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(
+        model = settings.GOOGLE_GEMINI_MODEL,
+        google_api_key = settings.GOOGLE_API_KEY,
+        temperature = temperature
+    )
+
+def get_embedding_model():
+    """
+    Embedding model used for document ingestion and retrieval
+    """
+    if settings.LLM_PROVIDER == "fake":
+        from core.fake_models import FakeEmbeddings
+        return FakeEmbeddings(
+            latency_ms=settings.FAKE_EMBEDDING_LATENCY_MS
+        )
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    return GoogleGenerativeAIEmbeddings(
+        model=settings.GOOGLE_EMBEDDING_MODEL,
+        google_api_key=settings.GOOGLE_API_KEY
+    )
@@ -0,0 +1,223 @@
+import json
+import math
+from typing import Any, Callable, Dict, List
+from logger import logger
+from metrics import PROMPT_TOKENS, PROMPT_COMPACTIONS
+
+# Below this a section is not worth sending at all
+MIN_SECTION_TOKENS = 64
+
+def count_tokens(text: str) -> int:
+    """
+    Local token estimate (~4 characters per token for Gemini/GPT style
+    tokenizers). Good enough for budgeting without a tokenizer round trip.
+    """
+    return math.ceil(len(text) / 4) if text else 0
+
+def render(value: Any) -> str:
+    """
+    Compact JSON rendering used for every prompt section
+    """
+    if hasattr(value, "model_dump"):
+        value = value.model_dump()
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str, separators=(",", ":"))
+
+def truncate_to_budget(text: str, budget: int) -> str:
+    if count_tokens(text) <= budget:
+        return text
+    limit = max(budget * 4 - 20, 0)
+    return text[:limit] + " ...[truncated]"
+
+
+def compact_table_info(documents: List[Dict[str, Any]], budget: int) -> str:
+    """
+    Reduce table profiles step by step: fewer sample rows, shorter
+    top-value lists, then drop bookkeeping fields.
+    """
+    levels = [
+        {"sample_rows": 5, "top_values": 50, "drop_fields": False},
+        {"sample_rows": 2, "top_values": 20, "drop_fields": True},
+        {"sample_rows": 1, "top_values": 10, "drop_fields": True},
+        {"sample_rows": 0, "top_values": 3, "drop_fields": True},
+        {"sample_rows": 0, "top_values": 0, "drop_fields": True}
+    ]
+    text = render(documents)
+    for level in levels:
+        reduced = []
+        for document in documents or []:
+            document = dict(document)
+            if level["drop_fields"]:
+                for field in ("file_id", "uploaded_at", "file_extension"):
+                    document.pop(field, None)
+            if "first_5_row" in document:
+                document["first_5_row"] = document["first_5_row"][:level["sample_rows"]]
+            object_cols = []
+            for column in document.get("object_cols_data", []):
+                column = dict(column)
+                values = column.get("top_50_unique_values", [])
+                column["top_50_unique_values"] = values[:level["top_values"]]
+                if len(values) > level["top_values"]:
+                    column["more_values_omitted"] = len(values) - level["top_values"]
+                object_cols.append(column)
+            if object_cols:
+                document["object_cols_data"] = object_cols
+            reduced.append(document)
+        text = render(reduced)
+        if count_tokens(text) <= budget:
+            return text
+    return truncate_to_budget(text, budget)
+
+
+def _summarize_rows(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    columns = list(rows[0].keys()) if rows else []
+    numeric_summary = {}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        numbers = [value for value in values if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if numbers and len(numbers) == len([value for value in values if value is not None]):
+            numeric_summary[column] = {
+                "min": min(numbers),
+                "max": max(numbers),
+                "sum": round(sum(numbers), 4),
+                "mean": round(sum(numbers) / len(numbers), 4)
+            }
+    return {
+        "row_count": len(rows),
+        "columns": columns,
+        "numeric_summary": numeric_summary
+    }
+
+
+def compact_sql_result(rows: List[Dict[str, Any]], budget: int) -> str:
+    """
+    Keep the leading rows that fit (results are usually ordered) plus a
+    summary computed over all rows.
+    """
+    text = render(rows)
+    if count_tokens(text) <= budget or not isinstance(rows, list) or not rows:
+        return truncate_to_budget(text, budget)
+
+    summary = _summarize_rows(rows)
+    low, high = 0, len(rows)
+    while low < high:
+        middle = (low + high + 1) // 2
+        candidate = render({**summary, "rows_shown": middle, "rows": rows[:middle]})
+        if count_tokens(candidate) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return truncate_to_budget(render({**summary, "rows_shown": low, "rows": rows[:low]}), budget)
+
+
+def compact_rag_result(rag_result: Dict[str, Any], budget: int) -> str:
+    """
+    Share the budget equally between retrieved chunks, dropping the least
+    relevant chunks when even a fair share is too small to be useful.
+    """
+    text = render(rag_result)
+    docs = (rag_result or {}).get("retrieved_docs") or []
+    if count_tokens(text) <= budget or not docs:
+        return truncate_to_budget(text, budget)
+
+    kept = list(docs)
+    while kept:
+        share = budget // len(kept) - 16
+        if share >= MIN_SECTION_TOKENS or len(kept) == 1:
+            compacted = {
+                **rag_result,
+                "retrieved_docs": [
+                    {**doc, "content": truncate_to_budget(str(doc.get("content", "")), max(share, 1))}
+                    for doc in kept
+                ]
+            }
+            return truncate_to_budget(render(compacted), budget)
+        kept = kept[:-1]
+    return truncate_to_budget(text, budget)
+
+
+def compact_conversation(history: Dict[str, Any], budget: int) -> str:
+    """
+    Render the rolling summary and recent turns. The summary gets at most
+    half the budget; the newest turns are kept whole and older ones dropped
+    first, with the oldest kept turn truncated to fill what is left.
+    """
+    summary = (history or {}).get("summary") or ""
+    messages = (history or {}).get("messages") or []
+    if not summary and not messages:
+        return "(no earlier messages)"
+
+    lines = []
+    if summary:
+        summary = truncate_to_budget(summary, budget // 2)
+        lines.append(f"Summary of earlier conversation: {summary}")
+    remaining = budget - count_tokens("\n".join(lines))
+    turns = []
+    for message in reversed(messages):
+        line = f"{message.get('role', 'user')}: {message.get('message', '')}"
+        if count_tokens(line) > remaining:
+            if remaining >= MIN_SECTION_TOKENS // 2:
+                turns.append(truncate_to_budget(line, remaining))
+            break
+        turns.append(line)
+        remaining -= count_tokens(line) + 1
+    return "\n".join(lines + list(reversed(turns)))
+
+
+SECTION_COMPACTORS: Dict[str, Callable[[Any, int], str]] = {
+    "table_information": compact_table_info,
+    "sql_result": compact_sql_result,
+    "rag_result": compact_rag_result
+}
+
+
+class PromptBudget:
+    """
+    Assemble prompt inputs within a token budget.
+
+    The template and fixed inputs (e.g. the user query) are charged first;
+    the remainder is split between the variable sections. Sections are
+    visited smallest first and a section that needs less than its fair share
+    hands the rest to the larger ones. Oversized sections are compacted by
+    their SECTION_COMPACTORS entry.
+    """
+    def __init__(
+            self,
+            node: str,
+            total_tokens: int
+    ):
+        self.node = node
+        self.total_tokens = total_tokens
+
+    def assemble(
+            self,
+            template: str,
+            fixed: Dict[str, Any],
+            sections: Dict[str, Any]
+    ) -> Dict[str, str]:
+        rendered_fixed = {name: render(value) for name, value in fixed.items()}
+        used = count_tokens(template) + sum(count_tokens(text) for text in rendered_fixed.values())
+        available = max(self.total_tokens - used, MIN_SECTION_TOKENS * max(len(sections), 1))
+
+        rendered = {name: render(value) for name, value in sections.items()}
+        result = dict(rendered_fixed)
+        remaining = list(sorted(sections, key=lambda name: count_tokens(rendered[name])))
+        while remaining:
+            name = remaining.pop(0)
+            share = available // (len(remaining) + 1)
+            needed = count_tokens(rendered[name])
+            if needed <= share:
+                result[name] = rendered[name]
+            else:
+                compactor = SECTION_COMPACTORS.get(name)
+                value = sections[name]
+                result[name] = compactor(value, share) if compactor else truncate_to_budget(rendered[name], share)
+                PROMPT_COMPACTIONS.inc(node=self.node, section=name)
+                logger.info(f"Compacted {name} for {self.node} from {needed} to {count_tokens(result[name])} tokens")
+            available -= count_tokens(result[name])
+
+        prompt_tokens = count_tokens(template) + sum(count_tokens(text) for text in result.values())
+        PROMPT_TOKENS.observe(prompt_tokens, node=self.node)
+        logger.info(f"Prompt for {self.node}: ~{prompt_tokens} tokens (budget {self.total_tokens})")
+        return result
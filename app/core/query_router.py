@@ -0,0 +1,135 @@
+import os
+import re
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+GREETING_PATTERN = re.compile(
+    r"\b(hi|hii+|hello|hey|hola|good\s+(morning|afternoon|evening|day)|greetings|yo)\b",
+    re.IGNORECASE
+)
+THANKS_PATTERN = re.compile(
+    r"\b(thanks|thank\s+you|thank|thx|ty|cheers|great|ok|okay|cool|bye|goodbye|see\s+you)\b",
+    re.IGNORECASE
+)
+# Words that may accompany a greeting or thanks without asking anything
+SMALL_TALK_FILLER = re.compile(
+    r"\b(there|all|everyone|so|very|much|a|lot|again|for|the|your|you|help|bot|chatbot|friend|"
+    r"sir|madam|team|nice|awesome|perfect|got\s+it|that's|thats|it|is|and|now)\b",
+    re.IGNORECASE
+)
+OFF_TOPIC_PATTERN = re.compile(
+    r"\b(joke|poem|song|weather|recipe|movie|who\s+are\s+you|what\s+is\s+your\s+name|your\s+name|"
+    r"what\s+can\s+you\s+do|how\s+are\s+you)\b",
+    re.IGNORECASE
+)
+DOCUMENT_PATTERN = re.compile(
+    r"\b(document|documents|pdf|docx|file\s+says|according\s+to|paragraph|"
+    r"policy|contract|agreement|summary\s+of\s+the)\b",
+    re.IGNORECASE
+)
+# Also common in table questions ("sales report by region")
+WEAK_DOCUMENT_PATTERN = re.compile(r"\b(report|reports|section|sections)\b", re.IGNORECASE)
+FINANCE_PATTERN = re.compile(
+    r"\b(revenue|sales|amount|price|cost|costs|expense|expenses|profit|loss|income|balance|spend|"
+    r"salary|payment|payments|transaction|transactions|budget|tax|invoice|cash|total|sum|average|"
+    r"count|how\s+many|how\s+much|rows?|table|data|month|quarter|year|q[1-4])\b",
+    re.IGNORECASE
+)
+# Questions that lean on earlier turns ("and for last quarter?", "break that down by region")
+FOLLOW_UP_PATTERN = re.compile(
+    r"^\s*(and|also|but|then|now|what\s+about|how\s+about|same)\b|"
+    r"\b(it|its|that|those|these|they|them|their|previous|above|earlier|again|instead|else|rest|too)\b",
+    re.IGNORECASE
+)
+# Longer messages are never treated as small talk
+SMALL_TALK_MAX_WORDS = 6
+
+DIRECT_REPLIES = {
+    "greeting": "Hello! I am a Financial ChatBot. Ask me a question about your uploaded financial data or documents.",
+    "thanks": "You're welcome! Let me know if you have any other questions about your financial data.",
+    "off_topic": "I am a Financial ChatBot. Please ask me questions related to financial data.",
+    "no_data": "No documents found. Please upload files first."
+}
+
+Intent = Literal["greeting", "thanks", "off_topic", "documents", "data"]
+Route = Literal["sql", "rag", "respond"]
+
+
+def vector_store_path(
+        user_id: str,
+        session_id: str
+) -> str:
+    """
+    Location of the FAISS index built for a user's session
+    """
+    return os.path.join(
+        "vectorstores",
+        f"{user_id}",
+        f"document_{user_id}_{session_id}"
+    )
+
+def small_talk_intent(query: str) -> Optional[Intent]:
+    """
+    "greeting" or "thanks" when the whole message is small talk, so
+    "hi, list the top 5 vendors" is not answered with a greeting
+    """
+    if len(query.split()) > SMALL_TALK_MAX_WORDS:
+        return None
+    greeting = bool(GREETING_PATTERN.search(query))
+    thanks = bool(THANKS_PATTERN.search(query))
+    if not greeting and not thanks:
+        return None
+    rest = SMALL_TALK_FILLER.sub(" ", THANKS_PATTERN.sub(" ", GREETING_PATTERN.sub(" ", query)))
+    if re.search(r"\w", rest):
+        return None
+    return "greeting" if greeting else "thanks"
+
+def is_follow_up(query: str) -> bool:
+    """
+    Whether a question may depend on the conversation before it; only
+    standalone questions share cached SQL and answers
+    """
+    return bool(FOLLOW_UP_PATTERN.search(query))
+
+def classify_intent(user_query: str) -> Intent:
+    """
+    Keyword based intent classifier. It only has to be right about the
+    cheap cases (small talk, obvious document questions); anything it is
+    unsure about is classified as "data" and keeps the LLM path.
+    """
+    query = user_query.strip()
+    mentions_finance = bool(FINANCE_PATTERN.search(query))
+    small_talk = small_talk_intent(query)
+    if small_talk:
+        return small_talk
+    if OFF_TOPIC_PATTERN.search(query) and not mentions_finance:
+        return "off_topic"
+    # A document cue next to data terms ("summary of the expenses") is still a data question
+    if (DOCUMENT_PATTERN.search(query) or WEAK_DOCUMENT_PATTERN.search(query)) and not mentions_finance:
+        return "documents"
+    return "data"
+
+def route_query(
+        user_query: str,
+        table_info: Optional[List[Dict[str, Any]]],
+        has_documents: bool
+) -> Tuple[Route, str, Optional[str]]:
+    """
+    Decide the next step without calling the LLM. SQL is only skipped for
+    small talk, off-topic messages and sessions without tables; with tables
+    the SQL path runs and falls back to the documents when it finds nothing.
+
+    Returns:
+        (route, reason, direct reply text or None)
+    """
+    intent = classify_intent(user_query)
+    has_tables = bool(table_info)
+
+    if intent in ("greeting", "thanks", "off_topic"):
+        return "respond", intent, DIRECT_REPLIES[intent]
+    if not has_tables and not has_documents:
+        return "respond", "no_data", DIRECT_REPLIES["no_data"]
+    if not has_tables:
+        return "rag", "documents_only", None
+    if intent == "documents" and has_documents:
+        return "sql", "document_question", None
+    return "sql", "tables_available", None
@@ -1,9 +1,7 @@
-import os
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from schema.models import ChatBotState
-from logger import logger, log_exception
-from config.settings import settings
+from logger import logger, StateSummary
+from core.session_cache import session_cache
+from metrics import track_call, RAG_CHUNKS_RETURNED
 
 class RAGProcess:
     def __init__(self):
@@ -19,16 +17,14 @@ class RAGProcess:
         try:
             logger.info(f"Startinf RAG process for user: {state['user_id']}, session: {state['session_id']}")
 
-            # Step1: Check if vector store exists for this user/session
-            vector_path = os.path.join(
-                "vectorstores",
-                f"{state["user_id"]}",
-                f"document_{state["user_id"]}_{state["session_id"]}"
-            )
-            logger.info(f"Vector store path: {vector_path}")
-            if not os.path.exists(
-                vector_path
-            ):
+            # Step1: Load the vector store of this user/session (unless preloaded for a batch)
+            vector_store = state.get("vector_store")
+            if vector_store is None:
+                vector_store = await session_cache.vector_store(
+                    state["user_id"],
+                    state["session_id"]
+                )
+            if vector_store is None:
                 logger.warning("No document vector store found for user")
                 state["rag_result"] = {
                     "success": False,
@@ -37,16 +33,13 @@ class RAGProcess:
                 }
                 return state
 
-            # Step2: Load vector store
-            vector_store = await self._get_vector_store(
-                vector_path
-            )
-
-            # Step3: Perform similarity search
-            retrieved_docs = vector_store.similarity_search_with_score(
-                state["user_query"],
-                k=3
-            )
+            # Step2: Perform similarity search
+            with track_call("embeddings", "similarity_search"):
+                retrieved_docs = vector_store.similarity_search_with_score(
+                    state["user_query"],
+                    k=3
+                )
+            RAG_CHUNKS_RETURNED.observe(len(retrieved_docs))
 
             if not retrieved_docs:
                 logger.warning("No relevant documents found for the query")
@@ -57,16 +50,21 @@ class RAGProcess:
                 }
                 return state
             
-            # Step4: Extract and format retrieved content
+            # Step3: Extract and format retrieved content
             retrieved_content = []
             for i, (doc, score) in enumerate(retrieved_docs):
-                retrieved_content.append({
+                content = {
                     "chunk_id": i + 1,
                     "content": doc.page_content,
                     "relevance_score": float(score)
-                })
+                }
+                # Where the chunk came from, for documents indexed with chunk metadata
+                for key in ("source", "page", "section"):
+                    if doc.metadata.get(key):
+                        content[key] = doc.metadata[key]
+                retrieved_content.append(content)
 
-            # Step5: Store RAG results in state
+            # Step4: Store RAG results in state
             state["rag_result"] = {
                 "success": True,
                 "message": "Documents retrieved successfully",
@@ -74,7 +72,7 @@ class RAGProcess:
                 "total_chunks": len(retrieved_content)
             }
             logger.info(f"RAG process completed. Retrieved {len(retrieved_content)} relevant chunks")
-            logger.info(f"State after RAG process: {str(state)}")
+            logger.debug("State after RAG process: %s", StateSummary(state))
             return state
 
         except Exception as e:
@@ -85,26 +83,3 @@ class RAGProcess:
                 "retrieved_docs":  []
             }
             return state
-        
-
-    async def _get_vector_store(
-            self,
-            vector_path
-    ):
-        """
-        Load vector store
-        """
-        try:
-            embedding = GoogleGenerativeAIEmbeddings(
-            model=settings.GOOGLE_EMBEDDING_MODEL,
-            google_api_key=settings.GOOGLE_API_KEY
-        )
-        
-            vector_store = FAISS.load_local(
-                vector_path,
-                embedding,
-                allow_dangerous_deserialization=True
-            )
-            return vector_store
-        except Exception as e:
-            return log_exception(e, logger)
\ No newline at end of file
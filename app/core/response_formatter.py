@@ -0,0 +1,153 @@
+import re
+import math
+import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from config.settings import settings
+from metrics import registry
+
+# Questions that need interpretation rather than a restated number
+INTERPRETATION_PATTERN = re.compile(
+    r"\b(why|explain|trend|trends|compare|comparison|insight|insights|analy[sz]e|analysis|"
+    r"recommend|should|suggest|forecast|predict|summari[sz]e|reason)\b",
+    re.IGNORECASE
+)
+# Column patterns match whole words of `column_words`, so "rate" does not match "generated"
+CURRENCY_PATTERN = re.compile(
+    r"\b(revenues?|sales|amounts?|prices?|costs?|expenses?|profits?|income|balances?|spend|spending|"
+    r"salary|salaries|payments?|values?)\b"
+)
+NON_CURRENCY_PATTERN = re.compile(
+    r"\b(counts?|qty|quantity|quantities|numbers?|num|units?|percent|percentage|pct|ratios?|rates?|id)\b"
+)
+PERCENT_PATTERN = re.compile(r"\b(percent|percentage|pct|ratios?|rates?)\b")
+# Shares and margins are percentages only as the head noun ("profit margin", not "share price")
+SHARE_PATTERN = re.compile(r"\b(shares?|margins?)$")
+AGGREGATE_PATTERN = re.compile(r"^\s*(sum|avg|count|min|max)\s*\(\s*(distinct\s+)?`?([^`)]*)`?\s*\)\s*$", re.IGNORECASE)
+AGGREGATE_LABELS = {"sum": "total", "avg": "average", "count": "number of", "min": "minimum", "max": "maximum"}
+
+
+class FastPathStats:
+    """
+    How many responses were produced locally versus by the LLM
+    """
+    def __init__(self):
+        self.fast = 0
+        self.llm = 0
+
+    def record(self, path: str):
+        if path == "fast":
+            self.fast += 1
+        else:
+            self.llm += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        total = self.fast + self.llm
+        return {
+            "fast_path_responses": self.fast,
+            "llm_responses": self.llm,
+            "fast_path_fraction": round(self.fast / total, 4) if total else 0.0
+        }
+
+response_stats = FastPathStats()
+
+registry.gauge(
+    "chatbot_fast_path_response_fraction",
+    "Fraction of responses generated without the final LLM call",
+    lambda: response_stats.snapshot()["fast_path_fraction"]
+)
+
+
+def column_label(column: str) -> str:
+    """
+    `SUM(\\`revenue\\`)` -> "total revenue", `total_revenue` -> "total revenue"
+    """
+    match = AGGREGATE_PATTERN.match(column)
+    if match:
+        target = match.group(3).strip().replace("_", " ")
+        label = AGGREGATE_LABELS[match.group(1).lower()]
+        if target in ("*", "1", ""):
+            return "number of rows" if label == "number of" else label
+        return f"{label} {target}"
+    return column.strip("`").replace("_", " ").strip()
+
+def column_words(column: str) -> str:
+    """
+    `SUM(\\`discountAmount\\`)` -> "sum discount amount"
+    """
+    column = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", column)
+    return " ".join(re.split(r"[^a-z0-9]+", column.lower())).strip()
+
+def is_missing(value: Any) -> bool:
+    """
+    None, or the NaN / NaT / NA that pandas results carry for SQL NULLs
+    """
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return math.isnan(value)
+    if isinstance(value, Decimal):
+        return value.is_nan()
+    return type(value).__name__ in ("NaTType", "NAType")
+
+def format_value(column: str, value: Any) -> str:
+    if is_missing(value):
+        return "n/a"
+    if isinstance(value, bool):
+        return "yes" if value else "no"
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (int, float, Decimal)):
+        number = float(value)
+        words = column_words(column)
+        if (
+            ("%" in column or PERCENT_PATTERN.search(words)) and not CURRENCY_PATTERN.search(words)
+        ) or (SHARE_PATTERN.search(words) and abs(number) <= 100):
+            return f"{number:,.2f}%"
+        if CURRENCY_PATTERN.search(words) and not NON_CURRENCY_PATTERN.search(words):
+            return f"{settings.RESPONSE_CURRENCY_SYMBOL}{number:,.2f}"
+        if number.is_integer():
+            return f"{int(number):,}"
+        return f"{number:,.2f}"
+    return str(value)
+
+def needs_interpretation(user_query: str) -> bool:
+    if INTERPRETATION_PATTERN.search(user_query):
+        return True
+    # Answers are phrased in English; other languages go through the LLM
+    return any(not char.isascii() and char.isalpha() for char in user_query)
+
+def format_fast_response(
+        user_query: str,
+        rows: List[Dict[str, Any]]
+) -> Optional[str]:
+    """
+    Phrase a scalar or small tabular SQL result without calling the LLM.
+
+    Returns:
+        The response text, or None when the result needs the LLM
+    """
+    if not rows or needs_interpretation(user_query):
+        return None
+    columns = list(rows[0].keys())
+    if len(rows) > settings.FAST_PATH_MAX_ROWS or len(columns) > settings.FAST_PATH_MAX_COLUMNS:
+        return None
+
+    if len(rows) == 1 and len(columns) == 1:
+        column = columns[0]
+        value = rows[0][column]
+        if is_missing(value):
+            return "No data found for your query."
+        return f"The {column_label(column)} is {format_value(column, value)}."
+
+    if len(rows) == 1:
+        parts = [f"{column_label(column)}: {format_value(column, rows[0][column])}" for column in columns]
+        return "Here is the result for your query: " + "; ".join(parts) + "."
+
+    header = "| " + " | ".join(column_label(column) for column in columns) + " |"
+    divider = "| " + " | ".join("---" for _ in columns) + " |"
+    lines = [
+        "| " + " | ".join(format_value(column, row.get(column)) for column in columns) + " |"
+        for row in rows
+    ]
+    return "\n".join([f"Here are the {len(rows)} results for your query:", "", header, divider, *lines])
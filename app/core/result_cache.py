@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+from config.settings import settings
+from logger import logger
+from metrics import registry
+
+RESULT_CACHE_REQUESTS = registry.counter(
+    "chatbot_result_cache_requests_total",
+    "Generated SQL, result set and answer lookups by the tier that served them",
+    ["kind", "tier"]
+)
+
+# Bump when the shape of cached values changes
+CACHE_FORMAT_VERSION = 1
+
+def digest(*parts: Any) -> str:
+    text = json.dumps(parts, ensure_ascii=False, default=str, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def session_prefix(
+        user_id: str,
+        session_id: str
+) -> str:
+    """
+    Key prefix shared by every entry of a session, so a purge can drop them together
+    """
+    return digest(user_id, session_id)[:24]
+
+def cache_key(
+        kind: str,
+        user_id: str,
+        session_id: str,
+        upload_version: str,
+        *parts: Any
+) -> str:
+    """
+    `{session}:{kind}:{format}:{upload state}:{digest of parts}`. Entries of
+    an older upload state are never read again and age out of both tiers.
+    """
+    return f"{session_prefix(user_id, session_id)}:{kind}:{CACHE_FORMAT_VERSION}:{upload_version}:{digest(*parts)}"
+
+
+class SQLiteStore:
+    """
+    Shared cache tier in a local SQLite file (WAL mode), readable by every
+    worker process on the host. Each thread keeps its own connection.
+    """
+    def __init__(
+            self,
+            path: str
+    ):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl_seconds)
+        )
+        self._writes += 1
+        if self._writes % 500 == 0:
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+
+    def delete_prefix(self, prefix: str) -> int:
+        return self._connection().execute(
+            "DELETE FROM cache WHERE key >= ? AND key < ?",
+            (prefix + ":", prefix + ";")
+        ).rowcount
+
+
+class ResultCache:
+    """
+    Two-level cache for FinancialChatBot: an in-process LRU in front of a
+    store shared by all workers on the host.
+
+    Lookups try the LRU, then the shared store (promoting hits into the
+    LRU); writes go to both. Values are JSON. Keys carry the session's upload
+    state (see `core.session_cache.upload_state`), so an upload makes every
+    earlier SQL, result set and answer of the session unreachable without
+    any cross-worker invalidation.
+    """
+    def __init__(
+            self,
+            max_entries: int,
+            store: Optional[SQLiteStore]
+    ):
+        self.max_entries = max_entries
+        self.store = store
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(
+            self,
+            kind: str,
+            key: str
+    ) -> Optional[Any]:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                RESULT_CACHE_REQUESTS.inc(kind=kind, tier="local")
+                return entry[1]
+            del self._entries[key]
+
+        if self.store is not None:
+            try:
+                raw = await asyncio.to_thread(self.store.get, key)
+            except Exception as e:
+                logger.warning(f"Shared cache read failed: {e}")
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self._remember(key, value)
+                RESULT_CACHE_REQUESTS.inc(kind=kind, tier="shared")
+                return value
+
+        RESULT_CACHE_REQUESTS.inc(kind=kind, tier="miss")
+        return None
+
+    async def set(
+            self,
+            key: str,
+            value: Any
+    ):
+        # Both tiers hold the JSON form, so a hit looks the same whichever tier served it
+        raw = json.dumps(value, ensure_ascii=False, default=str)
+        self._remember(key, json.loads(raw))
+        if self.store is not None:
+            try:
+                await asyncio.to_thread(self.store.set, key, raw, settings.RESULT_CACHE_TTL_SECONDS)
+            except Exception as e:
+                logger.warning(f"Shared cache write failed: {e}")
+
+    async def drop_session(
+            self,
+            user_id: str,
+            session_id: str
+    ):
+        """
+        Remove every entry of a session from this worker and the shared store
+        """
+        prefix = session_prefix(user_id, session_id)
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+        if self.store is not None:
+            try:
+                removed = await asyncio.to_thread(self.store.delete_prefix, prefix)
+                logger.info(f"Removed {removed} shared cache entries of session {session_id}")
+            except Exception as e:
+                logger.warning(f"Shared cache cleanup failed: {e}")
+
+    def _remember(
+            self,
+            key: str,
+            value: Any
+    ):
+        self._entries[key] = (time.monotonic() + settings.RESULT_CACHE_TTL_SECONDS, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+result_cache = ResultCache(
+    settings.RESULT_CACHE_LOCAL_ENTRIES,
+    SQLiteStore(settings.RESULT_CACHE_PATH) if settings.RESULT_CACHE_BACKEND == "sqlite" else None
+)
+
+registry.gauge(
+    "chatbot_result_cache_local_entries",
+    "Entries in this worker's in-process result cache",
+    result_cache.size
+)
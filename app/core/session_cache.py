@@ -0,0 +1,314 @@
+import os
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from sqlalchemy import text
+from config.settings import settings
+from database.database import db_manager
+from logger import logger
+from metrics import registry, track_call
+from core.query_router import vector_store_path
+from core.single_flight import SingleFlight
+
+SESSION_CACHE_REQUESTS = registry.counter(
+    "chatbot_session_cache_requests_total",
+    "Session table info and vector index lookups served from the in-process cache",
+    ["artifact", "outcome"]
+)
+
+SessionKey = Tuple[str, str]
+
+def upload_state(
+        document: Optional[Dict[str, Any]]
+) -> str:
+    """
+    Version token of a session's uploads: the documents_data creation time
+    plus the upload counter. The creation time keeps the token from
+    repeating when a purged session is uploaded to again.
+    """
+    document = document or {}
+    created_at = document.get("created_at")
+    epoch = int(created_at.timestamp() * 1000) if created_at else 0
+    return f"{epoch}.{document.get('upload_version', 0)}"
+
+async def load_upload_version(
+        user_id: str,
+        session_id: str
+) -> str:
+    """
+    Current upload state token of the session (see `upload_state`)
+    """
+    with track_call("mongodb", "fetch_upload_version"):
+        document = await db_manager.database.documents_data.find_one(
+            {
+                "user_id": user_id,
+                "session_id": session_id
+            },
+            {
+                "_id": 0,
+                "created_at": 1,
+                "upload_version": 1
+            }
+        )
+    return upload_state(document)
+
+async def load_table_info(
+        user_id: str,
+        session_id: str
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Table profiles of every upload in the session and the upload state they belong to
+    """
+    with track_call("mongodb", "fetch_table_info"):
+        document = await db_manager.database.documents_data.find_one(
+            {
+                "user_id": user_id,
+                "session_id": session_id
+            },
+            {
+                "_id": 0,
+                "documents": 1,
+                "created_at": 1,
+                "upload_version": 1
+            }
+        )
+    return (document or {}).get("documents", []), upload_state(document)
+
+def _index_mtime(vector_path: str) -> Optional[float]:
+    try:
+        return os.stat(os.path.join(vector_path, "index.faiss")).st_mtime_ns
+    except OSError:
+        return None
+
+def _load_vector_store(vector_path: str):
+    from langchain_community.vectorstores import FAISS
+    from core.model_factory import get_embedding_model
+    with track_call("faiss", "load_local"):
+        return FAISS.load_local(
+            vector_path,
+            get_embedding_model(),
+            allow_dangerous_deserialization=True
+        )
+
+
+class SessionCache:
+    """
+    In-process LRU of the per-session artifacts every chat needs: table
+    profiles from `documents_data` and the session FAISS index.
+
+    Table info is tagged with the session's `upload_version`, which every
+    upload increments, and is only served while that version is current, so
+    an upload handled by another worker is seen on the next chat. The FAISS
+    index is reloaded when its file on disk changes. Concurrent loads of the
+    same artifact share one execution.
+    """
+    def __init__(
+            self,
+            max_sessions: int
+    ):
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[SessionKey, Dict[str, Any]]" = OrderedDict()
+        self._loads = SingleFlight()
+        self._prefetching: Set[SessionKey] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _entry(
+            self,
+            key: SessionKey
+    ) -> Dict[str, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = {}
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(key)
+        return entry
+
+    async def table_info(
+            self,
+            user_id: str,
+            session_id: str,
+            upload_version: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Table info of the session, from the cache while its upload version is
+        current. Callers that already read the version pass it in.
+        """
+        key = (user_id, session_id)
+        entry = self._entries.get(key)
+        if entry and "table_info" in entry:
+            if upload_version is None:
+                upload_version = await load_upload_version(user_id, session_id)
+            if upload_version == entry["upload_version"]:
+                self._entries.move_to_end(key)
+                SESSION_CACHE_REQUESTS.inc(artifact="table_info", outcome="hit")
+                return entry["table_info"]
+        SESSION_CACHE_REQUESTS.inc(artifact="table_info", outcome="miss")
+        (table_info, upload_version), _ = await self._loads.do(
+            ("table_info", key),
+            lambda: load_table_info(user_id, session_id)
+        )
+        entry = self._entry(key)
+        entry["table_info"] = table_info
+        entry["upload_version"] = upload_version
+        return table_info
+
+    async def vector_store(
+            self,
+            user_id: str,
+            session_id: str
+    ):
+        """
+        FAISS index of the session, or None when nothing was uploaded to it
+        """
+        key = (user_id, session_id)
+        vector_path = vector_store_path(user_id, session_id)
+        mtime = _index_mtime(vector_path)
+        entry = self._entries.get(key)
+        if mtime is None:
+            if entry:
+                entry.pop("vector_store", None)
+            return None
+        if entry and entry.get("vector_store") is not None and entry.get("vector_mtime") == mtime:
+            self._entries.move_to_end(key)
+            SESSION_CACHE_REQUESTS.inc(artifact="vector_store", outcome="hit")
+            return entry["vector_store"]
+        SESSION_CACHE_REQUESTS.inc(artifact="vector_store", outcome="miss")
+        vector_store, _ = await self._loads.do(
+            ("vector_store", key, mtime),
+            lambda: asyncio.to_thread(_load_vector_store, vector_path)
+        )
+        entry = self._entry(key)
+        entry["vector_store"] = vector_store
+        entry["vector_mtime"] = mtime
+        return vector_store
+
+    def invalidate(
+            self,
+            user_id: str,
+            session_id: str
+    ):
+        self._entries.pop((user_id, session_id), None)
+
+    def prefetch(
+            self,
+            user_id: str,
+            session_id: str
+    ):
+        """
+        Start loading a session's artifacts in the background, e.g. when the
+        UI opens the session and the first question is about to follow
+        """
+        if not settings.SESSION_PREFETCH_ENABLED:
+            return
+        key = (user_id, session_id)
+        if key in self._prefetching:
+            return
+        self._prefetching.add(key)
+        task = asyncio.create_task(self._prefetch(user_id, session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        task.add_done_callback(lambda _: self._prefetching.discard(key))
+
+    def prefetch_recent(
+            self,
+            user_id: str
+    ):
+        """
+        Prefetch the user's most recently active sessions in the background
+        """
+        if not settings.SESSION_PREFETCH_ENABLED:
+            return
+        task = asyncio.create_task(self._prefetch_recent(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def preload_recent(
+            self,
+            count: int
+    ) -> int:
+        """
+        Load the `count` most recently active sessions, used at startup
+
+        Returns:
+            Number of sessions loaded
+        """
+        try:
+            sessions = await self._recent_sessions({}, count)
+        except Exception as e:
+            logger.warning(f"Could not find sessions to preload: {e}")
+            return 0
+        for user_id, session_id in sessions:
+            await self._prefetch(user_id, session_id)
+        if sessions:
+            logger.info(f"Preloaded {len(sessions)} recently active sessions")
+        return len(sessions)
+
+    async def close(self):
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _prefetch_recent(
+            self,
+            user_id: str
+    ):
+        try:
+            sessions = await self._recent_sessions({"user_id": user_id}, settings.SESSION_PREFETCH_PER_USER)
+            for user_id, session_id in sessions:
+                self.prefetch(user_id, session_id)
+        except Exception as e:
+            logger.warning(f"Could not find sessions to prefetch for user {user_id}: {e}")
+
+    async def _recent_sessions(
+            self,
+            query: Dict[str, Any],
+            count: int
+    ) -> List[SessionKey]:
+        if count <= 0:
+            return []
+        with track_call("mongodb", "find_recent_sessions"):
+            headers = await db_manager.database.chats.find(
+                query,
+                {
+                    "_id": 0,
+                    "user_id": 1,
+                    "session_id": 1
+                }
+            ).sort("last_activity_at", -1).limit(count).to_list(length=count)
+        return [(header["user_id"], header["session_id"]) for header in headers]
+
+    async def _prefetch(
+            self,
+            user_id: str,
+            session_id: str
+    ):
+        try:
+            table_info, _ = await asyncio.gather(
+                self.table_info(user_id, session_id),
+                self.vector_store(user_id, session_id)
+            )
+            if table_info:
+                # Have a checked-in connection ready for the first SQL query
+                await asyncio.to_thread(self._ping_sql)
+            logger.info(f"Prefetched session {session_id} of user {user_id}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Prefetch of session {session_id} failed: {e}")
+
+    def _ping_sql(self):
+        with db_manager.get_sql_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    def size(self) -> int:
+        return len(self._entries)
+
+session_cache = SessionCache(settings.SESSION_CACHE_MAX_SESSIONS)
+
+registry.gauge(
+    "chatbot_session_cache_sessions",
+    "Sessions with table info or a vector index in the in-process cache",
+    session_cache.size
+)
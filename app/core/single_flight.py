@@ -0,0 +1,67 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+from metrics import registry
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls into one shared execution.
+
+    The first caller for a key starts the work in its own task; callers that
+    arrive while it is in flight await the same task. The task is shielded so
+    a cancelled caller (e.g. a client disconnect) does not cancel the work for
+    the others.
+    """
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.llm_calls_saved = 0
+
+    async def do(
+            self,
+            key: Hashable,
+            fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Run `fn` once per key at a time.
+
+        Returns:
+            The result and whether it was shared from another caller's execution
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.create_task(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task), shared
+
+    def record_saved_llm_calls(
+            self,
+            count: int
+    ):
+        self.llm_calls_saved += count
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": len(self._inflight),
+            "executions": self.executions,
+            "coalesced_requests": self.coalesced,
+            "llm_calls_saved": self.llm_calls_saved
+        }
+
+query_flights = SingleFlight()
+
+registry.gauge(
+    "chatbot_single_flight_coalesced_requests",
+    "Chat queries served from an identical in-flight execution",
+    lambda: query_flights.coalesced
+)
+registry.gauge(
+    "chatbot_single_flight_llm_calls_saved",
+    "LLM calls avoided by coalescing identical chat queries",
+    lambda: query_flights.llm_calls_saved
+)
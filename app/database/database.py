@@ -1,14 +1,136 @@
+import time
+import asyncio
+import threading
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
-from typing import Optional
+from typing import Optional, Dict, Any, List
+from pymongo import IndexModel, ASCENDING
 from config.settings import settings
 from logger import logger, log_exception
-from sqlalchemy import create_engine, text
+from metrics import registry
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+class PoolStats:
+    """
+    Checkout wait time and usage counters for the SQL connection pool
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.last_wait_seconds = 0.0
+
+    def record_checkout(
+            self,
+            wait_seconds: float
+    ):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait_seconds += wait_seconds
+            self.last_wait_seconds = wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def record_timeout(
+            self
+    ):
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def snapshot(
+            self
+    ) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "total_wait_seconds": round(self.total_wait_seconds, 6),
+                "avg_wait_seconds": round(self.total_wait_seconds / self.checkouts, 6) if self.checkouts else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+                "last_wait_seconds": round(self.last_wait_seconds, 6)
+            }
+
+pool_stats = PoolStats()
+
+# Compound indexes backing the hot MongoDB access paths, keyed by collection name
+MONGO_INDEXES: Dict[str, List[IndexModel]] = {
+    "chats": [
+        # session header upserts in ChatHistoryService and session listing by user_id
+        IndexModel(
+            [("user_id", ASCENDING), ("session_id", ASCENDING)],
+            name="user_id_session_id"
+        ),
+        # SessionLifecycleService.find_expired_sessions
+        IndexModel(
+            [("last_activity_at", ASCENDING)],
+            name="last_activity_at"
+        )
+    ],
+    "chat_buckets": [
+        # ChatHistoryService appends and newest-first page reads
+        IndexModel(
+            [("user_id", ASCENDING), ("session_id", ASCENDING), ("bucket", ASCENDING)],
+            name="user_id_session_id_bucket",
+            unique=True
+        )
+    ],
+    "documents_data": [
+        # find_one in FinancialChatBot._fetch_table_info and UploadService.save_file_and_details
+        IndexModel(
+            [("user_id", ASCENDING), ("session_id", ASCENDING)],
+            name="user_id_session_id"
+        ),
+        # UploadService.find_existing_profile
+        IndexModel(
+            [("user_id", ASCENDING), ("documents.content_hash", ASCENDING)],
+            name="user_id_documents_content_hash"
+        ),
+        # SessionLifecycleService.find_expired_sessions
+        IndexModel(
+            [("last_activity_at", ASCENDING)],
+            name="last_activity_at"
+        )
+    ],
+    "fs.files": [
+        # UploadService.check_exist_files
+        IndexModel(
+            [("metadata.user_id", ASCENDING), ("metadata.session_id", ASCENDING), ("filename", ASCENDING)],
+            name="metadata_user_id_session_id_filename"
+        ),
+        # UploadService.find_existing_upload (content-hash deduplication)
+        IndexModel(
+            [("metadata.user_id", ASCENDING), ("metadata.content_hash", ASCENDING)],
+            name="metadata_user_id_content_hash"
+        )
+    ]
+}
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that measures how long callers wait to check out a connection
+    """
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_stats.record_timeout()
+            raise
+        pool_stats.record_checkout(time.perf_counter() - start)
+        return connection
+
 
 class DatabaseManager:
     def __init__(self):
         self.client: Optional[AsyncIOMotorClient] = None
         self.database = None
         self.fs_bucket = None
+        self.sql_engine: Optional[Engine] = None
+        self.pool_stats = pool_stats
+        self._sql_lock = threading.Lock()
 
     async def connect_to_mongo(self):
         try:
@@ -16,9 +138,23 @@ class DatabaseManager:
             self.database = self.client[settings.MONGODB_NAME]
             self.fs_bucket = AsyncIOMotorGridFSBucket(self.database)
             logger.info("Connected to mongodb")
+            if settings.MONGODB_ENSURE_INDEXES:
+                await self.ensure_indexes()
         except Exception as e:
             return log_exception(e, logger)
-        
+
+    async def ensure_indexes(self):
+        """
+        Create the compound indexes used by chat, upload and session lookups.
+        create_indexes is a no-op for indexes that already exist.
+        """
+        try:
+            for collection_name, indexes in MONGO_INDEXES.items():
+                created = await self.database[collection_name].create_indexes(indexes)
+                logger.info(f"Ensured indexes {created} on {collection_name}")
+        except Exception as e:
+            return log_exception(e, logger)
+
     async def close_mongo_connection(self):
         try:
             if self.client:
@@ -27,12 +163,102 @@ class DatabaseManager:
         except Exception as e:
             return log_exception(e, logger)
 
-def get_sql_engine():
-    engine = create_engine(settings.SQL_CONNECTION_URL)
-    with engine.connect() as conn:
-        conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {settings.SQL_DB_NAME}"))
-    return create_engine(f"{settings.SQL_CONNECTION_URL}/{settings.SQL_DB_NAME}")
+    async def connect_to_sql(self):
+        """
+        Create the SQL engine off the event loop during application startup
+        """
+        try:
+            await asyncio.to_thread(self.get_sql_engine)
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def close_sql_connection(self):
+        try:
+            if self.sql_engine:
+                self.sql_engine.dispose()
+                self.sql_engine = None
+                logger.info("SQL engine disposed")
+        except Exception as e:
+            return log_exception(e, logger)
+
+    def get_sql_engine(self) -> Engine:
+        """
+        Return the pooled SQL engine, creating the database and engine on first use
+        """
+        if self.sql_engine is not None:
+            return self.sql_engine
+        with self._sql_lock:
+            if self.sql_engine is None:
+                if make_url(settings.SQL_CONNECTION_URL).get_backend_name() == "sqlite":
+                    # Embedded database (offline benchmarks): the URL already names the file
+                    database_url = settings.SQL_CONNECTION_URL
+                else:
+                    bootstrap_engine = create_engine(settings.SQL_CONNECTION_URL)
+                    try:
+                        with bootstrap_engine.connect() as conn:
+                            conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {settings.SQL_DB_NAME}"))
+                    finally:
+                        bootstrap_engine.dispose()
+                    database_url = f"{settings.SQL_CONNECTION_URL}/{settings.SQL_DB_NAME}"
+
+                self.sql_engine = create_engine(
+                    database_url,
+                    poolclass=InstrumentedQueuePool,
+                    pool_size=settings.SQL_POOL_SIZE,
+                    max_overflow=settings.SQL_MAX_OVERFLOW,
+                    pool_timeout=settings.SQL_POOL_TIMEOUT,
+                    pool_recycle=settings.SQL_POOL_RECYCLE,
+                    pool_pre_ping=settings.SQL_POOL_PRE_PING
+                )
+                logger.info(
+                    f"SQL engine created with pool_size={settings.SQL_POOL_SIZE}, "
+                    f"max_overflow={settings.SQL_MAX_OVERFLOW}"
+                )
+        return self.sql_engine
+
+    def get_pool_status(self) -> Dict[str, Any]:
+        """
+        Current pool occupancy plus checkout wait statistics
+        """
+        capacity = settings.SQL_POOL_SIZE + max(settings.SQL_MAX_OVERFLOW, 0)
+        status = {
+            "initialized": self.sql_engine is not None,
+            "pool_size": settings.SQL_POOL_SIZE,
+            "max_overflow": settings.SQL_MAX_OVERFLOW,
+            "checked_out": 0,
+            "checked_in": 0,
+            "overflow": 0,
+            "utilization": 0.0
+        }
+        if self.sql_engine is not None:
+            pool = self.sql_engine.pool
+            checked_out = pool.checkedout()
+            status.update({
+                "checked_out": checked_out,
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "utilization": round(checked_out / capacity, 4) if capacity else 0.0
+            })
+        status.update(self.pool_stats.snapshot())
+        return status
 
 db_manager = DatabaseManager()
 
-sql_engine = get_sql_engine()
\ No newline at end of file
+registry.gauge(
+    "chatbot_sql_pool_utilization",
+    "Checked out SQL connections as a fraction of pool_size + max_overflow",
+    lambda: db_manager.get_pool_status()["utilization"]
+)
+registry.gauge(
+    "chatbot_sql_pool_avg_checkout_wait_seconds",
+    "Average time spent waiting to check out a SQL connection",
+    lambda: pool_stats.snapshot()["avg_wait_seconds"]
+)
+registry.gauge(
+    "chatbot_sql_pool_max_checkout_wait_seconds",
+    "Longest time spent waiting to check out a SQL connection",
+    lambda: pool_stats.snapshot()["max_wait_seconds"]
+)
+
+def get_sql_engine() -> Engine:
+    return db_manager.get_sql_engine()
@@ -1,18 +1,110 @@
 import os
+import copy
+import json
+import queue
+import atexit
 import logging
+import logging.handlers
 from datetime import datetime
 import traceback
 import inspect
 
+# Environment only: config.settings imports the logger, so these cannot come from .env
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_STATE_MAX_CHARS = int(os.getenv("LOG_STATE_MAX_CHARS", "2000"))
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "file": record.filename,
+            "function": record.funcName,
+            "line": record.lineno,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller: records are dropped, and
+    counted, when the background writer falls behind.
+    """
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Merge args into the message but keep `exc_info`, which the base class
+        clears, so the formatter on the writer thread can render the traceback
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+class StateSummary:
+    """
+    Lazy, bounded representation of a ChatBotState for log messages.
+    Large values (SQL rows, RAG chunks, table profiles) are reduced to counts
+    and the result is truncated to LOG_STATE_MAX_CHARS.
+    """
+    def __init__(
+            self,
+            state: dict,
+            max_chars: int = LOG_STATE_MAX_CHARS
+    ):
+        self.state = state
+        self.max_chars = max_chars
+
+    @staticmethod
+    def _summarize(value, max_chars: int):
+        if isinstance(value, list):
+            preview = StateSummary._summarize(value[0], max_chars // 4) if value else None
+            return {"items": len(value), "first": preview}
+        if isinstance(value, dict):
+            return {key: StateSummary._summarize(item, max_chars // 4) for key, item in list(value.items())[:20]}
+        text = str(value)
+        return text if len(text) <= max_chars else text[:max_chars] + "..."
+
+    def __str__(self) -> str:
+        summary = {
+            key: self._summarize(value, self.max_chars)
+            for key, value in self.state.items()
+        }
+        text = str(summary)
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... [truncated {len(text) - self.max_chars} chars]"
+        return text
+
+
 def log_class() -> logging.Logger:
     logger = logging.getLogger(f"chatbot_{datetime.now().strftime('%Y-%m-%d')}.log")
-    
+
     if not logger.handlers:
-        logger.setLevel(logging.DEBUG)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
 
-        formatter = logging.Formatter(
-            fmt='%(asctime)s - %(filename)s - %(funcName)s - %(levelname)s - %(message)s - %(lineno)d'
-        )
+        if LOG_FORMAT == "json":
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(
+                fmt='%(asctime)s - %(filename)s - %(funcName)s - %(levelname)s - %(message)s - %(lineno)d'
+            )
 
         os.makedirs("logs", exist_ok=True)
 
@@ -25,9 +117,17 @@ def log_class() -> logging.Logger:
         stream_handler = logging.StreamHandler()
         stream_handler.setFormatter(formatter)
 
-        # Add both handlers
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
+        # Callers only enqueue records; a background thread formats and writes them
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        logger.addHandler(DroppingQueueHandler(log_queue))
+        listener = logging.handlers.QueueListener(
+            log_queue,
+            file_handler,
+            stream_handler,
+            respect_handler_level=True
+        )
+        listener.start()
+        atexit.register(listener.stop)
 
     return logger
 
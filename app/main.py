@@ -1,10 +1,20 @@
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from logger import logger
-from route import upload, chat
+from route import upload, chat, monitor
 from contextlib import asynccontextmanager
+from config.settings import settings
 from database.database import db_manager
+from metrics import registry
+from profiling import ProfilingMiddleware, sampler
+from services.message_buffer import message_buffer
+from services.chat_history_service import ChatHistoryService
+from services.conversation_service import conversation_service
+from services.session_lifecycle import session_lifecycle
+from core.session_cache import session_cache
+from services.warmup_service import warmup_service
+from services.worker_pool import shutdown_process_pool
 
 
 @asynccontextmanager
@@ -14,13 +24,29 @@ async def lifespan(
     """Application lifespan manager"""
     try:
         await db_manager.connect_to_mongo()
+        await ChatHistoryService().migrate_legacy_sessions()
+        message_buffer.start()
+        session_lifecycle.start()
+        if settings.WARMUP_ON_STARTUP:
+            warmup_service.start()
+        else:
+            # Everything loads lazily on first use
+            warmup_service.mark_ready()
     except Exception as e:
-        logger.error(f"Error occurred while connecting to MongoDB: {e}")
+        logger.error(f"Error occurred while connecting to databases: {e}")
         raise
     else:
         yield
     finally:
+        sampler.stop()
+        await session_lifecycle.close()
+        await warmup_service.stop()
+        await session_cache.close()
+        await conversation_service.close()
+        shutdown_process_pool()
+        await message_buffer.close()
         await db_manager.close_mongo_connection()
+        await db_manager.close_sql_connection()
 
 
 
@@ -43,8 +69,12 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 app.include_router(upload.router)
 app.include_router(chat.router)
+app.include_router(monitor.router)
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -70,6 +100,22 @@ async def root():
         logger.error(f"Error in root endpoint: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once warmup has finished, 503 before"""
+    status = warmup_service.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics"""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
 if __name__=="__main__":
     import uvicorn
     uvicorn.run(
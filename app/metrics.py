@@ -0,0 +1,312 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple, Sequence
+from config.settings import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 100000)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(
+        labelnames: Sequence[str],
+        labelvalues: Tuple[str, ...],
+        extra: str = ""
+) -> str:
+    pairs = [
+        f'{name}="{_escape(value)}"'
+        for name, value in zip(labelnames, labelvalues)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(
+            self,
+            amount: float = 1,
+            **labels
+    ):
+        if not settings.METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+            self,
+            value: float,
+            **labels
+    ):
+        if not settings.METRICS_ENABLED:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                    cumulative += count
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose value is read from a callback at scrape time
+    """
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            callback: Callable[[], float]
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format_value(self.callback())}"
+        ]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: Sequence[str] = (),
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        metric = Gauge(name, documentation, callback)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+        """
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # A failing gauge callback must not break the whole scrape
+                continue
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+GRAPH_NODE_LATENCY = registry.histogram(
+    "chatbot_graph_node_latency_seconds",
+    "Latency of LangGraph pipeline nodes",
+    ["node"]
+)
+GRAPH_NODE_ERRORS = registry.counter(
+    "chatbot_graph_node_errors_total",
+    "Exceptions raised out of LangGraph pipeline nodes",
+    ["node"]
+)
+EXTERNAL_CALL_LATENCY = registry.histogram(
+    "chatbot_external_call_latency_seconds",
+    "Latency of calls to the LLM, embeddings, MySQL, MongoDB, GridFS and FAISS",
+    ["service", "operation"]
+)
+EXTERNAL_CALL_ERRORS = registry.counter(
+    "chatbot_external_call_errors_total",
+    "Failed calls to the LLM, embeddings, MySQL, MongoDB, GridFS and FAISS",
+    ["service", "operation"]
+)
+LLM_TOKENS = registry.counter(
+    "chatbot_llm_tokens_total",
+    "LLM tokens used, by graph node and kind (prompt or completion)",
+    ["node", "kind"]
+)
+SQL_ROWS_RETURNED = registry.histogram(
+    "chatbot_sql_rows_returned",
+    "Rows returned by generated SQL queries",
+    buckets=ROW_BUCKETS
+)
+RAG_CHUNKS_RETURNED = registry.histogram(
+    "chatbot_rag_chunks_returned",
+    "Document chunks returned by similarity search",
+    buckets=ROW_BUCKETS
+)
+PROMPT_TOKENS = registry.histogram(
+    "chatbot_prompt_tokens",
+    "Locally estimated prompt tokens per graph node",
+    ["node"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+)
+PROMPT_COMPACTIONS = registry.counter(
+    "chatbot_prompt_compactions_total",
+    "Prompt sections compacted to fit the token budget",
+    ["node", "section"]
+)
+UPLOAD_DEDUP_HITS = registry.counter(
+    "chatbot_upload_dedup_total",
+    "Uploads linked to already processed content instead of being reprocessed",
+    ["kind"]
+)
+QUERY_ROUTES = registry.counter(
+    "chatbot_query_routes_total",
+    "Routing decisions taken before any LLM call",
+    ["route", "reason"]
+)
+SESSIONS_PURGED = registry.counter(
+    "chatbot_sessions_purged_total",
+    "Sessions whose data was deleted",
+    ["trigger"]
+)
+RECLAIMED_BYTES = registry.counter(
+    "chatbot_reclaimed_bytes_total",
+    "Storage reclaimed by session purges",
+    ["kind"]
+)
+ARTIFACTS_DELETED = registry.counter(
+    "chatbot_artifacts_deleted_total",
+    "Vector stores, SQL tables and GridFS files deleted by session purges",
+    ["kind"]
+)
+CONVERSATION_SUMMARIES = registry.counter(
+    "chatbot_conversation_summaries_total",
+    "Rolling conversation summary updates",
+    ["outcome"]
+)
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NOOP_TIMER = _NoopTimer()
+
+@contextmanager
+def _timed_call(service: str, operation: str):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        EXTERNAL_CALL_ERRORS.inc(service=service, operation=operation)
+        raise
+    finally:
+        EXTERNAL_CALL_LATENCY.observe(time.perf_counter() - start, service=service, operation=operation)
+
+def track_call(service: str, operation: str):
+    """
+    Time an external call and count its failures.
+
+    Usage:
+        with track_call("mongodb", "fetch_table_info"):
+            await db_manager.database.documents_data.find_one(...)
+    """
+    if not settings.METRICS_ENABLED:
+        return _NOOP_TIMER
+    return _timed_call(service, operation)
+
+def instrument_node(name: str, node: Callable) -> Callable:
+    """
+    Wrap an async LangGraph node with latency and error metrics
+    """
+    if not settings.METRICS_ENABLED:
+        return node
+
+    async def wrapper(state):
+        start = time.perf_counter()
+        try:
+            return await node(state)
+        except BaseException:
+            GRAPH_NODE_ERRORS.inc(node=name)
+            raise
+        finally:
+            GRAPH_NODE_LATENCY.observe(time.perf_counter() - start, node=name)
+
+    wrapper.__name__ = getattr(node, "__name__", name)
+    return wrapper
+
+def record_llm_usage(node: str, message):
+    """
+    Count prompt and completion tokens from a chat model response's usage metadata
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage:
+        LLM_TOKENS.inc(usage.get("input_tokens", 0), node=node, kind="prompt")
+        LLM_TOKENS.inc(usage.get("output_tokens", 0), node=node, kind="completion")
@@ -0,0 +1,274 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import itertools
+import threading
+import contextvars
+import concurrent.futures.thread
+from collections import Counter, deque
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set
+from config.settings import settings
+from logger import logger
+from metrics import registry
+
+PROFILES_CAPTURED = registry.counter(
+    "chatbot_profiles_captured_total",
+    "Request profiles kept in the ring buffer",
+    ["reason"]
+)
+
+# Pseudo-frames for samples where the event loop was not running this request
+WAITING_OTHER = "[waiting: event loop busy with other work]"
+WAITING_IO = "[waiting: I/O, threads or timers]"
+# Paths never profiled (the profile endpoints themselves, scrapes)
+EXCLUDED_PREFIXES = ("/api/v1/monitor", "/metrics", "/ready")
+
+
+class RequestCapture:
+    """
+    Stack samples collected for one in-flight request
+    """
+    _ids = itertools.count(1)
+
+    def __init__(
+            self,
+            method: str,
+            path: str,
+            sampled: bool
+    ):
+        self.id = next(self._ids)
+        self.method = method
+        self.path = path
+        self.sampled = sampled
+        self.started_at = datetime.now().isoformat()
+        self.routes: List[str] = []
+        self.status: Optional[int] = None
+        self.duration_ms = 0.0
+        self.samples = 0
+        self.stacks: Counter = Counter()
+
+    def add(self, stack: str):
+        self.samples += 1
+        self.stacks[stack] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ms, 1),
+            "reason": "slow" if self.duration_ms >= settings.PROFILING_SLOW_REQUEST_MS else "sampled",
+            "routes": self.routes,
+            "samples": self.samples,
+            "top_frames": self.top_frames(5)
+        }
+
+    def top_frames(self, count: int) -> List[Dict[str, Any]]:
+        """
+        Leaf frames with the most samples (self time)
+        """
+        leaves: Counter = Counter()
+        for stack, samples in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += samples
+        return [{"frame": frame, "samples": samples} for frame, samples in leaves.most_common(count)]
+
+    def folded(self) -> str:
+        """
+        Collapsed stacks ("outer;inner count" per line), the input format of flame graph tools
+        """
+        return "\n".join(
+            f"{stack} {samples}"
+            for stack, samples in self.stacks.most_common(settings.PROFILING_MAX_STACKS)
+        ) + "\n"
+
+
+_current_capture: contextvars.ContextVar[Optional[RequestCapture]] = contextvars.ContextVar(
+    "current_capture",
+    default=None
+)
+
+def tag_route(route: Optional[str]):
+    """
+    Record a graph path (sql/rag/respond) the request being profiled ran,
+    called by the graph nodes themselves; a no-op when profiling is off
+    """
+    capture = _current_capture.get()
+    if capture is not None and route and route not in capture.routes:
+        capture.routes.append(route)
+
+
+def _frames(
+        frame,
+        boundary: Callable[[Any], bool]
+) -> List[str]:
+    """
+    Stack of `frame` outermost first, cut below the first frame for which
+    `boundary` holds (the event loop or thread pool dispatching the work)
+    """
+    stack = []
+    while frame is not None and not boundary(frame):
+        stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+def _is_loop_callback(frame) -> bool:
+    return frame.f_code.co_name == "_run" and frame.f_code.co_filename == asyncio.events.__file__
+
+def _is_work_item(frame) -> bool:
+    return frame.f_code.co_name == "run" and frame.f_code.co_filename == concurrent.futures.thread.__file__
+
+def _executor_capture(frame) -> Optional[RequestCapture]:
+    """
+    Request of the asyncio.to_thread call an executor thread is running.
+    to_thread submits `partial(context.run, func)`, so the work item of the
+    thread's `_WorkItem.run` frame carries the caller's context.
+    """
+    while frame is not None:
+        if _is_work_item(frame):
+            work = frame.f_locals.get("self")
+            fn = getattr(work, "fn", None)
+            context = getattr(getattr(fn, "func", None), "__self__", None)
+            if isinstance(context, contextvars.Context):
+                return context.get(_current_capture)
+            return None
+        frame = frame.f_back
+    return None
+
+
+class StackSampler:
+    """
+    Wall-clock stack sampler for the event loop thread.
+
+    A daemon thread reads the loop thread's current frame every
+    PROFILING_INTERVAL_MS and charges it to the request whose context the
+    running task carries, which also covers the tasks LangGraph starts for
+    each node. Every other in-flight request is recorded as waiting. Stacks of
+    executor threads running a request's `asyncio.to_thread` work are added
+    under a "[worker thread]" root; process pool work is not seen. Nothing
+    is traced, so the overhead does not grow with the amount of Python
+    executed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Set[RequestCapture] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self.captures: deque = deque(maxlen=settings.PROFILING_RING_SIZE)
+
+    def ensure_started(self):
+        if self._thread is None:
+            self._loop = asyncio.get_running_loop()
+            self._thread_id = threading.get_ident()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+            logger.info(f"Profiling sampler started ({settings.PROFILING_INTERVAL_MS} ms interval)")
+
+    def stop(self):
+        self._stop.set()
+
+    def register(self, capture: RequestCapture):
+        with self._lock:
+            self._active.add(capture)
+
+    def unregister(self, capture: RequestCapture):
+        with self._lock:
+            self._active.discard(capture)
+
+    def keep(self, capture: RequestCapture):
+        self.captures.append(capture)
+
+    def find(self, capture_id: int) -> Optional[RequestCapture]:
+        for capture in self.captures:
+            if capture.id == capture_id:
+                return capture
+        return None
+
+    def _run(self):
+        interval = settings.PROFILING_INTERVAL_MS / 1000
+        while not self._stop.wait(interval):
+            try:
+                self._sample()
+            except Exception as e:
+                logger.debug(f"Stack sample failed: {e}")
+
+    def _sample(self):
+        with self._lock:
+            if not self._active:
+                return
+            active = list(self._active)
+        task = asyncio.current_task(self._loop)
+        owner = task.get_context().get(_current_capture) if task is not None else None
+        if owner not in active:
+            # Background work started by a request that has already finished
+            owner = None
+        if owner is not None:
+            stack = _frames(sys._current_frames().get(self._thread_id), _is_loop_callback)
+            owner.add(";".join(stack) or "[event loop]")
+        waiting = WAITING_IO if task is None else WAITING_OTHER
+        for capture in active:
+            if capture is not owner:
+                capture.add(waiting)
+
+        # asyncio.to_thread work (pandas, FAISS, embeddings) runs in executor threads
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != self._thread_id:
+                capture = _executor_capture(frame)
+                if capture in active:
+                    capture.add(";".join(["[worker thread]"] + _frames(frame, _is_work_item)))
+
+
+class ProfilingMiddleware:
+    """
+    Opt-in (PROFILING_ENABLED) request profiler. Every request is sampled
+    while in flight; the profile is kept in a ring buffer when the request
+    was picked by PROFILING_SAMPLE_RATE or took at least
+    PROFILING_SLOW_REQUEST_MS, and dropped otherwise.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXCLUDED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        sampler.ensure_started()
+        capture = RequestCapture(
+            scope["method"],
+            scope["path"],
+            sampled=random.random() < settings.PROFILING_SAMPLE_RATE
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                capture.status = message["status"]
+            await send(message)
+
+        token = _current_capture.set(capture)
+        sampler.register(capture)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            capture.duration_ms = (time.perf_counter() - start) * 1000
+            sampler.unregister(capture)
+            _current_capture.reset(token)
+            slow = capture.duration_ms >= settings.PROFILING_SLOW_REQUEST_MS
+            if slow or capture.sampled:
+                sampler.keep(capture)
+                PROFILES_CAPTURED.inc(reason="slow" if slow else "sampled")
+                if slow:
+                    logger.info(
+                        f"Captured profile {capture.id} of slow request {capture.method} {capture.path} "
+                        f"({capture.duration_ms:.0f} ms, routes {capture.routes or '-'})"
+                    )
+
+sampler = StackSampler()
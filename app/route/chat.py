@@ -1,7 +1,16 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 from logger import logger
+from config.settings import settings
+from schema.models import BatchChatRequest
 from services.chat_service import ChatService
+from services.chat_history_service import ChatHistoryService
+from services.message_buffer import message_buffer
+from services.warmup_service import warmup_service
+from services.session_lifecycle import session_lifecycle
 from database.database import db_manager
+from core.session_cache import session_cache
+from core.admission import admission, AdmissionRejected
 
 router = APIRouter(prefix="/api/v1/chat", tags=["Chat Routes"])
 
@@ -13,20 +22,58 @@ async def chat_api(
 ):
     """Chat Endpoint"""
     try:
-        return await ChatService().handle_uery(
-            user_id=user_id,
-            session_id=session_id,
-            user_query=query
-        )
+        await warmup_service.wait_for_modules()
+        async with admission.admit("chat", user_id):
+            return await ChatService().handle_uery(
+                user_id=user_id,
+                session_id=session_id,
+                user_query=query
+            )
 
     except HTTPException:
         raise
+    except AdmissionRejected as ar:
+        raise HTTPException(status_code=429, detail=str(ar), headers={"Retry-After": str(ar.retry_after)})
     except ValueError as ve:
         raise HTTPException(status_code=409, detail=str(ve))
     except Exception as e:
         logger.error(f"Error in chat_api: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.post("/chat_batch")
+async def chat_batch_api(
+    request: BatchChatRequest
+):
+    """
+    Answer a list of queries for one session.
+    Results come back in the order of `queries`.
+    """
+    try:
+        if len(request.queries) > settings.CHAT_BATCH_MAX_QUERIES:
+            raise HTTPException(
+                status_code=422,
+                detail=f"At most {settings.CHAT_BATCH_MAX_QUERIES} queries per batch"
+            )
+        await warmup_service.wait_for_modules()
+        # A batch holds a chat slot for every graph it runs at once
+        slots = min(len(request.queries), settings.CHAT_BATCH_CONCURRENCY)
+        async with admission.admit("chat", request.user_id, slots):
+            return await ChatService().handle_batch(
+                user_id=request.user_id,
+                session_id=request.session_id,
+                queries=request.queries
+            )
+
+    except HTTPException:
+        raise
+    except AdmissionRejected as ar:
+        raise HTTPException(status_code=429, detail=str(ar), headers={"Retry-After": str(ar.retry_after)})
+    except ValueError as ve:
+        raise HTTPException(status_code=409, detail=str(ve))
+    except Exception as e:
+        logger.error(f"Error in chat_batch_api: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.get("/sessions/{user_id}")
 async def get_user_sessions(
     user_id: str
@@ -35,53 +82,88 @@ async def get_user_sessions(
     Get all user sessions
     """
     logger.info(f"Fetching sessions for user_id: {user_id}")
-    existing_data = await db_manager.database.chats.find(
+    # The UI opens a session next; start loading the most recent one
+    session_cache.prefetch_recent(user_id)
+    # distinct on the (user_id, session_id) index is answered from the index alone
+    session_ids = await db_manager.database.chats.distinct(
+        "session_id",
         {
             "user_id": user_id
-        },
+        }
+    )
+
+    return [
         {
-            "_id": 0,
-            "session_id": 1
+            "session_id": session_id
         }
-    ).to_list(length=None)
+        for session_id in session_ids
+    ]
 
-    return existing_data
+
+@router.delete("/sessions/{user_id}/{session_id}")
+async def purge_session(
+    user_id: str,
+    session_id: str
+):
+    """
+    Delete all data of a session: document index, SQL tables, uploaded
+    files, table profiles and chat history. Artifacts shared with other
+    sessions through deduplicated uploads are kept for those sessions.
+    """
+    try:
+        logger.info(f"Purging session_id: {session_id}, user_id: {user_id}")
+        report = await session_lifecycle.purge_session(user_id, session_id, trigger="api")
+        if report is None:
+            raise HTTPException(status_code=409, detail="Session is already being purged")
+        return report
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in purge_session: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
 
 
 @router.get("/chat_history/{session_id}/{user_id}")
 async def get_session_chat(
     session_id: str,
-    user_id: str
+    user_id: str,
+    limit: Optional[int] = Query(None, ge=1),
+    before: Optional[int] = Query(None, ge=0)
 ):
     """
-    Get chat history for a session
+    Get chat history for a session, most recent page first.
+    Pass `next_cursor` from the response as `before` to fetch older messages.
     """
     try:
         logger.info(f"Fetching chat history for session_id: {session_id}, user_id: {user_id}")
-        existing_data = await db_manager.database.chats.find_one(
-            {
-                "session_id": session_id,
-                "user_id": user_id
-            },
-            {
-                "_id": 0,
-                "messages": 1
-            }
+        # Load tables and document index while the user reads the history
+        session_cache.prefetch(user_id, session_id)
+        await message_buffer.flush_session(user_id, session_id)
+        page = await ChatHistoryService().get_history_page(
+            user_id=user_id,
+            session_id=session_id,
+            limit=limit,
+            before=before
         )
-        if not existing_data or "messages" not in existing_data:
+        if not page["messages"]:
             logger.warning(f"No messages found for session_id: {session_id}, user_id: {user_id}")
-            return []
-        
+
         messages = [
             {
                 "role": msg["role"],
                 "message": msg["message"],
                 "timestamp": msg["timestamp"]
             }
-            for msg in existing_data["messages"]
+            for msg in page["messages"]
         ]
         logger.info(f"Retreieved {len(messages)} messages for session_id: {session_id}, user_id: {user_id}")
-        return messages
+        return {
+            "messages": messages,
+            "next_cursor": page["next_cursor"]
+        }
     except Exception as e:
         logger.error(f"Error in get_session_chat: {e}")
-        return []
+        return {
+            "messages": [],
+            "next_cursor": None
+        }
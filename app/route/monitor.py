@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from logger import logger
+from database.database import db_manager
+from core.single_flight import query_flights
+from core.response_formatter import response_stats
+from services.session_lifecycle import session_lifecycle
+from profiling import sampler
+from core.admission import admission
+
+router = APIRouter(prefix="/api/v1/monitor", tags=["Monitor Routes"])
+
+@router.get("/sql_pool")
+async def get_sql_pool_status():
+    """
+    SQL connection pool utilization and checkout wait time
+    """
+    try:
+        return db_manager.get_pool_status()
+    except Exception as e:
+        logger.error(f"Error in get_sql_pool_status: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/single_flight")
+async def get_single_flight_stats():
+    """
+    Coalesced chat queries and the LLM calls they saved
+    """
+    try:
+        return query_flights.stats()
+    except Exception as e:
+        logger.error(f"Error in get_single_flight_stats: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/responses")
+async def get_response_stats():
+    """
+    Fraction of chat responses served without the final LLM call
+    """
+    try:
+        return response_stats.snapshot()
+    except Exception as e:
+        logger.error(f"Error in get_response_stats: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/lifecycle")
+async def get_lifecycle_stats():
+    """
+    Session TTL sweeper state and storage reclaimed by purges
+    """
+    try:
+        return session_lifecycle.stats()
+    except Exception as e:
+        logger.error(f"Error in get_lifecycle_stats: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/admission")
+async def get_admission_stats():
+    """
+    Admission slots in use and queue depth per lane
+    """
+    try:
+        return admission.stats()
+    except Exception as e:
+        logger.error(f"Error in get_admission_stats: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/profiles")
+async def get_profiles():
+    """
+    Recent request profiles kept by the profiling middleware, newest first
+    """
+    try:
+        return {
+            "profiles": [capture.summary() for capture in reversed(sampler.captures)]
+        }
+    except Exception as e:
+        logger.error(f"Error in get_profiles: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+async def download_profile(
+        profile_id: int
+):
+    """
+    Collapsed stacks of one profile, ready for flamegraph.pl or speedscope
+    """
+    capture = sampler.find(profile_id)
+    if capture is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(
+        capture.folded(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.folded"'}
+    )
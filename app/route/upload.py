@@ -1,7 +1,9 @@
+import os
 from fastapi import File, UploadFile, APIRouter, HTTPException
 from logger import logger
 from config.settings import settings
-from services.upload_service import UploadService
+from services.warmup_service import warmup_service
+from core.admission import admission, AdmissionRejected
 from fastapi.responses import JSONResponse
 
 router = APIRouter(prefix="/api/v1/upload", tags=["Upload Routes"])
@@ -30,19 +32,26 @@ async def upload_document(
                 detail=f"Unsupported file type '{file_extension}'. "
                        f"Supported types: {', '.join(settings.SUPPORTED_EXTENSIONS)}"
             )
-        # Read file data
-        file_data = await file.read()
-        if not file_data:
+        # The body is already spooled by Starlette; pass the file on instead of reading it into memory
+        file.file.seek(0, os.SEEK_END)
+        file_size = file.file.tell()
+        file.file.seek(0)
+        if not file_size:
             logger.warning("Empty file uploaded")
             raise HTTPException(status_code=400, detail="Uploaded file is empty")
         
-        document = await UploadService(
-            user_id=user_id,
-            session_id=session_id,
-            file_data=file_data,
-            filename=file.filename,
-            file_extension=file_extension
-        ).upload_document()
+        # Imported here so pandas, PyPDF2, python-docx and FAISS load on first upload or during warmup
+        await warmup_service.wait_for_modules()
+        from services.upload_service import UploadService
+
+        async with admission.admit("ingest", user_id):
+            document = await UploadService(
+                user_id=user_id,
+                session_id=session_id,
+                file_stream=file.file,
+                filename=file.filename,
+                file_extension=file_extension
+            ).upload_document()
         if document:
             if isinstance(document, dict) and "error" in document:
                 return {
@@ -62,6 +71,8 @@ async def upload_document(
 
     except HTTPException:
         raise
+    except AdmissionRejected as ar:
+        raise HTTPException(status_code=429, detail=str(ar), headers={"Retry-After": str(ar.retry_after)})
     except ValueError as ve:
         raise HTTPException(status_code=409, detail=str(ve))
     except Exception as e:
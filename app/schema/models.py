@@ -23,3 +23,18 @@ class ChatBotState(TypedDict):
     rag_result: Dict
     final_response: str
     messages: List[Any]
+    conversation_summary: str
+    llm_calls: int
+    route: str
+    deadline: float
+    vector_store: Optional[Any]
+    upload_version: Optional[str]
+    answer_cacheable: bool
+
+class BatchChatRequest(BaseModel):
+    user_id: str
+    session_id: str
+    queries: List[str] = Field(
+        min_length=1,
+        description="Questions answered against the same session, in order"
+    )
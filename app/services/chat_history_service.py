@@ -0,0 +1,385 @@
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+from pymongo import ReturnDocument, UpdateOne
+from config.settings import settings
+from database.database import db_manager
+from logger import logger, log_exception
+from metrics import track_call
+
+LEGACY_PROJECTION = {"user_id": 1, "session_id": 1, "messages": 1, "message_count": 1, "legacy_seq": 1}
+
+class ChatHistoryService:
+    """
+    Chat history stored as fixed-size bucket documents.
+
+    `chats` keeps one small header document per session with a running
+    `message_count`, and `chat_buckets` holds the messages themselves,
+    `CHAT_BUCKET_SIZE` per document. Every message gets a sequence number
+    from the header counter, so an append touches one header and one bucket
+    regardless of how long the session is.
+    """
+    # Whether sessions in the pre-bucket format may still exist (see `migrate_legacy_sessions`)
+    legacy_sessions_remaining = True
+
+    def __init__(self):
+        self.bucket_size = settings.CHAT_BUCKET_SIZE
+
+    async def append_messages(
+            self,
+            user_id: str,
+            session_id: str,
+            messages: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Append messages (dicts with role, message, timestamp) to a session.
+
+        Returns:
+            The stored message entries including their sequence numbers
+        """
+        try:
+            stored = await self.write_batch({(user_id, session_id): messages})
+            return stored.get((user_id, session_id), [])
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def write_batch(
+            self,
+            batch: Dict[Tuple[str, str], List[Dict[str, Any]]]
+    ) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+        """
+        Append messages for several sessions at once.
+        Sequence numbers are reserved per session, then every bucket push is
+        sent in a single bulk_write.
+
+        Writes are idempotent: the reserved `seq` (and the `reservation` it
+        came from) is recorded on each message dict, so a batch the caller
+        re-queues after a failure keeps its numbers, and a bucket push only
+        applies while none of its sequence numbers is stored yet.
+
+        Args:
+            batch: Messages keyed by (user_id, session_id)
+        Returns:
+            Stored message entries keyed by (user_id, session_id)
+        """
+        try:
+            batch = {key: messages for key, messages in batch.items() if messages}
+            if not batch:
+                return {}
+            if ChatHistoryService.legacy_sessions_remaining:
+                # Old history takes the lowest sequence numbers, so migrate it before appending
+                with track_call("mongodb", "find_legacy_chats"):
+                    legacy = await db_manager.database.chats.find(
+                        {
+                            "messages": {"$exists": True},
+                            "$or": [
+                                {"user_id": user_id, "session_id": session_id}
+                                for user_id, session_id in batch
+                            ]
+                        },
+                        LEGACY_PROJECTION
+                    ).to_list(length=None)
+                for header in legacy:
+                    await self._migrate_session(header)
+            return await self._write_batch(batch)
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def _write_batch(
+            self,
+            batch: Dict[Tuple[str, str], List[Dict[str, Any]]]
+    ) -> Dict[Tuple[str, str], List[Dict[str, Any]]]:
+        """
+        Reserve and push without the legacy check; used by `write_batch` and the migration
+        """
+        try:
+            now = datetime.now().isoformat()
+
+            # Step1: Reserve a contiguous range of sequence numbers per session for new messages
+            with track_call("mongodb", "reserve_chat_sequences"):
+                first_seqs = await asyncio.gather(*(
+                    self._reserve_sequences(
+                        user_id,
+                        session_id,
+                        sum(1 for message in messages if "seq" not in message),
+                        now
+                    )
+                    for (user_id, session_id), messages in batch.items()
+                ))
+
+            # Step2: Group entries by bucket and reservation, and push them in one round trip
+            stored = {}
+            bucket_keys = set()
+            operations = []
+            for ((user_id, session_id), messages), first_seq in zip(batch.items(), first_seqs):
+                entries = []
+                groups: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+                reservation = first_seq
+                for message in messages:
+                    if "seq" not in message:
+                        message["seq"] = first_seq
+                        message["reservation"] = reservation
+                        first_seq += 1
+                    message.setdefault("timestamp", now)
+                    entry = {
+                        "seq": message["seq"],
+                        "role": message["role"],
+                        "message": message["message"],
+                        "timestamp": message["timestamp"]
+                    }
+                    entries.append(entry)
+                    bucket = entry["seq"] // self.bucket_size
+                    groups.setdefault((bucket, message.get("reservation", entry["seq"])), []).append(entry)
+                stored[(user_id, session_id)] = entries
+
+                for (bucket, _), group_entries in groups.items():
+                    bucket_keys.add((user_id, session_id, bucket))
+                    operations.append(UpdateOne(
+                        {
+                            "user_id": user_id,
+                            "session_id": session_id,
+                            "bucket": bucket,
+                            # Already applied by an earlier attempt of this batch
+                            "messages.seq": {"$nin": [entry["seq"] for entry in group_entries]}
+                        },
+                        {
+                            "$push": {
+                                "messages": {
+                                    "$each": group_entries,
+                                    "$sort": {"seq": 1}
+                                }
+                            },
+                            "$inc": {
+                                "count": len(group_entries)
+                            }
+                        }
+                    ))
+
+            with track_call("mongodb", "write_chat_buckets"):
+                # Create missing buckets first; the pushes only match existing ones
+                await db_manager.database.chat_buckets.bulk_write([
+                    UpdateOne(
+                        {
+                            "user_id": user_id,
+                            "session_id": session_id,
+                            "bucket": bucket
+                        },
+                        {
+                            "$setOnInsert": {
+                                "created_at": now,
+                                "messages": [],
+                                "count": 0
+                            }
+                        },
+                        upsert=True
+                    )
+                    for user_id, session_id, bucket in bucket_keys
+                ], ordered=False)
+                await db_manager.database.chat_buckets.bulk_write(operations, ordered=False)
+            logger.info(
+                f"Appended {sum(len(entries) for entries in stored.values())} messages "
+                f"across {len(stored)} sessions"
+            )
+            return stored
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def _reserve_sequences(
+            self,
+            user_id: str,
+            session_id: str,
+            count: int,
+            now: str
+    ) -> int:
+        """
+        Increment the session header's message_count and return the first reserved sequence number
+        """
+        if not count:
+            # Only retried messages, which keep the numbers reserved before
+            return 0
+        header = await db_manager.database.chats.find_one_and_update(
+            {
+                "user_id": user_id,
+                "session_id": session_id
+            },
+            {
+                "$setOnInsert": {
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "created_at": now
+                },
+                "$inc": {
+                    "message_count": count
+                },
+                "$set": {
+                    "updated_at": now,
+                    "last_activity_at": datetime.now()
+                }
+            },
+            projection={
+                "_id": 0,
+                "message_count": 1
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return header["message_count"] - count
+
+    async def migrate_legacy_sessions(self) -> int:
+        """
+        Move sessions still stored in the old format, a `messages` array on the
+        `chats` document, into chat_buckets. Runs once at startup; until it
+        finds none left, `write_batch` also migrates a legacy session before
+        appending to it, so old history always sorts before new messages.
+
+        Returns:
+            Number of sessions migrated
+        """
+        found = migrated = 0
+        async for header in db_manager.database.chats.find(
+            {"messages": {"$exists": True}},
+            LEGACY_PROJECTION
+        ):
+            found += 1
+            try:
+                if await self._migrate_session(header):
+                    migrated += 1
+            except Exception as e:
+                logger.error(f"Could not migrate chat history of session {header.get('session_id')}: {e}")
+        ChatHistoryService.legacy_sessions_remaining = found > 0
+        if migrated:
+            logger.info(f"Migrated chat history of {migrated} sessions to chat_buckets")
+        return migrated
+
+    async def _migrate_session(
+            self,
+            header: Dict[str, Any]
+    ) -> bool:
+        """
+        Store the `messages` array of one legacy header in buckets.
+
+        The sequence range is claimed on the header (`legacy_seq`) with a
+        compare-and-set on message_count before any bucket is written, and the
+        array is only removed once every message is stored, so a migration
+        interrupted half way is completed later without duplicates. A session
+        that never had buckets gets the range from 0. The only headers with
+        both are ones an older release appended to after an earlier
+        migration; those messages are newer and follow the stored ones.
+
+        Returns:
+            True when this call stored the messages
+        """
+        while header and header.get("legacy_seq") is None:
+            messages = header.get("messages")
+            if messages is None:
+                return False
+            message_count = header.get("message_count", 0)
+            result = await db_manager.database.chats.update_one(
+                {
+                    "_id": header["_id"],
+                    "legacy_seq": {"$exists": False},
+                    "message_count": message_count if "message_count" in header else {"$exists": False}
+                },
+                {
+                    "$set": {
+                        "legacy_seq": message_count,
+                        "message_count": message_count + len(messages)
+                    }
+                }
+            )
+            if result.modified_count:
+                header["legacy_seq"] = message_count
+                break
+            # Claimed or appended to by another worker meanwhile; look again
+            header = await db_manager.database.chats.find_one({"_id": header["_id"]}, LEGACY_PROJECTION)
+        if not header or header.get("messages") is None:
+            return False
+
+        first_seq = header["legacy_seq"]
+        if header["messages"]:
+            await self._write_batch({
+                (header["user_id"], header["session_id"]): [
+                    {
+                        "seq": first_seq + offset,
+                        "reservation": first_seq,
+                        "role": message.get("role"),
+                        "message": message.get("message"),
+                        "timestamp": message.get("timestamp")
+                    }
+                    for offset, message in enumerate(header["messages"])
+                ]
+            })
+        await db_manager.database.chats.update_one(
+            {"_id": header["_id"]},
+            {"$unset": {"messages": "", "legacy_seq": ""}}
+        )
+        return True
+
+    async def get_history_page(
+            self,
+            user_id: str,
+            session_id: str,
+            limit: Optional[int] = None,
+            before: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Fetch one page of chat history, most recent page first.
+
+        Args:
+            limit: Number of messages in the page
+            before: Cursor returned by the previous page; only messages with a
+                lower sequence number are returned
+        Returns:
+            Messages of the page in chronological order and the cursor for the
+            next (older) page, or None when there are no older messages
+        """
+        try:
+            limit = min(limit or settings.CHAT_HISTORY_PAGE_SIZE, settings.CHAT_HISTORY_MAX_PAGE_SIZE)
+            if before is None:
+                header = await db_manager.database.chats.find_one(
+                    {
+                        "user_id": user_id,
+                        "session_id": session_id
+                    },
+                    {
+                        "_id": 0,
+                        "message_count": 1
+                    }
+                )
+                before = (header or {}).get("message_count", 0)
+            if before <= 0:
+                return {"messages": [], "next_cursor": None}
+
+            # Step1: Read only the buckets that can contain the requested range
+            newest_bucket = (before - 1) // self.bucket_size
+            oldest_bucket = max(before - limit, 0) // self.bucket_size
+            with track_call("mongodb", "read_chat_buckets"):
+                buckets = await db_manager.database.chat_buckets.find(
+                    {
+                        "user_id": user_id,
+                        "session_id": session_id,
+                        "bucket": {"$gte": oldest_bucket, "$lte": newest_bucket}
+                    },
+                    {
+                        "_id": 0,
+                        "messages": 1
+                    }
+                ).to_list(length=None)
+
+            # Step2: Keep the `limit` newest messages below the cursor
+            messages = sorted(
+                (
+                    message
+                    for bucket in buckets
+                    for message in bucket.get("messages", [])
+                    if message["seq"] < before
+                ),
+                key=lambda message: message["seq"]
+            )[-limit:]
+            next_cursor = messages[0]["seq"] if messages and messages[0]["seq"] > 0 else None
+            return {
+                "messages": messages,
+                "next_cursor": next_cursor
+            }
+        except Exception as e:
+            return log_exception(e, logger)
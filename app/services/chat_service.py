@@ -1,12 +1,33 @@
-from typing import Dict, Any
+import asyncio
+import threading
+from typing import Dict, Any, List, Tuple
 from datetime import datetime
-from core.graph import FinancialChatBot
 from logger import logger, log_exception
-from database.database import db_manager
+from config.settings import settings
+from services.chat_history_service import ChatHistoryService
+from services.message_buffer import message_buffer
+from services.conversation_service import conversation_service
+
+_chatbot = None
+_chatbot_lock = threading.Lock()
+
+def get_chatbot():
+    """
+    Shared FinancialChatBot. langgraph/langchain are imported and the graph is
+    compiled on first use, or ahead of time by the startup warmup.
+    """
+    global _chatbot
+    if _chatbot is None:
+        with _chatbot_lock:
+            if _chatbot is None:
+                from core.graph import FinancialChatBot
+                _chatbot = FinancialChatBot()
+                logger.info("FinancialChatBot initialized")
+    return _chatbot
 
 class ChatService:
     def __init__(self):
-        self.chatbot = FinancialChatBot()
+        self.chatbot = get_chatbot()
 
     async def handle_uery(
             self,
@@ -17,18 +38,23 @@ class ChatService:
         try:
             logger.info(f"Chat Service triggered for user: {user_id}, session: {session_id}")
 
-            # Step1: Save user message first
+            # Step1: Load earlier turns before this question joins the history
+            history = await conversation_service.load(user_id, session_id)
+
+            # Step2: Save user message first
             await self._save_message(user_id, session_id, "user", user_query)
 
-            # Step2: Generate assistant response
+            # Step3: Generate assistant response
             response = await self.chatbot.process_query(
                 user_id=user_id,
                 session_id=session_id,
-                user_query=user_query
+                user_query=user_query,
+                history=history
             )
 
-            # Step3: Save assistant response
+            # Step4: Save assistant response and fold old turns into the summary
             await self._save_message(user_id, session_id, "assistant", response.get("response", ""))
+            conversation_service.schedule_summary(user_id, session_id)
 
             return {
                 "success": True,
@@ -43,6 +69,69 @@ class ChatService:
                 "timestamp": datetime.now().isoformat()
             }
 
+    async def handle_batch(
+            self,
+            user_id: str,
+            session_id: str,
+            queries: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Answer several queries against one session.
+        The session context is loaded once, graph runs share it with at most
+        CHAT_BATCH_CONCURRENCY in flight, and all messages are saved in one
+        write. Results are returned in the order of `queries`.
+        """
+        try:
+            logger.info(f"Batch of {len(queries)} queries for user: {user_id}, session: {session_id}")
+
+            # Step1: Load table info, document index and conversation once for the whole batch
+            context, history = await asyncio.gather(
+                self.chatbot.load_session_context(user_id, session_id),
+                conversation_service.load(user_id, session_id)
+            )
+
+            # Step2: Generate assistant responses concurrently under the batch limit
+            semaphore = asyncio.Semaphore(settings.CHAT_BATCH_CONCURRENCY)
+
+            async def answer(user_query: str) -> Dict[str, Any]:
+                async with semaphore:
+                    return await self.chatbot.process_query(
+                        user_id=user_id,
+                        session_id=session_id,
+                        user_query=user_query,
+                        context=context,
+                        history=history
+                    )
+
+            responses = await asyncio.gather(*(answer(query) for query in queries))
+
+            # Step3: Save every question and answer, in order, in one write
+            messages = []
+            for user_query, response in zip(queries, responses):
+                messages.append(("user", user_query))
+                messages.append(("assistant", response.get("response", "")))
+            await self._save_messages(user_id, session_id, messages)
+            conversation_service.schedule_summary(user_id, session_id)
+
+            return {
+                "success": True,
+                "results": [
+                    {
+                        "query": user_query,
+                        "response": response
+                    }
+                    for user_query, response in zip(queries, responses)
+                ],
+                "timestamp": datetime.now().isoformat()
+            }
+        except Exception as e:
+            logger.error(f"Error in handle_batch: {str(e)}")
+            return {
+                "success": False,
+                "response": f"Error occurred while processing queries: {str(e)}",
+                "timestamp": datetime.now().isoformat()
+            }
+
     async def _save_message(
             self,
             user_id: str,
@@ -53,38 +142,43 @@ class ChatService:
         """
         Save individual messages (user or assistant) in MongoDB.
         Role can be 'user' or 'assistant'.
+        With CHAT_WRITE_BEHIND enabled the message is queued in the write-behind
+        buffer and persisted off the request's critical path.
         """
-        try:
-            chat_query = {
-                "user_id": user_id,
-                "session_id": session_id
-            }
+        return await self._save_messages(user_id, session_id, [(role, message)])
 
-            message_entry = {
-                "role": role,
-                "message": message,
-                "timestamp": datetime.now().isoformat()
-            }
+    async def _save_messages(
+            self,
+            user_id: str,
+            session_id: str,
+            messages: List[Tuple[str, str]]
+    ):
+        """
+        Save (role, message) pairs of one session in order, either through
+        the write-behind buffer or as a single append.
+        """
+        try:
+            if settings.CHAT_WRITE_BEHIND and message_buffer.running:
+                for role, message in messages:
+                    message_buffer.add(user_id, session_id, role, message)
+                logger.info(f"{len(messages)} message(s) queued for user: {user_id}, session: {session_id}")
+                return True
 
-            await db_manager.database.chats.update_one(
-                chat_query,
-                {
-                    "$setOnInsert": {
-                        "user_id": user_id,
-                        "session_id": session_id,
-                        "created_at": datetime.now().isoformat()
-                    },
-                    "$push": {
-                        "messages": message_entry
-                    },
-                    "$set": {
-                        "updated_at": datetime.now().isoformat()
+            timestamp = datetime.now().isoformat()
+            await ChatHistoryService().append_messages(
+                user_id,
+                session_id,
+                [
+                    {
+                        "role": role,
+                        "message": message,
+                        "timestamp": timestamp
                     }
-                },
-                upsert=True
+                    for role, message in messages
+                ]
             )
 
-            logger.info(f"{role.capitalize()} message saved for user: {user_id}, session: {session_id}")
+            logger.info(f"{len(messages)} message(s) saved for user: {user_id}, session: {session_id}")
             return True
         except Exception as e:
             return log_exception(e, logger)
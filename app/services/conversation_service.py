@@ -0,0 +1,245 @@
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+from config.settings import settings
+from database.database import db_manager
+from logger import logger, log_exception
+from metrics import track_call, record_llm_usage, CONVERSATION_SUMMARIES
+from core.prompt_budget import count_tokens, truncate_to_budget
+from services.chat_history_service import ChatHistoryService
+from services.message_buffer import message_buffer
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a conversation between a user and a financial data assistant.
+
+### Rules:
+1. Merge the new messages into the existing summary.
+2. Keep what a follow-up question may refer to: tables, metrics, filters, time periods, figures and conclusions.
+3. Drop greetings, apologies and repeated content.
+4. At most {max_words} words. Return only the summary text.
+
+Existing Summary: {summary}
+New Messages:
+{messages}
+"""
+
+class ConversationService:
+    """
+    Conversation context for the graph: a rolling summary plus every message
+    it does not cover yet verbatim, which is the last
+    CONVERSATION_WINDOW_MESSAGES messages and up to
+    CONVERSATION_SUMMARY_BATCH_MESSAGES more waiting to be summarized.
+
+    The summary lives on the session header in `chats` together with
+    `summary_seq`, the sequence number of the first message it does not cover.
+    Once CONVERSATION_SUMMARY_BATCH_MESSAGES messages have slid out of the
+    window they are folded into the summary in the background, at most
+    CONVERSATION_SUMMARY_INPUT_TOKENS of messages per LLM call, so each call
+    costs a bounded prompt however long the session or its messages are.
+    """
+    def __init__(self):
+        self._tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._llm = None
+
+    async def load(
+            self,
+            user_id: str,
+            session_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Rolling summary and the messages after it, including messages still
+        queued in the write-behind buffer. At most window + batch messages are
+        returned should the summary fall further behind.
+
+        Returns:
+            {"summary": str, "messages": [{"role", "message"}]} oldest first,
+            or None when conversation context is disabled
+        """
+        if not settings.CONVERSATION_CONTEXT_ENABLED:
+            return None
+        try:
+            limit = settings.CONVERSATION_WINDOW_MESSAGES + settings.CONVERSATION_SUMMARY_BATCH_MESSAGES
+            with track_call("mongodb", "load_conversation"):
+                header = await db_manager.database.chats.find_one(
+                    {
+                        "user_id": user_id,
+                        "session_id": session_id
+                    },
+                    {
+                        "_id": 0,
+                        "message_count": 1,
+                        "summary": 1,
+                        "summary_seq": 1
+                    }
+                ) or {}
+            pending = message_buffer.pending(user_id, session_id)
+            message_count = header.get("message_count", 0)
+            unsummarized = message_count - header.get("summary_seq", 0)
+            stored_needed = max(min(unsummarized, limit - len(pending)), 0)
+
+            messages = []
+            if stored_needed and message_count:
+                page = await ChatHistoryService().get_history_page(
+                    user_id=user_id,
+                    session_id=session_id,
+                    limit=stored_needed,
+                    before=message_count
+                )
+                messages = page["messages"]
+            messages = [
+                {
+                    "role": message["role"],
+                    "message": message["message"]
+                }
+                for message in messages + pending
+            ]
+            return {
+                "summary": header.get("summary", ""),
+                "messages": messages[-limit:] if limit else []
+            }
+        except Exception as e:
+            logger.error(f"Could not load conversation context: {e}")
+            return {"summary": "", "messages": []}
+
+    def schedule_summary(
+            self,
+            user_id: str,
+            session_id: str
+    ):
+        """
+        Update the session summary in the background, at most once at a time per session
+        """
+        if not settings.CONVERSATION_CONTEXT_ENABLED:
+            return
+        key = (user_id, session_id)
+        if key in self._tasks:
+            return
+        task = asyncio.create_task(self.update_summary(user_id, session_id))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+    async def close(self):
+        """
+        Cancel summary updates still running at shutdown
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def update_summary(
+            self,
+            user_id: str,
+            session_id: str
+    ) -> bool:
+        """
+        Fold the messages that left the recent window into the summary, as
+        many per LLM call as fit CONVERSATION_SUMMARY_INPUT_TOKENS. Each step
+        is saved as it is summarized, so a long backlog is not lost to a
+        failure half way.
+
+        Returns:
+            True when the summary was updated
+        """
+        try:
+            header = await db_manager.database.chats.find_one(
+                {
+                    "user_id": user_id,
+                    "session_id": session_id
+                },
+                {
+                    "_id": 0,
+                    "message_count": 1,
+                    "summary": 1,
+                    "summary_seq": 1
+                }
+            )
+            if not header:
+                return False
+            summary = header.get("summary", "")
+            summary_seq = header.get("summary_seq", 0)
+            window_start = header.get("message_count", 0) - settings.CONVERSATION_WINDOW_MESSAGES
+            if window_start - summary_seq < settings.CONVERSATION_SUMMARY_BATCH_MESSAGES:
+                return False
+
+            seq_filter = summary_seq if "summary_seq" in header else {"$exists": False}
+            updated = False
+            while summary_seq < window_start:
+                page_end = min(summary_seq + settings.CHAT_HISTORY_MAX_PAGE_SIZE, window_start)
+                page = await ChatHistoryService().get_history_page(
+                    user_id=user_id,
+                    session_id=session_id,
+                    limit=page_end - summary_seq,
+                    before=page_end
+                )
+                # Stop the step at the token budget; one oversized message is truncated in _summarize
+                messages, tokens = [], 0
+                for message in page["messages"]:
+                    tokens += count_tokens(f"{message['role']}: {message['message']}") + 1
+                    if messages and tokens > settings.CONVERSATION_SUMMARY_INPUT_TOKENS:
+                        page_end = message["seq"]
+                        break
+                    messages.append(message)
+                summary = await self._summarize(summary, messages)
+
+                # Only advance from the state that was read, in case another worker got there first
+                with track_call("mongodb", "save_conversation_summary"):
+                    result = await db_manager.database.chats.update_one(
+                        {
+                            "user_id": user_id,
+                            "session_id": session_id,
+                            "summary_seq": seq_filter
+                        },
+                        {
+                            "$set": {
+                                "summary": summary,
+                                "summary_seq": page_end,
+                                "summary_updated_at": datetime.now().isoformat()
+                            }
+                        }
+                    )
+                if not result.modified_count:
+                    break
+                updated = True
+                summary_seq = seq_filter = page_end
+            CONVERSATION_SUMMARIES.inc(outcome="updated" if updated else "conflict")
+            logger.info(
+                f"Conversation summary for session {session_id} "
+                f"{'now covers' if updated else 'already moved past'} {summary_seq} messages"
+            )
+            return updated
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            CONVERSATION_SUMMARIES.inc(outcome="error")
+            logger.error(f"Could not update conversation summary: {e}")
+            return False
+
+    async def _summarize(
+            self,
+            summary: str,
+            messages: List[Dict[str, Any]]
+    ) -> str:
+        from langchain.prompts import PromptTemplate
+        from core.model_factory import get_chat_model
+        from core.llm_caller import call_llm, new_deadline
+        try:
+            if self._llm is None:
+                self._llm = get_chat_model(temperature=0.1)
+            chain = PromptTemplate.from_template(SUMMARY_PROMPT) | self._llm
+            inputs = {
+                "max_words": settings.CONVERSATION_SUMMARY_TOKENS * 3 // 4,
+                "summary": summary or "(none)",
+                "messages": truncate_to_budget(
+                    "\n".join(f"{message['role']}: {message['message']}" for message in messages),
+                    settings.CONVERSATION_SUMMARY_INPUT_TOKENS
+                )
+            }
+            with track_call("llm", "summarize_conversation"):
+                response = await call_llm("summarize_conversation", chain, inputs, new_deadline())
+            record_llm_usage("summarize_conversation", response)
+            return truncate_to_budget(response.content.strip(), settings.CONVERSATION_SUMMARY_TOKENS)
+        except Exception as e:
+            return log_exception(e, logger)
+
+conversation_service = ConversationService()
@@ -0,0 +1,246 @@
+import re
+from io import BytesIO
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Literal, Optional, Union
+from PyPDF2 import PdfReader
+from docx import Document
+from docx.table import Table
+from langchain_core.documents import Document as Chunk
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from config.settings import settings
+
+# A figure as it appears in financial statements: 1,234.5  (1,234)  -12%  $4.5
+NUMBER = re.compile(r"^[(\-–$€£¥]*\d[\d,]*(\.\d+)?[%)]*$|^[-–—]$")
+NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.|[A-Z]\.)\s+\S")
+MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "vs", "with"}
+
+
+class Block:
+    """
+    Text or table unit of one page, with the section heading it falls under
+    """
+    def __init__(
+            self,
+            kind: Literal["text", "table"],
+            lines: List[str],
+            page: Optional[int],
+            section: str
+    ):
+        self.kind = kind
+        self.lines = lines
+        self.page = page
+        self.section = section
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def is_table_row(line: str) -> bool:
+    """
+    A line of a financial table: a label followed by two or more figures,
+    or a line that is mostly figures
+    """
+    tokens = line.split()
+    if len(tokens) < 2:
+        return False
+    numeric = [bool(NUMBER.match(token)) for token in tokens]
+    return (numeric[-1] and numeric[-2]) or (sum(numeric) >= 2 and 2 * sum(numeric) >= len(tokens))
+
+def is_heading(line: str) -> bool:
+    """
+    Short line that is all caps, numbered ("2.1 Revenue") or in title case, and not a sentence
+    """
+    words = line.split()
+    if not words or len(words) > 10 or len(line) > 80 or line[-1] in ".,;" or is_table_row(line):
+        return False
+    letters = [char for char in line if char.isalpha()]
+    if not letters:
+        return False
+    if line.isupper() or NUMBERED_HEADING.match(line) or line.endswith(":"):
+        return True
+    return all(
+        word[0].isupper() or not word[0].isalpha() or word.lower() in MINOR_WORDS
+        for word in words
+    ) and words[0][0].isupper()
+
+def pdf_blocks(
+        file_data: Union[bytes, BinaryIO]
+) -> Iterator[Block]:
+    """
+    Blocks of a PDF page by page. Runs of table rows, together with the
+    column header line above them, become one table block; headings start a
+    new text block and name the section until the next heading, across pages.
+    """
+    reader = PdfReader(BytesIO(file_data) if isinstance(file_data, (bytes, bytearray)) else file_data)
+    section = ""
+    for page_number, page in enumerate(reader.pages, start=1):
+        lines = [line.strip() for line in (page.extract_text() or "").splitlines()]
+        lines = [line for line in lines if line]
+        text: List[str] = []
+        index = 0
+        while index < len(lines):
+            line = lines[index]
+            end = index
+            while end < len(lines) and is_table_row(lines[end]):
+                end += 1
+            if end - index >= 2:
+                # The header row of a table is often words only ("Region Q1 Q2 Q3")
+                header = None
+                if text and text[-1].rstrip(":") != section and len(text[-1].split()) <= 12 and text[-1][-1] not in ".:;":
+                    header = text.pop()
+                if text:
+                    yield Block("text", text, page_number, section)
+                    text = []
+                yield Block("table", ([header] if header else []) + lines[index:end], page_number, section)
+                index = end
+                continue
+            if is_heading(line):
+                if text:
+                    yield Block("text", text, page_number, section)
+                section = line.rstrip(":")
+                text = [line]
+            else:
+                text.append(line)
+            index += 1
+        if text:
+            yield Block("text", text, page_number, section)
+
+def docx_blocks(
+        file_data: Union[bytes, BinaryIO]
+) -> Iterator[Block]:
+    """
+    Blocks of a DOCX in document order; sections come from Heading and Title
+    paragraph styles. DOCX has no fixed pages, so blocks carry no page number.
+    """
+    document = Document(BytesIO(file_data) if isinstance(file_data, (bytes, bytearray)) else file_data)
+    section = ""
+    text: List[str] = []
+    for item in document.iter_inner_content():
+        if isinstance(item, Table):
+            if text:
+                yield Block("text", text, None, section)
+                text = []
+            rows = []
+            for row in item.rows:
+                cells = []
+                for cell in row.cells:
+                    value = cell.text.strip()
+                    # Merged cells repeat their text in every grid cell they span
+                    if not cells or value != cells[-1]:
+                        cells.append(value)
+                if any(cells):
+                    rows.append(" | ".join(cells))
+            if rows:
+                yield Block("table", rows, None, section)
+            continue
+        line = item.text.strip()
+        if not line:
+            continue
+        style = item.style.name if item.style is not None else ""
+        if style.startswith("Heading") or style == "Title":
+            if text:
+                yield Block("text", text, None, section)
+            section = line
+            text = [line]
+        else:
+            text.append(line)
+    if text:
+        yield Block("text", text, None, section)
+
+def _split_table(
+        block: Block,
+        max_chars: int
+) -> Iterator[List[str]]:
+    """
+    Rows of an oversized table in parts of at most `max_chars`, each starting with the header row
+    """
+    header, rows = block.lines[0], block.lines[1:]
+    part: List[str] = []
+    size = len(header)
+    for row in rows:
+        if part and size + len(row) + 1 > max_chars:
+            yield [header] + part
+            part, size = [], len(header)
+        part.append(row)
+        size += len(row) + 1
+    if part:
+        yield [header] + part
+
+def chunk_blocks(
+        blocks: Iterable[Block],
+        source: str,
+        chunk_size: int,
+        chunk_overlap: int,
+        table_max_chars: int
+) -> Iterator[Chunk]:
+    """
+    Pack blocks into chunks lazily. Text of the same page and section is
+    merged up to `chunk_size` (longer text is split with overlap); tables
+    are chunks of their own and are only split, by rows, past
+    `table_max_chars`. Each chunk records source, page, section and kind.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    count = 0
+    buffer: List[Block] = []
+
+    def make_chunk(text: str, block: Block, kind: str) -> Chunk:
+        nonlocal count
+        count += 1
+        metadata: Dict[str, Union[str, int]] = {"source": source, "chunk": count, "kind": kind}
+        if block.page is not None:
+            metadata["page"] = block.page
+        if block.section:
+            metadata["section"] = block.section
+            # Tables and continued text say which section they belong to
+            if not text.startswith(block.section):
+                text = f"{block.section}\n{text}"
+        return Chunk(page_content=text, metadata=metadata)
+
+    def flush() -> Iterator[Chunk]:
+        if buffer:
+            for piece in splitter.split_text("\n".join(block.text for block in buffer)):
+                yield make_chunk(piece, buffer[0], "text")
+            buffer.clear()
+
+    for block in blocks:
+        if block.text.rstrip(":") == block.section:
+            # A heading alone; it still names the chunks that follow
+            continue
+        if block.kind == "table":
+            yield from flush()
+            if len(block.text) <= table_max_chars:
+                yield make_chunk(block.text, block, "table")
+            else:
+                for rows in _split_table(block, table_max_chars):
+                    yield make_chunk("\n".join(rows), block, "table")
+            continue
+        if buffer and (
+            block.page != buffer[0].page
+            or block.section != buffer[0].section
+            or sum(len(item.text) + 1 for item in buffer) + len(block.text) > chunk_size
+        ):
+            yield from flush()
+        buffer.append(block)
+    yield from flush()
+
+def iter_doc_chunks(
+        file_extension: Literal["pdf", "docx"],
+        file_data: Union[bytes, BinaryIO],
+        source: str = ""
+) -> Iterator[Chunk]:
+    """
+    Chunks of a PDF or DOCX, produced while the document is being parsed
+    """
+    if file_extension == "pdf":
+        blocks = pdf_blocks(file_data)
+    elif file_extension == "docx":
+        blocks = docx_blocks(file_data)
+    else:
+        raise ValueError("Unsupported file extension. Only 'pdf' and 'docx' are allowed.")
+    return chunk_blocks(
+        blocks,
+        source,
+        settings.DOC_CHUNK_SIZE,
+        settings.DOC_CHUNK_OVERLAP,
+        settings.DOC_TABLE_MAX_CHARS
+    )
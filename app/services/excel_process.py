@@ -1,85 +1,245 @@
+import os
+import shutil
+import asyncio
+import zipfile
+import tempfile
+import numpy as np
 import pandas as pd
 from io import BytesIO
-from typing import Literal, Dict, Any
+from xml.etree import ElementTree
+from typing import Literal, Dict, Any, BinaryIO, List, Optional, Sequence, Union
+from config.settings import settings
 from logger import logger, log_exception
+from services.worker_pool import get_process_pool, process_workers
+
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_STORAGE = "pyarrow"
+except ImportError:
+    STRING_STORAGE = "python"
+
+# NaN (not pd.NA) for missing values so profiles stay BSON encodable
+STRING_DTYPE = pd.StringDtype(STRING_STORAGE, na_value=np.nan)
+
+
+def clean_dataframe_legacy(
+        df: pd.DataFrame
+) -> pd.DataFrame:
+    # Step1: Convert column names to lowercase
+    df.columns = [str(col).strip().lower() for col in df.columns]
+
+    # Step2: Convert all string values in object columns to lowercase
+    for col in df.select_dtypes(include=["object"]).columns:
+        df[col] = df[col].str.strip().str.lower()
+    return df
+
+def clean_dataframe(
+        df: pd.DataFrame
+) -> pd.DataFrame:
+    """
+    Vectorized cleaning: lowercase column names, strip and lowercase text
+    columns (low-cardinality ones as categoricals, the rest as string dtype,
+    Arrow-backed when pyarrow is installed) and downcast integer columns.
+    Text columns with non-string values keep the original .str behaviour.
+    """
+    if settings.DATA_CLEANING_ENGINE == "legacy":
+        return clean_dataframe_legacy(df)
+
+    # Step1: Convert column names to lowercase
+    df.columns = [str(col).strip().lower() for col in df.columns]
+
+    # Step2: Normalize text columns
+    cleaned = {}
+    rows = len(df)
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        values = df[col]
+        if pd.api.types.infer_dtype(values, skipna=True) not in ("string", "empty"):
+            cleaned[col] = values.str.strip().str.lower()
+            continue
+        # Normalize each distinct value once and map the result back through the codes
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        if not len(uniques):
+            continue
+        normalized = pd.Index(uniques, dtype=STRING_DTYPE).str.strip().str.lower()
+        if rows and len(uniques) <= settings.CLEAN_CATEGORY_MAX_RATIO * rows:
+            categories = normalized.unique()
+            codes = np.where(codes >= 0, categories.get_indexer(normalized)[np.maximum(codes, 0)], -1)
+            cleaned[col] = pd.Series(
+                pd.Categorical.from_codes(codes, categories=categories),
+                index=df.index
+            )
+        else:
+            cleaned[col] = pd.Series(
+                normalized.take(codes, allow_fill=True, fill_value=np.nan),
+                index=df.index,
+                dtype=STRING_DTYPE
+            )
+
+    # Step3: Downcast numerics (floats only when explicitly enabled, to keep amounts exact)
+    for col in df.select_dtypes(include=["integer"]).columns:
+        cleaned[col] = pd.to_numeric(df[col], downcast="integer")
+    if settings.CLEAN_DOWNCAST_FLOATS:
+        for col in df.select_dtypes(include=["floating"]).columns:
+            cleaned[col] = pd.to_numeric(df[col], downcast="float")
+
+    for col, values in cleaned.items():
+        df[col] = values
+    return df
+
+def text_columns(
+        df: pd.DataFrame
+) -> List[str]:
+    """
+    Columns profiled as text: object, string and categorical dtypes
+    """
+    return df.select_dtypes(include=["object", "string", "category"]).columns.to_list()
+
+def profile_dataframe(
+        df: pd.DataFrame
+) -> Dict[str, Any]:
+    # Step1: Columns and their data types
+    column_details = []
+    for col in df.columns:
+        column_details.append({
+            "column_name": col,
+            "pandas_dtype": str(df[col].dtype)
+        })
+
+    # Step2: Separate Columns based on their dtypes
+    numeric_columns = df.select_dtypes(
+        include=["number"]
+    ).columns.to_list()
+    object_columns = text_columns(df)
+    object_cols_data = []
+
+    # Step3: Fetch Column wise information
+    for col in object_columns:
+        value_counts = df[col].dropna().value_counts()
+        value_counts = value_counts[value_counts > 0].head(50)
+        object_cols_data.append({
+            "column_name": col,
+            "total_unique_values": int(df[col].nunique(dropna=True)),
+            "top_50_unique_values": list(value_counts.to_dict().keys())
+        })
+
+    numerical_cols_data = []
+    for col in numeric_columns:
+        numerical_cols_data.append({
+            "min_value": float(df[col].min()),
+            "max_value": float(df[col].max())
+        })
+
+    # Step4: Return DF Information
+    first_5_rows = df.head(5).to_dict('records')
+    return {
+        "column_details": column_details,
+        "object_columns": object_columns,
+        "object_cols_data": object_cols_data,
+        "numeric_columns": numeric_columns,
+        "numeric_cols_data": numerical_cols_data,
+        "row_count": len(df),
+        "first_5_row": first_5_rows
+    }
+
+def process_sheets(
+        source: Union[str, BinaryIO],
+        sheets: Optional[Sequence[int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Open the workbook once and parse, clean and profile the given sheets
+    (all sheets when None). Empty sheets are skipped.
+
+    Runs in a worker process for multi-sheet workbooks, so it only takes and
+    returns picklable values.
+    """
+    results = []
+    with pd.ExcelFile(source) as workbook:
+        indexes = range(len(workbook.sheet_names)) if sheets is None else sheets
+        for index in indexes:
+            df = workbook.parse(index)
+            if df.empty:
+                continue
+            df = clean_dataframe(df)
+            results.append({
+                "sheet_index": index,
+                "sheet_name": workbook.sheet_names[index],
+                "df": df,
+                "info": profile_dataframe(df)
+            })
+    return results
+
+def process_csv(
+        source: BinaryIO
+) -> List[Dict[str, Any]]:
+    """
+    Parse, clean and profile a CSV upload as a single sheet entry (none when empty)
+    """
+    df = pd.read_csv(source)
+    if df.empty:
+        return []
+    df = clean_dataframe(df)
+    return [{"sheet_index": 0, "sheet_name": None, "df": df, "info": profile_dataframe(df)}]
+
+def workbook_sheet_count(path: str) -> int:
+    """
+    Number of sheets in an xlsx workbook, read from xl/workbook.xml only
+    """
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+    return len(root.findall("./{*}sheets/{*}sheet"))
+
 
 class ExcelFileProcess:
-    async def _read_excel_files(
+    async def _read_sheets(
             self,
             file_type: Literal["csv", "xlsx", "xls"],
-            file_data: bytes
-    ) -> pd.DataFrame:
+            file_data: Union[bytes, BinaryIO]
+    ) -> List[Dict[str, Any]]:
+        """
+        Read, clean and profile every non-empty sheet of an upload.
+
+        CSV files yield one entry with sheet_name None. Workbooks with several
+        sheets are split across the ingestion process pool; each worker opens
+        the workbook once for its share of the sheets.
+
+        Returns:
+            [{"sheet_index", "sheet_name", "df", "info"}] in workbook order
+        """
         try:
+            source = BytesIO(file_data) if isinstance(file_data, (bytes, bytearray)) else file_data
             if file_type == "csv":
-                return pd.read_csv(BytesIO(file_data))
-            return pd.read_excel(BytesIO(file_data))
-        except Exception as e:
-            return log_exception(e, logger)
-        
-    async def _data_cleaning(
-            self, 
-            df: pd.DataFrame
-    ) -> pd.DataFrame:
-        try:
-            # Step1: Convert column names to lowercase
-            df.columns = [col.strip().lower() for col in df.columns]
+                return await asyncio.to_thread(process_csv, source)
 
-            # Step2: Convert all string values in object columns to lowercase
-            for col in df.select_dtypes(include=["object"]).columns:
-                df[col] = df[col].str.strip().str.lower()
-            return df
-        except Exception as e:
-            return log_exception(e, logger)
+            workers = process_workers()
+            if file_type != "xlsx" or workers <= 1:
+                return await asyncio.to_thread(process_sheets, source)
 
-    async def _fetch_df_info(
-            self,
-            df: pd.DataFrame
-    ) -> Dict[str, Any]:
-        try:
-            # Step1: Columns and their data types
-            column_details = []
-            for col in df.columns:
-                column_details.append({
-                    "column_name": col,
-                    "pandas_dtype": str(df[col].dtype)
-                })
-
-            # Step2: Separate Columns based on their dtypes
-            numeric_columns = df.select_dtypes(
-                include=["number"]
-            ).columns.to_list()
-            object_columns = df.select_dtypes(
-                include=["object"]
-            ).columns.to_list()
-            object_cols_data = []
-
-            # Step3: Fetch Column wise information
-            for col in object_columns:
-                value_counts = df[col].dropna().value_counts().head(50)
-                object_cols_data.append({
-                    "column_name": col,
-                    "total_unique_values": int(df[col].nunique(dropna=True)),
-                    "top_50_unique_values": list(value_counts.to_dict().keys())
-                })
-
-            numerical_cols_data = []
-            for col in numeric_columns:
-                numerical_cols_data.append({
-                    "min_value": float(df[col].min()),
-                    "max_value": float(df[col].max())
-                })
-
-            # Step4: Return DF Information
-            first_5_rows = df.head(5).to_dict('records')
-            df_info = {
-                    "column_details": column_details,
-                    "object_columns": object_columns,
-                    "object_cols_data": object_cols_data,
-                    "numeric_columns": numeric_columns,
-                    "numeric_cols_data": numerical_cols_data,
-                    "row_count": len(df),
-                    "first_5_row": first_5_rows
-                }
-            return df_info
+            # Worker processes need a path; the spooled upload may only live in memory
+            with tempfile.NamedTemporaryFile(suffix=f".{file_type}", delete=False) as copy:
+                source.seek(0)
+                shutil.copyfileobj(source, copy)
+                path = copy.name
+            try:
+                sheet_count = workbook_sheet_count(path)
+                if sheet_count <= 1:
+                    return await asyncio.to_thread(process_sheets, path)
+                groups = [
+                    list(range(sheet_count))[worker::workers]
+                    for worker in range(min(workers, sheet_count))
+                ]
+                loop = asyncio.get_running_loop()
+                pool = get_process_pool()
+                parts = await asyncio.gather(*(
+                    loop.run_in_executor(pool, process_sheets, path, group)
+                    for group in groups
+                ))
+                logger.info(f"Processed {sheet_count} sheets in {len(groups)} workers")
+                return sorted(
+                    (sheet for part in parts for sheet in part),
+                    key=lambda sheet: sheet["sheet_index"]
+                )
+            finally:
+                os.unlink(path)
         except Exception as e:
             return log_exception(e, logger)
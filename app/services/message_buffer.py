@@ -0,0 +1,142 @@
+import asyncio
+from typing import Dict, Any, List, Tuple, Optional, Iterable
+from datetime import datetime
+from config.settings import settings
+from logger import logger, log_exception
+from services.chat_history_service import ChatHistoryService
+
+class MessageWriteBuffer:
+    """
+    Write-behind buffer for chat messages.
+
+    Messages are queued per (user_id, session_id) and written by a background
+    task every CHAT_FLUSH_INTERVAL_MS, or sooner once CHAT_FLUSH_MAX_MESSAGES
+    are pending. Readers call `flush_session` first to see their own writes.
+    """
+    def __init__(self):
+        self._pending: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._pending_count = 0
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Chat message write-behind buffer started")
+
+    async def close(self):
+        """
+        Stop the background task and flush everything still pending
+        """
+        try:
+            if self._task:
+                self._task.cancel()
+                try:
+                    await self._task
+                except asyncio.CancelledError:
+                    pass
+                self._task = None
+            await self.flush()
+            logger.info("Chat message write-behind buffer closed")
+        except Exception as e:
+            return log_exception(e, logger)
+
+    def add(
+            self,
+            user_id: str,
+            session_id: str,
+            role: str,
+            message: str
+    ):
+        """
+        Queue a message without waiting for MongoDB
+        """
+        self._pending.setdefault((user_id, session_id), []).append({
+            "role": role,
+            "message": message,
+            "timestamp": datetime.now().isoformat()
+        })
+        self._pending_count += 1
+        if self._pending_count >= settings.CHAT_FLUSH_MAX_MESSAGES:
+            self._wakeup.set()
+
+    def pending(
+            self,
+            user_id: str,
+            session_id: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Messages of one session that are queued but not written yet, oldest first
+        """
+        return list(self._pending.get((user_id, session_id), []))
+
+    async def discard_session(
+            self,
+            user_id: str,
+            session_id: str
+    ) -> int:
+        """
+        Drop queued messages of a session that is being purged. Waits for a
+        flush in progress first: it holds its batch outside the queue and
+        would write the session's messages back after the purge deleted them.
+
+        Returns:
+            Number of messages dropped
+        """
+        async with self._flush_lock:
+            dropped = self._pending.pop((user_id, session_id), [])
+            self._pending_count -= len(dropped)
+            return len(dropped)
+
+    async def flush_session(
+            self,
+            user_id: str,
+            session_id: str
+    ):
+        """
+        Write any pending messages of one session (read-your-writes)
+        """
+        await self.flush([(user_id, session_id)])
+
+    async def flush(
+            self,
+            keys: Optional[Iterable[Tuple[str, str]]] = None
+    ):
+        """
+        Write pending messages, either all of them or only the given sessions
+        """
+        async with self._flush_lock:
+            if keys is None:
+                batch, self._pending = self._pending, {}
+            else:
+                batch = {key: self._pending.pop(key) for key in keys if key in self._pending}
+            if not batch:
+                return
+            batch_count = sum(len(messages) for messages in batch.values())
+            self._pending_count -= batch_count
+            try:
+                await ChatHistoryService().write_batch(batch)
+            except Exception as e:
+                # Put the messages back in front of anything queued meanwhile; they keep
+                # their reserved sequence numbers, so the retry cannot duplicate them
+                for key, messages in batch.items():
+                    self._pending[key] = messages + self._pending.get(key, [])
+                self._pending_count += batch_count
+                logger.error(f"Failed to flush {batch_count} chat messages, will retry: {e}")
+
+    async def _run(self):
+        interval = settings.CHAT_FLUSH_INTERVAL_MS / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+message_buffer = MessageWriteBuffer()
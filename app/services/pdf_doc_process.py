@@ -1,117 +1,170 @@
 import os
-from typing import Literal, List
-from io import BytesIO
-from PyPDF2 import PdfReader
-from docx import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import asyncio
+from itertools import islice
+from typing import Literal, List, Optional, BinaryIO, Union, Iterable, Iterator, Dict, Any, Tuple
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
-from logger import logger, log_exception
 from config.settings import settings
+from logger import logger, log_exception
+from core.model_factory import get_embedding_model
+from core.query_router import vector_store_path
+from metrics import track_call
+from services.doc_chunker import iter_doc_chunks
+
+# Session index updates run in worker threads; one at a time per index
+_index_locks: Dict[str, asyncio.Lock] = {}
+
+def _index_lock(vector_path: str) -> asyncio.Lock:
+    return _index_locks.setdefault(vector_path, asyncio.Lock())
+
 
 class PdfDocProcess:
     def __init__(self):
         pass
 
-    async def _read_pdf_doc_files(
+    def _get_doc_chunks(
             self,
             file_extension: Literal["pdf", "docx"],
-            file_data: bytes
-    ):
+            file_data: Union[bytes, BinaryIO],
+            source: str = ""
+    ) -> Iterator[Document]:
+        """
+        Chunks of a PDF or DOCX with page, section and kind metadata, parsed
+        lazily page by page so tables stay whole (see `services.doc_chunker`)
         """
-        Extract Text from PDF or DOCX files.
-        Args:
-            file_extension (Literal): "pdf" or "docx"
-            file_data (bytes): File data in bytes
+        return iter_doc_chunks(file_extension, file_data, source)
+
+    async def _get_text_embeddings(
+            self,
+            chunks: Iterable[Document],
+            user_id: str,
+            session_id: str,
+            content_hash: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Create Faiss vector store using Geminiembeddings.
+        Chunks are embedded in batches of DOC_EMBED_BATCH_SIZE while the next
+        pages are parsed, so embedding starts with the first pages. Building,
+        merging and saving the indexes runs in one worker thread, off the
+        event loop.
 
         Returns:
-            str: Extracted text from the file
+            The session index path, or None when the document has no text
         """
+        batches = _batched(chunks, settings.DOC_EMBED_BATCH_SIZE)
+        next_batch = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
         try:
-            if file_extension == "pdf":
-                text = ""
-                pdf_stream = BytesIO(file_data)
-                reader = PdfReader(pdf_stream)
-                for page in reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-                return text.strip()
-            
-            elif file_extension == "docx":
-                text = ""
-                doc_stream = BytesIO(file_data)
-                doc = Document(doc_stream)
-                for para in doc.paragraphs:
-                    if para.text.strip():
-                        text += para.text + "\n"
-                return text.strip()
-            
-            else:
-                raise ValueError("Unsupported file extension. Only 'pdf' and 'docx' are allowed.")
+            # Step1: Define embedding model
+            embedding = get_embedding_model()
+
+            # Step2: Embed each batch
+            text_embeddings: List[Tuple[str, List[float]]] = []
+            metadatas: List[Dict[str, Any]] = []
+            while (batch := await next_batch) is not None:
+                next_batch = asyncio.ensure_future(asyncio.to_thread(next, batches, None))
+                texts = [chunk.page_content for chunk in batch]
+                with track_call("embeddings", "embed_documents"):
+                    vectors = await asyncio.to_thread(embedding.embed_documents, texts)
+                text_embeddings.extend(zip(texts, vectors))
+                metadatas.extend(chunk.metadata for chunk in batch)
+            if not text_embeddings:
+                return None
+
+            # Step3: Build the document index, keep a copy keyed by content so
+            # re-uploads can reuse the embeddings, and add it to this session's index
+            def build_and_merge() -> str:
+                vector_store = FAISS.from_embeddings(text_embeddings, embedding, metadatas=metadatas)
+                if content_hash:
+                    with track_call("faiss", "save_local"):
+                        vector_store.save_local(content_index_path(user_id, content_hash))
+                return self._merge_into_session_index(vector_store, embedding, user_id, session_id)
+
+            async with _index_lock(vector_store_path(user_id, session_id)):
+                return await asyncio.to_thread(build_and_merge)
         except Exception as e:
+            next_batch.cancel()
             return log_exception(e, logger)
-    
-    async def _get_doc_chunks(
+
+    async def _link_content_index(
             self,
-            doc_text: str
-    ) -> List[str]:
+            user_id: str,
+            session_id: str,
+            content_hash: str
+    ) -> Optional[str]:
         """
-        Split Text into chunks
+        Add the embeddings of already processed content to this session's index.
+
+        Returns:
+            The session index path, or None when no index exists for the content
         """
         try:
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size = 500,
-                chunk_overlap = 100
-            )
-            chunks = text_splitter.split_text(
-                doc_text
-            )
-            return chunks
+            content_path = content_index_path(user_id, content_hash)
+            if not os.path.exists(content_path):
+                return None
+            embedding = get_embedding_model()
+
+            def load_and_merge() -> str:
+                with track_call("faiss", "load_local"):
+                    vector_store = FAISS.load_local(
+                        content_path,
+                        embedding,
+                        allow_dangerous_deserialization=True
+                    )
+                return self._merge_into_session_index(vector_store, embedding, user_id, session_id)
+
+            async with _index_lock(vector_store_path(user_id, session_id)):
+                return await asyncio.to_thread(load_and_merge)
         except Exception as e:
             return log_exception(e, logger)
 
-    async def _get_text_embeddings(
+    def _merge_into_session_index(
             self,
-            chunks: List[str],
+            vector_store: FAISS,
+            embedding,
             user_id: str,
             session_id: str
-    ):
+    ) -> str:
         """
-        Create Faiss vector store using Geminiembeddings
+        Merge vectors into the session index, keeping earlier documents of the
+        session. Blocking; callers run it in a worker thread under `_index_lock`.
         """
-        try:
-            # Step1: Define embedding model
-            embedding = GoogleGenerativeAIEmbeddings(
-                model=settings.GOOGLE_EMBEDDING_MODEL,
-                google_api_key=settings.GOOGLE_API_KEY
-            )
-
-            # Step2: Create FAISS vector store
-            vector_store = FAISS.from_texts(
-                chunks,
-                embedding=embedding
-            )
-
-            # Step3: Create directory for FAISS stores if not exists
-            storage_dir = os.path.join(
-                "vectorstores", 
-                f"{user_id}"
-            )
-            os.makedirs(
-                storage_dir,
-                exist_ok=True
-            )
-
-            # Step4: Define unique path for this user's session
-            vector_path = os.path.join(
-                storage_dir,
-                f"document_{user_id}_{session_id}"
-            )
-
-            # Step5: Save FAISS index
+        vector_path = vector_store_path(user_id, session_id)
+        os.makedirs(
+            os.path.dirname(vector_path),
+            exist_ok=True
+        )
+        if os.path.exists(vector_path):
+            with track_call("faiss", "load_local"):
+                session_store = FAISS.load_local(
+                    vector_path,
+                    embedding,
+                    allow_dangerous_deserialization=True
+                )
+            session_store.merge_from(vector_store)
+            vector_store = session_store
+
+        with track_call("faiss", "save_local"):
             vector_store.save_local(vector_path)
+        return vector_path
 
-            return vector_path
-        except Exception as e:
-            return log_exception(e, logger)
+
+def _batched(
+        items: Iterable[Document],
+        size: int
+) -> Iterator[List[Document]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def content_index_path(
+        user_id: str,
+        content_hash: str
+) -> str:
+    """
+    FAISS index of one uploaded document, keyed by its content hash
+    """
+    return os.path.join(
+        "vectorstores",
+        f"{user_id}",
+        f"content_{content_hash}"
+    )
@@ -0,0 +1,377 @@
+import os
+import shutil
+import asyncio
+from typing import Dict, Any, List, Optional, Set, Tuple
+from datetime import datetime, timedelta
+from bson import ObjectId
+from sqlalchemy import bindparam, text
+from config.settings import settings
+from database.database import db_manager
+from logger import logger, log_exception
+from metrics import track_call, SESSIONS_PURGED, RECLAIMED_BYTES, ARTIFACTS_DELETED
+from core.query_router import vector_store_path
+from core.session_cache import session_cache
+from core.result_cache import result_cache
+from services.message_buffer import message_buffer
+
+def directory_size(path: str) -> int:
+    """
+    Total size in bytes of the files below a directory (0 if it does not exist)
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def remove_directory(path: str) -> int:
+    """
+    Delete a directory tree and return the bytes it held
+    """
+    if not os.path.exists(path):
+        return 0
+    size = directory_size(path)
+    shutil.rmtree(path, ignore_errors=True)
+    return size
+
+
+class SessionLifecycleService:
+    """
+    Deletes everything a session left behind: its FAISS index, MySQL tables,
+    GridFS files, `documents_data` entry and chat history.
+
+    Uploads deduplicated by content hash share a GridFS file, SQL table and
+    content index between sessions of the same user (`metadata.links` on the
+    GridFS file). A shared artifact is only deleted with the last session that
+    references it; otherwise the purged session is just unlinked from it.
+
+    Sessions idle for longer than SESSION_TTL_HOURS (last chat message or
+    upload) are purged by a background sweeper every
+    SESSION_SWEEP_INTERVAL_SECONDS. Every step is idempotent, so a purge
+    interrupted half way is completed by the next sweep.
+
+    Concurrent purges of the same session are only skipped within this
+    process; with several workers two may run at once. That is safe, since
+    every step is idempotent, but both report what they deleted.
+    """
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._purging: Set[Tuple[str, str]] = set()
+        self.last_sweep_at: Optional[str] = None
+        self.sessions_purged = 0
+        self.bytes_reclaimed: Dict[str, int] = {"faiss": 0, "sql": 0, "gridfs": 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if settings.SESSION_TTL_HOURS <= 0:
+            logger.info("Session TTL disabled, sweeper not started")
+            return
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Session sweeper started (TTL {settings.SESSION_TTL_HOURS}h)")
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Session sweeper stopped")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ttl_hours": settings.SESSION_TTL_HOURS,
+            "sweeper_running": self.running,
+            "last_sweep_at": self.last_sweep_at,
+            "sessions_purged": self.sessions_purged,
+            "bytes_reclaimed": dict(self.bytes_reclaimed)
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+            await asyncio.sleep(settings.SESSION_SWEEP_INTERVAL_SECONDS)
+
+    async def sweep(self) -> int:
+        """
+        Purge up to SESSION_SWEEP_BATCH expired sessions
+
+        Returns:
+            Number of sessions purged
+        """
+        cutoff = datetime.now() - timedelta(hours=settings.SESSION_TTL_HOURS)
+        purged = 0
+        for user_id, session_id in await self.find_expired_sessions(cutoff):
+            report = await self.purge_session(user_id, session_id, trigger="ttl")
+            if report:
+                purged += 1
+        self.last_sweep_at = datetime.now().isoformat()
+        if purged:
+            logger.info(f"Session sweep purged {purged} sessions idle since before {cutoff.isoformat()}")
+        return purged
+
+    async def find_expired_sessions(
+            self,
+            cutoff: datetime
+    ) -> List[Tuple[str, str]]:
+        """
+        Sessions whose last chat message and last upload are both older than `cutoff`
+        """
+        try:
+            limit = settings.SESSION_SWEEP_BATCH
+            projection = {"_id": 0, "user_id": 1, "session_id": 1}
+            with track_call("mongodb", "find_expired_sessions"):
+                # Sessions written before activity tracking fall back to their creation time
+                candidates = await db_manager.database.documents_data.find(
+                    {
+                        "$or": [
+                            {"last_activity_at": {"$lt": cutoff}},
+                            {"last_activity_at": {"$exists": False}, "created_at": {"$lt": cutoff}}
+                        ]
+                    },
+                    projection
+                ).limit(limit).to_list(length=limit)
+                candidates += await db_manager.database.chats.find(
+                    {
+                        "$or": [
+                            {"last_activity_at": {"$lt": cutoff}},
+                            {"last_activity_at": {"$exists": False}, "updated_at": {"$lt": cutoff.isoformat()}}
+                        ]
+                    },
+                    projection
+                ).limit(limit).to_list(length=limit)
+
+            expired = []
+            for key in dict.fromkeys((doc["user_id"], doc["session_id"]) for doc in candidates):
+                last_activity = await self.last_activity(*key)
+                if last_activity is None or last_activity < cutoff:
+                    expired.append(key)
+            return expired[:limit]
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def last_activity(
+            self,
+            user_id: str,
+            session_id: str
+    ) -> Optional[datetime]:
+        """
+        Latest chat message or upload of a session
+        """
+        query = {"user_id": user_id, "session_id": session_id}
+        documents, header = await asyncio.gather(
+            db_manager.database.documents_data.find_one(
+                query,
+                {"_id": 0, "last_activity_at": 1, "created_at": 1}
+            ),
+            db_manager.database.chats.find_one(
+                query,
+                {"_id": 0, "last_activity_at": 1, "updated_at": 1}
+            )
+        )
+        times = []
+        if documents:
+            times.append(documents.get("last_activity_at") or documents.get("created_at"))
+        if header:
+            updated_at = header.get("updated_at")
+            times.append(header.get("last_activity_at") or (datetime.fromisoformat(updated_at) if updated_at else None))
+        times = [value for value in times if isinstance(value, datetime)]
+        return max(times) if times else None
+
+    async def purge_session(
+            self,
+            user_id: str,
+            session_id: str,
+            trigger: str = "api"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Delete all data of one session.
+
+        Returns:
+            What was deleted and the bytes reclaimed per storage, or None when
+            the session is already being purged
+        """
+        key = (user_id, session_id)
+        if key in self._purging:
+            logger.info(f"Session {session_id} is already being purged")
+            return None
+        self._purging.add(key)
+        try:
+            report = {
+                "user_id": user_id,
+                "session_id": session_id,
+                "vector_store_deleted": False,
+                "tables_dropped": [],
+                "files_deleted": [],
+                "files_unlinked": [],
+                "content_indexes_deleted": [],
+                "chat_messages_dropped": 0,
+                "bytes_reclaimed": {"faiss": 0, "sql": 0, "gridfs": 0}
+            }
+            query = {"user_id": user_id, "session_id": session_id}
+
+            # Step1: Session FAISS index
+            faiss_bytes = await asyncio.to_thread(remove_directory, vector_store_path(user_id, session_id))
+            if faiss_bytes:
+                report["vector_store_deleted"] = True
+                report["bytes_reclaimed"]["faiss"] += faiss_bytes
+                ARTIFACTS_DELETED.inc(kind="vector_store")
+
+            # Step2: SQL tables no other session of the user points at
+            documents = await db_manager.database.documents_data.find_one(query, {"_id": 0, "documents": 1})
+            table_names = list(dict.fromkeys(
+                details["sql_tablename"]
+                for details in (documents or {}).get("documents", [])
+                if details.get("sql_tablename")
+            ))
+            droppable = []
+            for table_name in table_names:
+                shared = await db_manager.database.documents_data.find_one(
+                    {
+                        "user_id": user_id,
+                        "session_id": {"$ne": session_id},
+                        "documents.sql_tablename": table_name
+                    },
+                    {"_id": 1}
+                )
+                if not shared:
+                    droppable.append(table_name)
+            if droppable:
+                report["bytes_reclaimed"]["sql"] += await asyncio.to_thread(self._drop_tables, droppable)
+                report["tables_dropped"] = droppable
+                ARTIFACTS_DELETED.inc(len(droppable), kind="sql_table")
+
+            # Step3: GridFS files, and content indexes no longer backed by any file
+            # (imported here: pdf_doc_process pulls in langchain, which loads lazily)
+            from services.pdf_doc_process import content_index_path
+            hashes = set()
+            with track_call("gridfs", "find_session_files"):
+                files = await db_manager.database["fs.files"].find(
+                    {
+                        "metadata.user_id": user_id,
+                        "$or": [
+                            {"metadata.session_id": session_id},
+                            {"metadata.links.session_id": session_id}
+                        ]
+                    },
+                    {"_id": 1, "length": 1, "metadata": 1}
+                ).to_list(length=None)
+            for file in files:
+                metadata = file.get("metadata") or {}
+                if metadata.get("content_hash"):
+                    hashes.add(metadata["content_hash"])
+                if await self._release_file(file, session_id):
+                    report["files_deleted"].append(str(file["_id"]))
+                    report["bytes_reclaimed"]["gridfs"] += file.get("length", 0)
+                    ARTIFACTS_DELETED.inc(kind="gridfs_file")
+                else:
+                    report["files_unlinked"].append(str(file["_id"]))
+            for content_hash in hashes:
+                still_used = await db_manager.database["fs.files"].find_one(
+                    {"metadata.user_id": user_id, "metadata.content_hash": content_hash},
+                    {"_id": 1}
+                )
+                if still_used:
+                    continue
+                content_bytes = await asyncio.to_thread(remove_directory, content_index_path(user_id, content_hash))
+                if content_bytes:
+                    report["content_indexes_deleted"].append(content_hash)
+                    report["bytes_reclaimed"]["faiss"] += content_bytes
+                    ARTIFACTS_DELETED.inc(kind="content_index")
+
+            # Step4: Table profiles and chat history last, so an interrupted purge is found again
+            session_cache.invalidate(user_id, session_id)
+            await result_cache.drop_session(user_id, session_id)
+            report["chat_messages_dropped"] = await message_buffer.discard_session(user_id, session_id)
+            with track_call("mongodb", "purge_session"):
+                await db_manager.database.documents_data.delete_one(query)
+                await db_manager.database.chat_buckets.delete_many(query)
+                await db_manager.database.chats.delete_one(query)
+
+            for kind, size in report["bytes_reclaimed"].items():
+                if size:
+                    RECLAIMED_BYTES.inc(size, kind=kind)
+                    self.bytes_reclaimed[kind] += size
+            SESSIONS_PURGED.inc(trigger=trigger)
+            self.sessions_purged += 1
+            logger.info(
+                f"Purged session {session_id} of user {user_id} ({trigger}): "
+                f"{len(report['tables_dropped'])} tables, {len(report['files_deleted'])} files, "
+                f"{sum(report['bytes_reclaimed'].values())} bytes reclaimed"
+            )
+            return report
+        except Exception as e:
+            return log_exception(e, logger)
+        finally:
+            self._purging.discard(key)
+
+    async def _release_file(
+            self,
+            file: Dict[str, Any],
+            session_id: str
+    ) -> bool:
+        """
+        Delete a GridFS file, or only unlink the session when other sessions
+        still reference it. The first remaining link takes over ownership so
+        filename checks keep working for that session.
+
+        Returns:
+            True when the file was deleted
+        """
+        metadata = file.get("metadata") or {}
+        links = [link for link in metadata.get("links", []) if link.get("session_id") != session_id]
+        owner = metadata.get("session_id")
+        if owner == session_id and not links:
+            with track_call("gridfs", "delete"):
+                await db_manager.fs_bucket.delete(ObjectId(str(file["_id"])))
+            return True
+
+        update: Dict[str, Any] = {"$pull": {"metadata.links": {"session_id": session_id}}}
+        if owner == session_id:
+            new_owner = links[0]
+            await db_manager.database["fs.files"].update_one(
+                {"_id": file["_id"]},
+                {"$set": {"metadata.session_id": new_owner["session_id"], "filename": new_owner["filename"]}}
+            )
+            update = {"$pull": {"metadata.links": {"session_id": {"$in": [session_id, new_owner["session_id"]]}}}}
+        with track_call("gridfs", "unlink_session"):
+            await db_manager.database["fs.files"].update_one({"_id": file["_id"]}, update)
+        return False
+
+    def _drop_tables(
+            self,
+            table_names: List[str]
+    ) -> int:
+        """
+        Drop SQL tables and return the bytes they held (MySQL only; 0 elsewhere)
+        """
+        engine = db_manager.get_sql_engine()
+        quote = engine.dialect.identifier_preparer.quote
+        reclaimed = 0
+        with track_call("mysql", "drop_tables"):
+            with engine.begin() as conn:
+                if engine.dialect.name == "mysql":
+                    sizes = conn.execute(
+                        text(
+                            "SELECT COALESCE(SUM(data_length + index_length), 0) FROM information_schema.tables "
+                            "WHERE table_schema = DATABASE() AND table_name IN :names"
+                        ).bindparams(bindparam("names", expanding=True)),
+                        {"names": table_names}
+                    ).scalar()
+                    reclaimed = int(sizes or 0)
+                for table_name in table_names:
+                    conn.execute(text(f"DROP TABLE IF EXISTS {quote(table_name)}"))
+        return reclaimed
+
+session_lifecycle = SessionLifecycleService()
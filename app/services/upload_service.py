@@ -1,8 +1,12 @@
-from typing import Dict, Any
+import asyncio
+import hashlib
+from typing import Dict, Any, List, Optional, BinaryIO, Union
 from datetime import datetime
+from bson import ObjectId
 from config.settings import settings
-from database.database import db_manager, sql_engine
+from database.database import db_manager
 from logger import logger, log_exception
+from metrics import track_call, UPLOAD_DEDUP_HITS
 from services.excel_process import ExcelFileProcess
 from services.pdf_doc_process import PdfDocProcess
 
@@ -11,7 +15,7 @@ class UploadService:
             self, 
             user_id, 
             session_id,
-            file_data,
+            file_stream: BinaryIO,
             filename,
             file_extension
         ):
@@ -19,128 +23,415 @@ class UploadService:
         self.pdf_doc_utils = PdfDocProcess()
         self.user_id = user_id
         self.session_id = session_id
-        self.file_data = file_data
+        # Spooled upload (memory up to a threshold, then a temp file); parsers read it after GridFS
+        self.file_stream = file_stream
         self.filename = filename
         self.file_extension = file_extension
+        # Computed before the upload is stored, for deduplication
+        self.content_hash: Optional[str] = None
 
     async def upload_document(
             self
     ):
         try:
-            # Check file already exists or not
+            if self.file_extension not in settings.EXCEL_FILE_EXTENSIONS + settings.DOCUMENT_FILE_EXTENSIONS:
+                logger.warning("Unsupported file extension: %s", self.file_extension)
+                return {"error": "Unsupported file extension"}
+
+            # Check file already exists or not (by name; content is checked once hashed)
             logger.info("Checking if file already exists")
             if await self.check_exist_files():
                 logger.info("File already exists")
                 return {"error": "File already exists"}
-            
+
+            # Step1: Hash the spooled upload; duplicates are settled before anything is stored
+            self.content_hash = await self.hash_upload()
+            if await self.check_exist_files():
+                logger.info("File already exists")
+                return {"error": "File already exists"}
+
+            if settings.UPLOAD_DEDUP_ENABLED:
+                existing = await self.find_existing_upload()
+                if existing:
+                    linked = await self._link_existing_upload(existing)
+                    if linked:
+                        return linked
+                    logger.info("Previous upload of this content could not be reused, processing again")
+
+            # Step2: Stream the upload into GridFS
+            file_id = await self.store_file_gridfs()
+
+            # Step3: Parse the same spooled file
+            self.file_stream.seek(0)
             logger.info("File Extension is %s", self.file_extension)
-            if self.file_extension in settings.EXCEL_FILE_EXTENSIONS:
-                logger.info("Processing Excel file")
-                return await self._excel_file_process()
-            elif self.file_extension in settings.DOCUMENT_FILE_EXTENSIONS:
-                logger.info("Processing Document file")
-                return await self.pdf_doc_process()
-            else:
-                logger.warning("Unsupported file extension: %s", self.file_extension)
-                return {"error": "Unsupported file extension"}
+            try:
+                if self.file_extension in settings.EXCEL_FILE_EXTENSIONS:
+                    logger.info("Processing Excel file")
+                    result = await self._excel_file_process(file_id)
+                else:
+                    logger.info("Processing Document file")
+                    result = await self.pdf_doc_process()
+            except Exception:
+                await self.delete_file_gridfs(file_id)
+                raise
+            if not result or (isinstance(result, dict) and "error" in result):
+                await self.delete_file_gridfs(file_id)
+                return result
+            if self.file_extension in settings.DOCUMENT_FILE_EXTENSIONS:
+                await self.bump_upload_version()
+            await self.mark_upload_ready(file_id)
+            return result
         except Exception as e:
             return log_exception(e, logger)
 
     async def _excel_file_process(
-            self
+            self,
+            file_id: str
     ):
         try:
             logger.info("Processing Excel file")
-            # Step1: Read Excel file
-            df = await self.excel_utils._read_excel_files(
+            # Step1: Read, clean and profile every sheet (one entry for CSV files)
+            sheets = await self.excel_utils._read_sheets(
                 self.file_extension, 
-                self.file_data
+                self.file_stream
             )
-            if df.empty:
+            if not sheets:
                 logger.warning("Uploaded Excel file is empty: %s", self.filename)
                 return {"error": "Uploaded file is empty"}
-            
-            # Step2: Data Cleaning
-            cleaned_df = await self.excel_utils._data_cleaning(df)
-
-            # Step3: Fetch Information from the table
-            df_info = await self.excel_utils._fetch_df_info(cleaned_df)
-
-            # Step4: Store excel file info into GridFS
-            file_id = await self.save_file_gridfs()
-
-            # Step5: Save Excel Info and file id in document collection
-            await self.save_file_and_details(file_id, df_info)
-
-            # Step6: Save file in local SQLLite
-            table_name = f"user_id_{self.user_id}_file_id_{file_id}".replace("-","_")
-            cleaned_df.to_sql(
-                table_name, 
-                con=sql_engine,
-                if_exists="replace", 
-                index=False
-            )
-            logger.info(f"Table Name {table_name} created in SQLite database")
+
+            # Step2: Save each sheet as its own table
+            documents_details = []
+            for sheet in sheets:
+                table_name = self.table_name(
+                    file_id,
+                    sheet["sheet_index"] if len(sheets) > 1 else None
+                )
+                with track_call("mysql", "to_sql"):
+                    await asyncio.to_thread(
+                        sheet["df"].to_sql,
+                        table_name,
+                        con=db_manager.get_sql_engine(),
+                        if_exists="replace",
+                        index=False
+                    )
+                logger.info(f"Table Name {table_name} created in SQL database")
+                details = sheet["info"]
+                details["sql_tablename"] = table_name
+                if sheet["sheet_name"] is not None:
+                    details["sheet_name"] = sheet["sheet_name"]
+                documents_details.append(details)
+
+            # Step3: Save sheet Info and GridFS file id in document collection
+            await self.save_file_and_details(file_id, documents_details)
             return True
         except Exception as e:
             return log_exception(e, logger)
 
+    def table_name(
+            self,
+            file_id: str,
+            sheet_index: Optional[int] = None
+    ) -> str:
+        table_name = f"user_id_{self.user_id}_file_id_{file_id}"
+        if sheet_index is not None:
+            table_name += f"_sheet_{sheet_index}"
+        return table_name.replace("-","_")
+
+    async def hash_upload(
+            self
+    ) -> str:
+        """
+        SHA-256 of the spooled upload, read chunk by chunk in a worker thread
+        """
+        def digest_file() -> str:
+            digest = hashlib.sha256()
+            self.file_stream.seek(0)
+            while chunk := self.file_stream.read(settings.UPLOAD_STREAM_CHUNK_BYTES):
+                digest.update(chunk)
+            return digest.hexdigest()
+
+        try:
+            return await asyncio.to_thread(digest_file)
+        except Exception as e:
+            return log_exception(e, logger)
 
-    async def save_file_gridfs(
+    async def store_file_gridfs(
             self
     ) -> str:
+        """
+        Pipe the spooled upload into a GridFS upload stream chunk by chunk.
+        Only one chunk is held in memory at a time; a failed write aborts
+        the stream so no partial file is left behind. The file is stored as
+        "processing" until `mark_upload_ready`.
+
+        Returns:
+            The GridFS file id
+        """
         try:
-            file_id = await db_manager.fs_bucket.upload_from_stream(
+            file_id = ObjectId()
+            grid_in = db_manager.fs_bucket.open_upload_stream_with_id(
+                file_id,
                 self.filename,
-                self.file_data,
                 metadata={
                     "user_id": self.user_id,
-                    "session_id": self.session_id
+                    "session_id": self.session_id,
+                    "content_hash": self.content_hash,
+                    "status": "processing"
                 }
             )
+            closed = False
+            try:
+                self.file_stream.seek(0)
+                with track_call("gridfs", "upload_stream"):
+                    while True:
+                        chunk = await asyncio.to_thread(self.file_stream.read, settings.UPLOAD_STREAM_CHUNK_BYTES)
+                        if not chunk:
+                            break
+                        await grid_in.write(chunk)
+                    await grid_in.close()
+                closed = True
+            finally:
+                if not closed:
+                    await grid_in.abort()
             return str(file_id)
         except Exception as e:
             return log_exception(e, logger)
+
+    async def mark_upload_ready(
+            self,
+            file_id: str
+    ):
+        """
+        Flag a stored file as fully processed, so later uploads of the same content may link to it
+        """
+        try:
+            with track_call("gridfs", "mark_upload_ready"):
+                await db_manager.database["fs.files"].update_one(
+                    {"_id": ObjectId(file_id)},
+                    {"$set": {"metadata.status": "ready"}}
+                )
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def delete_file_gridfs(
+            self,
+            file_id: str
+    ):
+        """
+        Remove the stored file of an upload that could not be processed
+        """
+        try:
+            with track_call("gridfs", "delete"):
+                await db_manager.fs_bucket.delete(ObjectId(file_id))
+            logger.info(f"Removed GridFS file {file_id} of failed upload")
+        except Exception as e:
+            logger.error(f"Could not remove GridFS file {file_id}: {e}")
         
     async def save_file_and_details(
             self,
             file_id: str,
-            documents_details: Dict[str, Any]
+            documents_details: Union[Dict[str, Any], List[Dict[str, Any]]]
     ): 
         try:
-            documents_details["file_id"] = file_id
-            documents_details["filename"] = self.filename
-            documents_details["sql_tablename"] = f"user_id_{self.user_id}_file_id_{file_id}".replace("-","_")
-            documents_details["file_extension"] = self.file_extension
-            documents_details["uploaded_at"] = datetime.now()
-            await db_manager.database.documents_data.update_one(
-                {
-                    "user_id": self.user_id,
-                    "session_id": self.session_id
-                },
-                {
-                    "$push": 
-                        {
-                            "documents": documents_details
-                        },
-                        "$setOnInsert": {"created_at": datetime.now()}
-                },
-                upsert=True
-            )
+            # One entry per sheet for workbooks
+            entries = documents_details if isinstance(documents_details, list) else [documents_details]
+            for details in entries:
+                details["file_id"] = file_id
+                details["filename"] = self.filename
+                details.setdefault("sql_tablename", self.table_name(file_id))
+                details["file_extension"] = self.file_extension
+                details["content_hash"] = self.content_hash
+                details["uploaded_at"] = datetime.now()
+            with track_call("mongodb", "save_file_and_details"):
+                await db_manager.database.documents_data.update_one(
+                    {
+                        "user_id": self.user_id,
+                        "session_id": self.session_id
+                    },
+                    {
+                        "$push": 
+                            {
+                                "documents": {"$each": entries}
+                            },
+                            "$setOnInsert": {"created_at": datetime.now()},
+                            "$set": {"last_activity_at": datetime.now()},
+                            "$inc": {"upload_version": 1}
+                    },
+                    upsert=True
+                )
             logger.info("Document added in collection")
             return True
         except Exception as e:
             return log_exception(e, logger)
 
+    async def bump_upload_version(
+            self
+    ):
+        """
+        Document uploads add no table profile; still advance the session's
+        upload version so state cached against it is refreshed
+        """
+        try:
+            with track_call("mongodb", "bump_upload_version"):
+                await db_manager.database.documents_data.update_one(
+                    {
+                        "user_id": self.user_id,
+                        "session_id": self.session_id
+                    },
+                    {
+                        "$setOnInsert": {"created_at": datetime.now()},
+                        "$set": {"last_activity_at": datetime.now()},
+                        "$inc": {"upload_version": 1}
+                    },
+                    upsert=True
+                )
+        except Exception as e:
+            return log_exception(e, logger)
+
     async def check_exist_files(
             self
     ):
         try:
-            return await db_manager.database["fs.files"].find_one({
-                "filename": self.filename,
-                "metadata.session_id": self.session_id,
-                "metadata.user_id": self.user_id
-            })
+            conditions = [
+                {
+                    "filename": self.filename,
+                    "metadata.session_id": self.session_id
+                },
+                {
+                    "metadata.links": {
+                        "$elemMatch": {
+                            "session_id": self.session_id,
+                            "filename": self.filename
+                        }
+                    }
+                }
+            ]
+            if self.content_hash:
+                conditions += [
+                    {
+                        "metadata.content_hash": self.content_hash,
+                        "metadata.session_id": self.session_id
+                    },
+                    {
+                        "metadata.content_hash": self.content_hash,
+                        "metadata.links.session_id": self.session_id
+                    }
+                ]
+            with track_call("gridfs", "check_exist_files"):
+                return await db_manager.database["fs.files"].find_one(
+                    {
+                        "metadata.user_id": self.user_id,
+                        "$or": conditions
+                    },
+                    {
+                        "_id": 1
+                    }
+                )
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def find_existing_upload(
+            self
+    ) -> Optional[Dict[str, Any]]:
+        """
+        GridFS file of an earlier upload of the same content by this user
+        whose processing completed; one still processing or left behind by a
+        failed upload is not reused
+        """
+        try:
+            with track_call("gridfs", "find_existing_upload"):
+                return await db_manager.database["fs.files"].find_one(
+                    {
+                        "metadata.user_id": self.user_id,
+                        "metadata.content_hash": self.content_hash,
+                        "metadata.status": "ready"
+                    },
+                    {
+                        "_id": 1,
+                        "metadata": 1
+                    }
+                )
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def find_existing_profiles(
+            self,
+            file_id: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Table profiles (one per sheet) saved when the content was first processed
+        """
+        try:
+            with track_call("mongodb", "find_existing_profiles"):
+                document = await db_manager.database.documents_data.find_one(
+                    {
+                        "user_id": self.user_id,
+                        "documents.content_hash": self.content_hash
+                    },
+                    {
+                        "_id": 0,
+                        "documents": 1
+                    }
+                )
+            return [
+                details for details in (document or {}).get("documents", [])
+                if details.get("file_id") == file_id
+            ]
+        except Exception as e:
+            return log_exception(e, logger)
+
+    async def _link_existing_upload(
+            self,
+            existing: Dict[str, Any]
+    ):
+        """
+        Reuse the SQL table, profile, vector chunks and GridFS file of an
+        earlier upload with the same content instead of processing it again.
+
+        Returns:
+            True when linked, None when the earlier artifacts are missing
+        """
+        try:
+            file_id = str(existing["_id"])
+            if self.file_extension in settings.EXCEL_FILE_EXTENSIONS:
+                profiles = await self.find_existing_profiles(file_id)
+                if not profiles:
+                    return None
+                profiles = [
+                    {
+                        key: value for key, value in profile.items()
+                        if key not in ("filename", "uploaded_at")
+                    }
+                    for profile in profiles
+                ]
+                await self.save_file_and_details(file_id, profiles)
+                kind = "table"
+            else:
+                linked_path = await self.pdf_doc_utils._link_content_index(
+                    self.user_id,
+                    self.session_id,
+                    self.content_hash
+                )
+                if not linked_path:
+                    return None
+                await self.bump_upload_version()
+                kind = "document"
+
+            with track_call("gridfs", "link_existing_upload"):
+                await db_manager.database["fs.files"].update_one(
+                    {"_id": existing["_id"]},
+                    {
+                        "$addToSet": {
+                            "metadata.links": {
+                                "session_id": self.session_id,
+                                "filename": self.filename
+                            }
+                        }
+                    }
+                )
+            UPLOAD_DEDUP_HITS.inc(kind=kind)
+            logger.info(f"Linked upload to existing content {self.content_hash[:12]} (file id {file_id})")
+            return True
         except Exception as e:
             return log_exception(e, logger)
 
@@ -148,30 +439,26 @@ class UploadService:
             self
     ):
         try:
-            logger.info("Processing Excel file")
-            # Step1: Read Excel file
-            doc_text = await self.pdf_doc_utils._read_pdf_doc_files(
-                self.file_extension, 
-                self.file_data
+            logger.info("Processing document file")
+            # Step1: Split the document into chunks page by page, lazily
+            chunks = self.pdf_doc_utils._get_doc_chunks(
+                self.file_extension,
+                self.file_stream,
+                self.filename
             )
-            logger.info("Document text extracted")
-            # Step2: Split into chunks
-            chunks = await self.pdf_doc_utils._get_doc_chunks(
-                doc_text
-            )
-            logger.info("Document text splitted into chunks")
 
-            # Step3: Generate embeddings and store it to FAISS
-            await self.pdf_doc_utils._get_text_embeddings(
+            # Step2: Generate embeddings while parsing and store them to FAISS
+            vector_path = await self.pdf_doc_utils._get_text_embeddings(
                 chunks,
                 self.user_id,
-                self.session_id
+                self.session_id,
+                self.content_hash
             )
+            if vector_path is None:
+                logger.warning("No text found in uploaded document: %s", self.filename)
+                return {"error": "No text found in the document"}
             logger.info("Document embeddings created and stored in FAISS")
 
-            # Step4: Store excel file info into GridFS
-            await self.save_file_gridfs()
-
             return True
         except Exception as e:
             return log_exception(e, logger)
@@ -0,0 +1,91 @@
+import time
+import asyncio
+import importlib
+from typing import Dict, Any, Optional
+from logger import logger
+from database.database import db_manager
+from services.chat_service import get_chatbot
+from config.settings import settings
+from core.session_cache import session_cache
+
+# Modules that are imported lazily so the app itself starts quickly
+WARMUP_MODULES = [
+    "pandas",
+    "core.graph",
+    "core.rag_process",
+    "services.excel_process",
+    "services.pdf_doc_process",
+    "services.upload_service"
+]
+
+class WarmupService:
+    """
+    Background warmup run from the application lifespan: imports the heavy
+    modules, builds the shared chatbot and creates the SQL engine, then flips
+    the readiness flag served by /ready.
+    """
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.duration_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._import_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._import_task = asyncio.create_task(asyncio.to_thread(self._import_modules))
+            self._task = asyncio.create_task(self.run())
+
+    async def wait_for_modules(self):
+        """
+        Requests arriving during warmup wait for the background imports to
+        finish instead of importing the same modules concurrently.
+        """
+        if self._import_task is not None and not self._import_task.done():
+            try:
+                await asyncio.shield(self._import_task)
+            except Exception:
+                # Warmup reports the failure; the caller falls back to importing lazily
+                pass
+
+    def mark_ready(self):
+        self.ready = True
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self):
+        start = time.perf_counter()
+        try:
+            logger.info("Warmup started")
+            await self._import_task
+            await asyncio.to_thread(get_chatbot)
+            await db_manager.connect_to_sql()
+            self.ready = True
+            self.duration_seconds = round(time.perf_counter() - start, 3)
+            logger.info(f"Warmup finished in {self.duration_seconds}s")
+            # Readiness does not wait for the session preload
+            await session_cache.preload_recent(settings.SESSION_PRELOAD_COUNT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Warmup failed: {e}")
+
+    def _import_modules(self):
+        for module in WARMUP_MODULES:
+            importlib.import_module(module)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "warmup_seconds": self.duration_seconds
+        }
+
+warmup_service = WarmupService()
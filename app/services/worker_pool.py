@@ -0,0 +1,42 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from config.settings import settings
+from logger import logger
+
+_pool: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+def process_workers() -> int:
+    """
+    EXCEL_SHEET_WORKERS, or up to 4 workers by CPU count when unset (0)
+    """
+    if settings.EXCEL_SHEET_WORKERS > 0:
+        return settings.EXCEL_SHEET_WORKERS
+    return min(4, os.cpu_count() or 1)
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    Shared process pool for CPU-bound ingestion work, created on first use.
+    Workers are spawned rather than forked because the API process runs
+    threads (logging listener, warmup, asyncio executors).
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=process_workers(),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started ingestion process pool with {process_workers()} workers")
+        return _pool
+
+def shutdown_process_pool():
+    global _pool
+    with _lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+            logger.info("Ingestion process pool stopped")
@@ -0,0 +1,99 @@
+"""
+Minimal in-process ASGI client, enough to drive the FastAPI app under load
+without a network hop or an extra HTTP client dependency.
+"""
+import json
+import uuid
+import asyncio
+from urllib.parse import urlencode
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Response:
+    def __init__(self, status: int, headers: List[Tuple[bytes, bytes]], body: bytes):
+        self.status = status
+        self.headers = {key.decode().lower(): value.decode() for key, value in headers}
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body or b"null")
+
+
+def encode_multipart(field: str, filename: str, data: bytes, content_type: str) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+class ASGIClient:
+    def __init__(self, app):
+        self.app = app
+
+    async def request(
+            self,
+            method: str,
+            path: str,
+            params: Optional[Dict[str, Any]] = None,
+            body: bytes = b"",
+            headers: Optional[Dict[str, str]] = None
+    ) -> Response:
+        headers = dict(headers or {})
+        headers.setdefault("host", "bench")
+        headers["content-length"] = str(len(body))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method.upper(),
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": urlencode(params or {}).encode(),
+            "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+            "client": ("127.0.0.1", 0),
+            "server": ("bench", 80)
+        }
+        request_sent = False
+        response_done = asyncio.Event()
+        status = 500
+        response_headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response_done.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, response_headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_done.set()
+
+        await self.app(scope, receive, send)
+        response_done.set()
+        return Response(status, response_headers, b"".join(chunks))
+
+    async def get(self, path: str, params: Optional[Dict[str, Any]] = None) -> Response:
+        return await self.request("GET", path, params=params)
+
+    async def post(self, path: str, params: Optional[Dict[str, Any]] = None, body: bytes = b"",
+                   headers: Optional[Dict[str, str]] = None) -> Response:
+        return await self.request("POST", path, params=params, body=body, headers=headers)
+
+    async def upload(self, path: str, params: Dict[str, Any], filename: str, data: bytes,
+                     content_type: str = "application/octet-stream") -> Response:
+        body, multipart_type = encode_multipart("file", filename, data, content_type)
+        return await self.post(path, params=params, body=body, headers={"content-type": multipart_type})
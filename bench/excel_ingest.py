@@ -0,0 +1,99 @@
+"""
+Throughput of multi-sheet workbook ingestion (parse, clean, profile).
+
+Builds an xlsx workbook with --sheets sheets and compares:
+  per-sheet    one pd.read_excel per sheet, i.e. what splitting a workbook
+               into single-sheet uploads costs (the zip is reopened per sheet)
+  workbook     ExcelFileProcess._read_sheets with 1 worker (zip opened once)
+  parallel     ExcelFileProcess._read_sheets with --workers processes
+
+Usage:
+    python bench/excel_ingest.py --sheets 20 --rows 5000 --workers 4
+"""
+import os
+import sys
+import io
+import time
+import asyncio
+import argparse
+import tempfile
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+
+def make_workbook(sheets: int, rows: int) -> bytes:
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    regions = ["North", "South", "East", "West"]
+    for sheet in range(sheets):
+        worksheet = workbook.create_sheet(f"Sheet {sheet + 1}")
+        worksheet.append(["Date", "Region", "Product", "Revenue", "Expenses"])
+        for i in range(rows):
+            worksheet.append([
+                f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
+                f" {regions[(i + sheet) % 4]} ",
+                f"Product_{(i * 7 + sheet) % 25}",
+                (i * 37 + sheet) % 10000 + 0.5,
+                (i * 13 + sheet) % 5000 + 0.25
+            ])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def per_sheet(data: bytes, sheets: int):
+    import pandas as pd
+    from services.excel_process import clean_dataframe, profile_dataframe
+    for sheet in range(sheets):
+        df = clean_dataframe(pd.read_excel(io.BytesIO(data), sheet_name=sheet))
+        profile_dataframe(df)
+
+
+def read_sheets(data: bytes, workers: int):
+    from config.settings import settings
+    from services.excel_process import ExcelFileProcess
+    # The pool keeps the size it was created with; only the parallel runs use it
+    settings.EXCEL_SHEET_WORKERS = workers
+    return asyncio.run(ExcelFileProcess()._read_sheets("xlsx", io.BytesIO(data)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sheets", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=5000, help="rows per sheet")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGODB_URL", "memory://bench")
+    os.environ.setdefault("GOOGLE_API_KEY", "offline")
+    os.environ.setdefault("SQL_CONNECTION_URL", "sqlite://")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+
+    data = make_workbook(args.sheets, args.rows)
+    total_rows = args.sheets * args.rows
+    print(f"workbook: {args.sheets} sheets x {args.rows} rows, {len(data) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+    runs = [
+        ("per-sheet", lambda: per_sheet(data, args.sheets)),
+        ("workbook", lambda: read_sheets(data, 1)),
+        (f"parallel x{args.workers}", lambda: read_sheets(data, args.workers))
+    ]
+    # Warm up the worker pool so process start-up is not counted
+    read_sheets(make_workbook(2, 10), args.workers)
+
+    print(f"{'mode':<14}{'seconds':>10}{'sheets/s':>10}{'rows/s':>12}")
+    for name, fn in runs:
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14}{elapsed:>10.2f}{args.sheets / elapsed:>10.2f}{total_rows / elapsed:>12.0f}")
+
+    from services.worker_pool import shutdown_process_pool
+    shutdown_process_pool()
+
+
+if __name__ == "__main__":
+    main()
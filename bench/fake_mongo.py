@@ -0,0 +1,384 @@
+"""
+In-process stand-in for the parts of Motor used by the service.
+
+Covers the query operators, update operators and GridFS calls the app
+actually issues; it is not a general MongoDB emulator.
+"""
+import copy
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+_MISSING = object()
+
+
+def _get_path(doc: Dict[str, Any], path: str):
+    value = doc
+    parts = path.split(".")
+    for index, part in enumerate(parts):
+        if isinstance(value, list):
+            # Paths through arrays of sub-documents match any element, like MongoDB
+            rest = ".".join(parts[index:])
+            values = [_get_path(item, rest) for item in value if isinstance(item, dict)]
+            values = [item for item in values if item is not _MISSING]
+            return values if values else _MISSING
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_path(doc: Dict[str, Any], path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _match_condition(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        for operator, operand in condition.items():
+            present = value is not _MISSING
+            if operator == "$exists":
+                if present != bool(operand):
+                    return False
+            elif operator == "$in":
+                if not present or (value not in operand and not (isinstance(value, list) and set(value) & set(operand))):
+                    return False
+            elif operator == "$nin":
+                if present and (value in operand or (isinstance(value, list) and set(value) & set(operand))):
+                    return False
+            elif operator == "$elemMatch":
+                if not present or not isinstance(value, list) or not any(
+                    isinstance(item, dict) and _matches(item, operand) for item in value
+                ):
+                    return False
+            elif operator == "$ne":
+                if present and value == operand:
+                    return False
+            elif not present:
+                return False
+            elif operator == "$gte" and not value >= operand:
+                return False
+            elif operator == "$gt" and not value > operand:
+                return False
+            elif operator == "$lte" and not value <= operand:
+                return False
+            elif operator == "$lt" and not value < operand:
+                return False
+        return True
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    return value is not _MISSING and value == condition
+
+
+def _matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(_matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(_matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]):
+    if doc is None:
+        return None
+    doc = copy.deepcopy(doc)
+    if not projection:
+        return doc
+    include = {key for key, value in projection.items() if value and key != "_id"}
+    if include:
+        projected = {}
+        for key in include:
+            value = _get_path(doc, key)
+            if value is not _MISSING:
+                _set_path(projected, key, value)
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    for key, value in projection.items():
+        if not value:
+            doc.pop(key, None)
+    return doc
+
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool):
+    for operator, fields in update.items():
+        if operator == "$setOnInsert":
+            if inserting:
+                for key, value in fields.items():
+                    _set_path(doc, key, copy.deepcopy(value))
+        elif operator == "$set":
+            for key, value in fields.items():
+                _set_path(doc, key, copy.deepcopy(value))
+        elif operator == "$unset":
+            for key in fields:
+                doc.pop(key, None)
+        elif operator == "$addToSet":
+            for key, value in fields.items():
+                current = _get_path(doc, key)
+                items = [] if current is _MISSING else current
+                if value not in items:
+                    items.append(copy.deepcopy(value))
+                _set_path(doc, key, items)
+        elif operator == "$inc":
+            for key, value in fields.items():
+                current = _get_path(doc, key)
+                _set_path(doc, key, (0 if current is _MISSING else current) + value)
+        elif operator == "$push":
+            for key, value in fields.items():
+                current = _get_path(doc, key)
+                items = [] if current is _MISSING else current
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(copy.deepcopy(value["$each"]))
+                    for sort_key, direction in (value.get("$sort") or {}).items():
+                        items.sort(key=lambda item: item.get(sort_key), reverse=direction < 0)
+                    if "$slice" in value:
+                        limit = value["$slice"]
+                        items = items[limit:] if limit < 0 else items[:limit]
+                else:
+                    items.append(copy.deepcopy(value))
+                _set_path(doc, key, items)
+        elif operator == "$pull":
+            for key, condition in fields.items():
+                current = _get_path(doc, key)
+                if current is not _MISSING:
+                    _set_path(doc, key, [
+                        item for item in current
+                        if not (_matches(item, condition) if isinstance(condition, dict) else item == condition)
+                    ])
+        else:
+            raise NotImplementedError(f"Update operator {operator} is not supported by FakeCollection")
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self._docs = docs
+
+    def sort(self, key, direction: int = 1):
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for sort_key, sort_direction in reversed(keys):
+            self._docs.sort(key=lambda doc: (_get_path(doc, sort_key) is _MISSING, _get_path(doc, sort_key)), reverse=sort_direction < 0)
+        return self
+
+    def limit(self, count: int):
+        if count:
+            self._docs = self._docs[:count]
+        return self
+
+    async def to_list(self, length: Optional[int] = None):
+        return self._docs if length is None else self._docs[:length]
+
+    def __aiter__(self):
+        self._iter = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs: List[Dict[str, Any]] = []
+
+    def _upsert_seed(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        doc = {}
+        for key, value in query.items():
+            if not key.startswith("$") and not (isinstance(value, dict) and any(k.startswith("$") for k in value)):
+                _set_path(doc, key, copy.deepcopy(value))
+        doc.setdefault("_id", ObjectId())
+        return doc
+
+    def _update_sync(self, query, update, upsert=False, many=False):
+        matched = [doc for doc in self._docs if _matches(doc, query)]
+        if not many:
+            matched = matched[:1]
+        for doc in matched:
+            _apply_update(doc, update, inserting=False)
+        if matched or not upsert:
+            return UpdateResult(len(matched), len(matched)), matched[:1]
+        doc = self._upsert_seed(query)
+        _apply_update(doc, update, inserting=True)
+        self._docs.append(doc)
+        return UpdateResult(0, 0, doc["_id"]), [doc]
+
+    async def create_indexes(self, indexes):
+        return [index.document.get("name", "index") for index in indexes]
+
+    async def insert_one(self, document: Dict[str, Any]):
+        document = copy.deepcopy(document)
+        document.setdefault("_id", ObjectId())
+        self._docs.append(document)
+        return document["_id"]
+
+    async def find_one(self, query=None, projection=None, **kwargs):
+        for doc in self._docs:
+            if _matches(doc, query):
+                return _project(doc, projection or kwargs.get("projection"))
+        return None
+
+    def find(self, query=None, projection=None, **kwargs):
+        projection = projection or kwargs.get("projection")
+        return FakeCursor([_project(doc, projection) for doc in self._docs if _matches(doc, query)])
+
+    async def count_documents(self, query=None):
+        return sum(1 for doc in self._docs if _matches(doc, query))
+
+    async def distinct(self, key: str, query=None):
+        values = []
+        for doc in self._docs:
+            if _matches(doc, query):
+                value = _get_path(doc, key)
+                if value is not _MISSING and value not in values:
+                    values.append(value)
+        return values
+
+    async def update_one(self, query, update, upsert=False):
+        return self._update_sync(query, update, upsert=upsert)[0]
+
+    async def update_many(self, query, update, upsert=False):
+        return self._update_sync(query, update, upsert=upsert, many=True)[0]
+
+    async def find_one_and_update(self, query, update, projection=None, upsert=False,
+                                  return_document=ReturnDocument.BEFORE, **kwargs):
+        before = await self.find_one(query)
+        _, docs = self._update_sync(query, update, upsert=upsert)
+        if return_document == ReturnDocument.AFTER:
+            return _project(docs[0], projection) if docs else None
+        return _project(before, projection)
+
+    async def bulk_write(self, operations, ordered: bool = True):
+        for operation in operations:
+            self._update_sync(
+                operation._filter,
+                operation._doc,
+                upsert=bool(operation._upsert),
+                many=type(operation).__name__ == "UpdateMany"
+            )
+        return UpdateResult(len(operations), len(operations))
+
+    async def delete_one(self, query):
+        for index, doc in enumerate(self._docs):
+            if _matches(doc, query):
+                del self._docs[index]
+                return DeleteResult(1)
+        return DeleteResult(0)
+
+    async def delete_many(self, query):
+        before = len(self._docs)
+        self._docs = [doc for doc in self._docs if not _matches(doc, query)]
+        return DeleteResult(before - len(self._docs))
+
+
+class FakeDatabase:
+    def __init__(self):
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+class FakeMongoClient:
+    def __init__(self, *args, **kwargs):
+        self._databases: Dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        return self._databases.setdefault(name, FakeDatabase())
+
+    def close(self):
+        pass
+
+
+class FakeGridIn:
+    """
+    Upload stream returned by FakeGridFSBucket.open_upload_stream
+    """
+    def __init__(self, bucket: "FakeGridFSBucket", filename: str, metadata=None, file_id=None):
+        self._bucket = bucket
+        self._id = file_id or ObjectId()
+        self._filename = filename
+        self._metadata = metadata or {}
+        self._chunks: List[bytes] = []
+
+    async def write(self, data: bytes):
+        self._chunks.append(bytes(data))
+
+    async def set(self, name: str, value):
+        if name == "metadata":
+            self._metadata = value
+
+    async def abort(self):
+        self._chunks = []
+
+    async def close(self):
+        data = b"".join(self._chunks)
+        self._bucket._contents[self._id] = data
+        await self._bucket.database["fs.files"].insert_one({
+            "_id": self._id,
+            "filename": self._filename,
+            "length": len(data),
+            "uploadDate": datetime.now(),
+            "metadata": self._metadata
+        })
+
+
+class FakeGridFSBucket:
+    """
+    GridFS stand-in: file documents go to `fs.files`, contents stay in memory
+    """
+    def __init__(self, database: FakeDatabase):
+        self.database = database
+        self._contents: Dict[ObjectId, bytes] = {}
+
+    async def upload_from_stream(self, filename: str, source, metadata=None, **kwargs):
+        data = source if isinstance(source, (bytes, bytearray)) else source.read()
+        file_id = ObjectId()
+        self._contents[file_id] = bytes(data)
+        await self.database["fs.files"].insert_one({
+            "_id": file_id,
+            "filename": filename,
+            "length": len(data),
+            "uploadDate": datetime.now(),
+            "metadata": metadata or {}
+        })
+        return file_id
+
+    def open_upload_stream(self, filename: str, metadata=None, **kwargs):
+        return FakeGridIn(self, filename, metadata)
+
+    def open_upload_stream_with_id(self, file_id, filename: str, metadata=None, **kwargs):
+        return FakeGridIn(self, filename, metadata, file_id)
+
+    async def delete(self, file_id):
+        file_id = ObjectId(str(file_id))
+        self._contents.pop(file_id, None)
+        await self.database["fs.files"].delete_one({"_id": file_id})
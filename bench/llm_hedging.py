@@ -0,0 +1,99 @@
+"""
+Offline check of the hedged LLM call wrapper (core.llm_caller.call_llm).
+
+Drives the fake chat model, with a fraction of calls stalled in a slow
+tail, through call_llm with hedging disabled and then enabled, and
+reports p50/p95/p99 latency, hedges fired/won and deadline failures.
+
+Usage:
+    python bench/llm_hedging.py --calls 400 --latency-ms 50 --tail-fraction 0.05 --tail-latency-ms 2000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)] if ordered else 0.0
+
+
+async def run(args, hedging: bool) -> dict:
+    from langchain.prompts import PromptTemplate
+    from config.settings import settings
+    from core.fake_models import FakeChatModel
+    from core.llm_caller import call_llm, new_deadline, llm_latencies, LLMDeadlineExceeded, LLM_HEDGES
+
+    settings.LLM_HEDGING_ENABLED = hedging
+    llm_latencies._samples.clear()
+    before_fired = LLM_HEDGES._values.get(("bench", "fired"), 0)
+    before_won = LLM_HEDGES._values.get(("bench", "won"), 0)
+
+    model = FakeChatModel(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        tail_fraction=args.tail_fraction,
+        tail_latency_ms=args.tail_latency_ms
+    )
+    chain = PromptTemplate.from_template("User Query: {user_query}") | model
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call_llm("bench", chain, {"user_query": f"question {i}"}, new_deadline())
+            except LLMDeadlineExceeded:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(args.calls)))
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "hedges_fired": LLM_HEDGES._values.get(("bench", "fired"), 0) - before_fired,
+        "hedges_won": LLM_HEDGES._values.get(("bench", "won"), 0) - before_won,
+        "deadline_failures": failures
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=int, default=50)
+    parser.add_argument("--jitter-ms", type=int, default=30)
+    parser.add_argument("--tail-fraction", type=float, default=0.05)
+    parser.add_argument("--tail-latency-ms", type=int, default=2000)
+    parser.add_argument("--deadline-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    os.environ.update({
+        "LLM_PROVIDER": "fake",
+        "GOOGLE_API_KEY": "offline",
+        "MONGODB_URL": "memory://bench",
+        "SQL_CONNECTION_URL": "sqlite://",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "ERROR"),
+        "CHAT_REQUEST_DEADLINE_SECONDS": str(args.deadline_seconds)
+    })
+    sys.path.insert(0, APP_DIR)
+
+    print(f"{'hedging':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fired':>8}{'won':>6}{'deadline':>10}")
+    for hedging in (False, True):
+        row = asyncio.run(run(args, hedging))
+        print(
+            f"{'on' if hedging else 'off':<10}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+            f"{row['hedges_fired']:>8.0f}{row['hedges_won']:>6.0f}{row['deadline_failures']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Compare the old synchronous, full-state logging with the queue-based JSON
+logger and bounded StateSummary at high concurrency.
+
+Each simulated request logs the graph state five times, as the pipeline
+does, with a realistic SQL result and RAG payload. Reports per-request
+latency percentiles, total wall time and bytes written for both setups.
+
+Usage:
+    python bench/logging_overhead.py --requests 2000 --concurrency 200 --rows 2000
+"""
+import os
+import sys
+import time
+import queue
+import asyncio
+import logging
+import logging.handlers
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from logger import JsonFormatter, DroppingQueueHandler, StateSummary  # noqa: E402
+
+
+def make_state(rows: int) -> dict:
+    return {
+        "user_id": "user_1",
+        "session_id": "session_1",
+        "user_query": "total revenue by region for march",
+        "table_info": [
+            {
+                "sql_tablename": f"user_id_user_1_file_id_{i}",
+                "object_cols_data": [{"column_name": "region", "top_50_unique_values": [f"r{j}" for j in range(50)]}]
+            }
+            for i in range(5)
+        ],
+        "sql_response": "SELECT region, SUM(revenue) FROM t GROUP BY region",
+        "sql_result": [{"region": f"region_{i}", "revenue": i * 1000.5, "month": "march"} for i in range(rows)],
+        "rag_result": {"retrieved_docs": [{"chunk_id": i, "content": "lorem ipsum " * 40} for i in range(3)]},
+        "final_response": "",
+        "messages": []
+    }
+
+
+def old_logger(path: str) -> logging.Logger:
+    logger = logging.getLogger("bench_old")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    formatter = logging.Formatter(
+        fmt='%(asctime)s - %(filename)s - %(funcName)s - %(levelname)s - %(message)s - %(lineno)d'
+    )
+    for handler in (logging.FileHandler(path), logging.StreamHandler(open(os.devnull, "w"))):
+        handler.setFormatter(formatter)
+        logger.addHandler(handler)
+    return logger
+
+
+def new_logger(path: str, level: str):
+    logger = logging.getLogger("bench_new")
+    logger.handlers.clear()
+    logger.propagate = False
+    logger.setLevel(level)
+    handlers = []
+    for handler in (logging.FileHandler(path), logging.StreamHandler(open(os.devnull, "w"))):
+        handler.setFormatter(JsonFormatter())
+        handlers.append(handler)
+    log_queue = queue.Queue(maxsize=10000)
+    logger.addHandler(DroppingQueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return logger, listener
+
+
+async def old_request(logger, state):
+    start = time.perf_counter()
+    for step in range(5):
+        logger.info(f"State after step {step} {str(state)}")
+        await asyncio.sleep(0)
+    return time.perf_counter() - start
+
+
+async def new_request(logger, state):
+    start = time.perf_counter()
+    for step in range(5):
+        logger.debug("State after step %s: %s", step, StateSummary(state))
+        await asyncio.sleep(0)
+    return time.perf_counter() - start
+
+
+async def drive(request_fn, logger, state, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            return await request_fn(logger, state)
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one() for _ in range(requests)))
+    return sorted(latencies), time.perf_counter() - start
+
+
+def report(label, latencies, wall, path):
+    def pct(p):
+        return latencies[min(int(len(latencies) * p / 100), len(latencies) - 1)] * 1000
+    size = os.path.getsize(path)
+    print(
+        f"{label:<18} p50={pct(50):9.3f}ms p95={pct(95):9.3f}ms p99={pct(99):9.3f}ms "
+        f"wall={wall:7.2f}s rps={len(latencies) / wall:9.1f} log_bytes={size:,}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+    state = make_state(args.rows)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path = os.path.join(tmp, "old.log")
+        latencies, wall = asyncio.run(drive(old_request, old_logger(old_path), state, args.requests, args.concurrency))
+        report("before (sync)", latencies, wall, old_path)
+
+        for level in ("DEBUG", "INFO"):
+            new_path = os.path.join(tmp, f"new_{level}.log")
+            logger, listener = new_logger(new_path, level)
+            latencies, wall = asyncio.run(drive(new_request, logger, state, args.requests, args.concurrency))
+            listener.stop()
+            report(f"after ({level})", latencies, wall, new_path)
+        print(f"dropped records: {DroppingQueueHandler.dropped}")
+
+
+if __name__ == "__main__":
+    main()
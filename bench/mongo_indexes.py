@@ -0,0 +1,229 @@
+"""
+Benchmark the MongoDB access paths used by the chat and upload services
+with and without the indexes created by DatabaseManager.ensure_indexes.
+
+Seeds a scratch database on a local mongod, measures each query before and
+after index creation and prints per-query latency percentiles plus the
+winning plan stage.
+
+Usage:
+    python bench/mongo_indexes.py --url mongodb://localhost:27017 --docs 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime
+import itertools
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from database.database import MONGO_INDEXES  # noqa: E402
+
+
+def seed(db, docs: int, users: int, batch_size: int = 10_000):
+    db.chats.drop()
+    db.chat_buckets.drop()
+    db.documents_data.drop()
+    db["fs.files"].drop()
+    now = datetime.now().isoformat()
+    sessions_per_user = max(docs // users, 1)
+    for start in range(0, docs, batch_size):
+        chats, buckets, documents, files = [], [], [], []
+        for i in range(start, min(start + batch_size, docs)):
+            user_id = f"user_{i % users}"
+            session_id = f"session_{i // users}"
+            chats.append({
+                "user_id": user_id,
+                "session_id": session_id,
+                "created_at": now,
+                "updated_at": now,
+                "message_count": 2
+            })
+            buckets.append({
+                "user_id": user_id,
+                "session_id": session_id,
+                "bucket": 0,
+                "created_at": now,
+                "count": 2,
+                "messages": [
+                    {"seq": 0, "role": "user", "message": "total revenue in march", "timestamp": now},
+                    {"seq": 1, "role": "assistant", "message": "Total revenue in March was 1,204,331.", "timestamp": now}
+                ]
+            })
+            documents.append({
+                "user_id": user_id,
+                "session_id": session_id,
+                "documents": [{"filename": f"file_{i}.csv", "sql_tablename": f"t_{i}"}]
+            })
+            files.append({
+                "filename": f"file_{i}.csv",
+                "length": 1024,
+                "metadata": {"user_id": user_id, "session_id": session_id}
+            })
+        db.chats.insert_many(chats, ordered=False)
+        db.chat_buckets.insert_many(buckets, ordered=False)
+        db.documents_data.insert_many(documents, ordered=False)
+        db["fs.files"].insert_many(files, ordered=False)
+        print(f"seeded {min(start + batch_size, docs)}/{docs}", end="\r", flush=True)
+    print()
+    return sessions_per_user
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run_queries(db, users: int, sessions_per_user: int, iterations: int):
+    def pick():
+        return f"user_{random.randrange(users)}", f"session_{random.randrange(sessions_per_user)}"
+
+    def table_info():
+        user_id, session_id = pick()
+        db.documents_data.find_one(
+            {"user_id": user_id, "session_id": session_id},
+            {"_id": 0, "documents": 1}
+        )
+
+    seqs = itertools.count(2)
+
+    def reserve_seq():
+        # ChatHistoryService._reserve_sequences
+        user_id, session_id = pick()
+        now = datetime.now()
+        db.chats.find_one_and_update(
+            {"user_id": user_id, "session_id": session_id},
+            {
+                "$setOnInsert": {"user_id": user_id, "session_id": session_id, "created_at": now.isoformat()},
+                "$inc": {"message_count": 1},
+                "$set": {"updated_at": now.isoformat(), "last_activity_at": now}
+            },
+            projection={"_id": 0, "message_count": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def push_message():
+        # ChatHistoryService.write_batch bucket push
+        user_id, session_id = pick()
+        seq = next(seqs)
+        entry = {"seq": seq, "role": "user", "message": "and in april?", "timestamp": datetime.now().isoformat()}
+        db.chat_buckets.bulk_write([UpdateOne(
+            {"user_id": user_id, "session_id": session_id, "bucket": 0, "messages.seq": {"$nin": [seq]}},
+            {"$push": {"messages": {"$each": [entry], "$sort": {"seq": 1}}}, "$inc": {"count": 1}}
+        )], ordered=False)
+
+    def history_page():
+        # ChatHistoryService.get_history_page
+        user_id, session_id = pick()
+        list(db.chat_buckets.find(
+            {"user_id": user_id, "session_id": session_id, "bucket": {"$gte": 0, "$lte": 0}},
+            {"_id": 0, "messages": 1}
+        ))
+
+    def user_sessions():
+        user_id, _ = pick()
+        db.chats.distinct("session_id", {"user_id": user_id})
+
+    def exist_files():
+        user_id, session_id = pick()
+        db["fs.files"].find_one(
+            {"filename": "file_0.csv", "metadata.session_id": session_id, "metadata.user_id": user_id},
+            {"_id": 1}
+        )
+
+    plans = {
+        "table_info": db.documents_data.find(
+            {"user_id": "user_1", "session_id": "session_0"}, {"_id": 0, "documents": 1}
+        ).explain(),
+        "history_page": db.chat_buckets.find(
+            {"user_id": "user_1", "session_id": "session_0", "bucket": {"$gte": 0, "$lte": 0}},
+            {"_id": 0, "messages": 1}
+        ).explain(),
+        "user_sessions": db.command(
+            "explain", {"distinct": "chats", "key": "session_id", "query": {"user_id": "user_1"}}
+        )
+    }
+    results = {}
+    for name, fn in [
+        ("table_info", table_info),
+        ("reserve_seq", reserve_seq),
+        ("push_message", push_message),
+        ("history_page", history_page),
+        ("user_sessions", user_sessions),
+        ("exist_files", exist_files)
+    ]:
+        results[name] = timed(fn, iterations)
+    return results, plans
+
+
+def winning_stage(plan):
+    stage = plan.get("queryPlanner", {}).get("winningPlan", {})
+    stages = []
+    while stage:
+        stages.append(stage.get("stage", "?"))
+        stage = stage.get("inputStage") or stage.get("queryPlan")
+    return " <- ".join(stages)
+
+
+def report(label, results, plans):
+    print(f"\n== {label}")
+    for name, samples in results.items():
+        print(
+            f"{name:<15} p50={percentile(samples, 50):8.3f}ms "
+            f"p95={percentile(samples, 95):8.3f}ms "
+            f"p99={percentile(samples, 99):8.3f}ms "
+            f"mean={statistics.fmean(samples):8.3f}ms"
+        )
+    for name, plan in plans.items():
+        print(f"plan[{name}]: {winning_stage(plan)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="financial_chatbot_index_bench")
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    client = MongoClient(args.url)
+    db = client[args.db]
+    if args.skip_seed:
+        sessions_per_user = max(args.docs // args.users, 1)
+    else:
+        sessions_per_user = seed(db, args.docs, args.users)
+
+    for collection_name in MONGO_INDEXES:
+        db[collection_name].drop_indexes()
+    before, before_plans = run_queries(db, args.users, sessions_per_user, args.iterations)
+    report("without indexes", before, before_plans)
+
+    for collection_name, indexes in MONGO_INDEXES.items():
+        db[collection_name].create_indexes(indexes)
+    after, after_plans = run_queries(db, args.users, sessions_per_user, args.iterations)
+    report("with indexes", after, after_plans)
+
+    print("\n== speedup (p50)")
+    for name in before:
+        print(f"{name:<15} {percentile(before[name], 50) / max(percentile(after[name], 50), 1e-6):8.1f}x")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Offline load benchmark for the chat and upload endpoints.
+
+Runs the FastAPI app in-process with the deterministic fake chat and
+embedding models (LLM_PROVIDER=fake), an embedded SQLite database instead of
+MySQL and an in-memory Mongo stand-in. It uploads CSV and DOCX files into a
+set of sessions, then fires concurrent chat queries, and reports RPS and
+p50/p95/p99 latency per endpoint.
+
+Pass --baseline with a previous --output file to fail (exit code 1) when an
+endpoint's p95 regresses by more than --max-regression percent.
+
+Usage:
+    python bench/run_load.py --sessions 20 --chats 500 --concurrency 50 --llm-latency-ms 300
+"""
+import os
+import sys
+import io
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, "..", "app")
+
+
+def configure_environment(args, workdir: str):
+    os.environ.update({
+        "LLM_PROVIDER": "fake",
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_LLM_JITTER_MS": str(args.llm_jitter_ms),
+        "FAKE_EMBEDDING_LATENCY_MS": str(args.embedding_latency_ms),
+        "GOOGLE_API_KEY": "offline",
+        "MONGODB_URL": "memory://bench",
+        "SQL_CONNECTION_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING")
+    })
+    # logs/ and vectorstores/ are created relative to the working directory
+    os.chdir(workdir)
+    sys.path.insert(0, os.path.abspath(APP_DIR))
+    sys.path.insert(0, BENCH_DIR)
+
+
+def install_fake_mongo():
+    from config.settings import settings
+    from database.database import db_manager
+    from fake_mongo import FakeMongoClient, FakeGridFSBucket
+
+    async def connect_fake_mongo():
+        db_manager.client = FakeMongoClient()
+        db_manager.database = db_manager.client[settings.MONGODB_NAME]
+        db_manager.fs_bucket = FakeGridFSBucket(db_manager.database)
+
+    db_manager.connect_to_mongo = connect_fake_mongo
+
+
+def make_csv(rows: int, seed: int) -> bytes:
+    lines = ["date,region,product,revenue,expenses"]
+    regions = ["North", "South", "East", "West"]
+    for i in range(rows):
+        lines.append(
+            f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d},{regions[(i + seed) % 4]},"
+            f"product_{(i * 7 + seed) % 25},{(i * 37 + seed) % 10000}.50,{(i * 13 + seed) % 5000}.25"
+        )
+    return "\n".join(lines).encode()
+
+
+def make_docx(paragraphs: int, seed: int) -> bytes:
+    from docx import Document
+    document = Document()
+    for i in range(paragraphs):
+        document.add_paragraph(
+            f"Section {i}: quarterly revenue for segment {(i + seed) % 7} grew by {(i * 3 + seed) % 20} percent "
+            f"while operating expenses were {(i * 11 + seed) % 900} thousand."
+        )
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)] if ordered else 0.0
+
+
+async def run(args):
+    from main import app
+    from asgi_client import ASGIClient
+
+    client = ASGIClient(app)
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    wall = {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def timed(endpoint, coroutine_fn):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await coroutine_fn()
+            latencies[endpoint].append(time.perf_counter() - start)
+            ok = response.status < 400
+            if ok and response.headers.get("content-type", "").startswith("application/json"):
+                payload = response.json()
+                ok = not (isinstance(payload, dict) and payload.get("success") is False)
+            if not ok:
+                errors[endpoint] += 1
+                print(f"error: {endpoint} -> {response.status} {response.body[:300]!r}")
+
+    async with app.router.lifespan_context(app):
+        # Measure steady state: wait for the startup warmup like a load balancer would
+        start = time.perf_counter()
+        while (await client.get("/ready")).status != 200:
+            if time.perf_counter() - start > 120:
+                raise RuntimeError("Service did not become ready within 120s")
+            await asyncio.sleep(0.05)
+        print(f"ready after {time.perf_counter() - start:.2f}s")
+
+        sessions = [(f"bench_user_{i % args.users}", f"bench_session_{i}") for i in range(args.sessions)]
+
+        start = time.perf_counter()
+        uploads = []
+        for index, (user_id, session_id) in enumerate(sessions):
+            csv_data = make_csv(args.rows, index)
+            uploads.append(timed("upload_document", lambda u=user_id, s=session_id, d=csv_data: client.upload(
+                "/api/v1/upload/upload_document", {"user_id": u, "session_id": s}, "sales.csv", d, "text/csv"
+            )))
+            if index % 2 == 0:
+                docx_data = make_docx(args.paragraphs, index)
+                uploads.append(timed("upload_document", lambda u=user_id, s=session_id, d=docx_data: client.upload(
+                    "/api/v1/upload/upload_document", {"user_id": u, "session_id": s}, "report.docx", d,
+                    "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                )))
+        await asyncio.gather(*uploads)
+        wall["upload_document"] = time.perf_counter() - start
+
+        questions = [
+            "What is the total revenue?",
+            "How many rows are in the sales table?",
+            "What did the report say about operating expenses?",
+            "Hello!"
+        ]
+        start = time.perf_counter()
+        chats = []
+        for i in range(args.chats):
+            user_id, session_id = sessions[i % len(sessions)]
+            query = questions[i % len(questions)]
+            chats.append(timed("chat", lambda u=user_id, s=session_id, q=query: client.post(
+                "/api/v1/chat/chat", {"user_id": u, "session_id": s, "query": q}
+            )))
+        await asyncio.gather(*chats)
+        wall["chat"] = time.perf_counter() - start
+
+    results = {}
+    for endpoint, samples in latencies.items():
+        results[endpoint] = {
+            "requests": len(samples),
+            "errors": errors[endpoint],
+            "rps": round(len(samples) / wall[endpoint], 2) if wall.get(endpoint) else 0.0,
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3)
+        }
+    return results
+
+
+def report(results):
+    print(f"{'endpoint':<18}{'requests':>10}{'errors':>8}{'rps':>10}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for endpoint, row in results.items():
+        print(
+            f"{endpoint:<18}{row['requests']:>10}{row['errors']:>8}{row['rps']:>10.1f}"
+            f"{row['p50_ms']:>11.2f}{row['p95_ms']:>11.2f}{row['p99_ms']:>11.2f}"
+        )
+
+
+def compare(results, baseline_path: str, max_regression: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    ok = True
+    for endpoint, row in results.items():
+        previous = baseline.get(endpoint)
+        if not previous or not previous.get("p95_ms"):
+            continue
+        change = (row["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+        status = "REGRESSION" if change > max_regression else "ok"
+        print(f"{endpoint:<18} p95 {previous['p95_ms']:.2f}ms -> {row['p95_ms']:.2f}ms ({change:+.1f}%) {status}")
+        ok = ok and change <= max_regression
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=1000, help="rows per uploaded CSV")
+    parser.add_argument("--paragraphs", type=int, default=50, help="paragraphs per uploaded DOCX")
+    parser.add_argument("--chats", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=int, default=300)
+    parser.add_argument("--llm-jitter-ms", type=int, default=200)
+    parser.add_argument("--embedding-latency-ms", type=int, default=50)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+    with tempfile.TemporaryDirectory() as workdir:
+        configure_environment(args, workdir)
+        install_fake_mongo()
+        results = asyncio.run(run(args))
+
+    report(results)
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+    if baseline and not compare(results, baseline, args.max_regression):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
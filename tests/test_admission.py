@@ -0,0 +1,74 @@
+import asyncio
+from core.admission import AdmissionController, Lane
+
+
+def make_controller(limit=8, lane_limit=8, per_user=4):
+    return AdmissionController(limit, [Lane("chat", lane_limit, per_user, 10, 10, 1)])
+
+def test_batch_holds_a_slot_per_graph():
+    controller = make_controller()
+    lane = controller.lanes["chat"]
+
+    async def run():
+        async with controller.admit("chat", "u1", 3):
+            assert controller.in_flight == 3
+            assert lane.user_in_flight["u1"] == 3
+        assert controller.in_flight == 0 and "u1" not in lane.user_in_flight
+
+    asyncio.run(run())
+
+def test_batch_weight_is_capped_by_per_user_limit():
+    controller = make_controller(per_user=2)
+
+    async def run():
+        async with controller.admit("chat", "u1", 20):
+            assert controller.in_flight == 2
+
+    asyncio.run(run())
+
+def test_waiting_batch_is_not_overtaken_by_single_requests():
+    controller = make_controller(limit=4, lane_limit=4, per_user=4)
+    order = []
+
+    async def job(name, user_id, slots, hold):
+        async with controller.admit("chat", user_id, slots):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    async def run():
+        first = asyncio.create_task(job("first", "u1", 2, 0.05))
+        await asyncio.sleep(0)
+        batch = asyncio.create_task(job("batch", "u2", 4, 0))
+        await asyncio.sleep(0)
+        single = asyncio.create_task(job("single", "u3", 1, 0))
+        await asyncio.gather(first, batch, single)
+
+    asyncio.run(run())
+    assert order == ["first", "batch", "single"]
+
+def test_chat_cannot_take_reserved_ingest_slots():
+    controller = AdmissionController(4, [
+        Lane("chat", 4, 4, 10, 10, 1),
+        Lane("ingest", 2, 2, 10, 10, 1, reserved=1)
+    ])
+    chat, ingest = controller.lanes["chat"], controller.lanes["ingest"]
+    started = []
+
+    async def job(lane, user_id, release):
+        async with controller.admit(lane, user_id):
+            started.append(lane)
+            await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        tasks = [asyncio.create_task(job("chat", f"c{i}", release)) for i in range(4)]
+        await asyncio.sleep(0)
+        assert chat.in_flight == 3 and len(chat.waiters) == 1
+        tasks.append(asyncio.create_task(job("ingest", "i", release)))
+        await asyncio.sleep(0)
+        assert ingest.in_flight == 1
+        release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert started.count("chat") == 4 and "ingest" in started
@@ -0,0 +1,17 @@
+import os
+import statistics
+import sys
+
+BENCH_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+import import_time
+
+
+def test_import_main_loads_no_lazy_modules_and_stays_within_budget():
+    results = [import_time.measure() for _ in range(3)]
+    loaded = sorted({module for result in results for module in result["loaded"]})
+    assert not loaded, f"modules meant to load lazily were imported: {', '.join(loaded)}"
+    median = statistics.median(result["seconds"] for result in results)
+    assert median <= import_time.BUDGET_SECONDS, f"import main took {median:.3f}s"
@@ -0,0 +1,60 @@
+from decimal import Decimal
+import pandas as pd
+import pytest
+from core.response_formatter import column_label, column_words, format_fast_response, format_value
+
+
+@pytest.mark.parametrize("column, value, expected", [
+    ("total_revenue", 1234.5, "$1,234.50"),
+    ("totalRevenue", 10, "$10.00"),
+    ("SUM(`discount_amount`)", Decimal("12.5"), "$12.50"),
+    ("COUNT(`amount`)", 7, "7"),
+    ("customer_id", 12, "12"),
+    ("conversion_rate", 12.3, "12.30%"),
+    ("Margin %", 5, "5.00%"),
+    ("profit_margin", 23.4, "23.40%"),
+    ("market_share", 12, "12.00%"),
+    ("gross_margin", 150000, "150,000"),
+    ("share_price", 45.2, "$45.20"),
+    ("generated_units", 5, "5"),
+    ("units", 1234567, "1,234,567"),
+    ("ratio", 0.5, "0.50%"),
+])
+def test_format_value_numbers(column, value, expected):
+    assert format_value(column, value) == expected
+
+@pytest.mark.parametrize("column", ["generated_units", "discount_amount", "accountNumber"])
+def test_column_words_match_whole_words(column):
+    words = column_words(column).split()
+    assert "rate" not in words and "count" not in words
+
+@pytest.mark.parametrize("value", [None, float("nan"), Decimal("NaN"), pd.NaT, pd.NA])
+def test_format_value_missing(value):
+    assert format_value("total_revenue", value) == "n/a"
+
+def test_format_value_other_types():
+    assert format_value("active", True) == "yes"
+    assert format_value("region", "North") == "North"
+
+def test_column_label():
+    assert column_label("SUM(`revenue`)") == "total revenue"
+    assert column_label("COUNT(*)") == "number of rows"
+    assert column_label("total_revenue") == "total revenue"
+
+def test_fast_response_scalar():
+    assert format_fast_response("total revenue?", [{"SUM(`revenue`)": 1500}]) == "The total revenue is $1,500.00."
+    assert format_fast_response("total revenue?", [{"SUM(`revenue`)": float("nan")}]) == "No data found for your query."
+
+def test_fast_response_table_renders_nulls():
+    rows = [
+        {"region": "North", "revenue": 10.0},
+        {"region": "South", "revenue": float("nan")}
+    ]
+    response = format_fast_response("revenue by region", rows)
+    assert "| North | $10.00 |" in response
+    assert "| South | n/a |" in response
+    assert "nan" not in response
+
+def test_fast_response_leaves_interpretation_to_the_llm():
+    assert format_fast_response("why did revenue drop?", [{"revenue": 1}]) is None
+    assert format_fast_response("total revenue?", []) is None